@@ -0,0 +1,210 @@
+# Station cycle-time benchmark.
+# Runs every test mode (and the full-board sequence) many times on the host simulator, for a good
+# board and for each kind of failure, and reports per-cycle latency, I2C traffic and allocations.
+# The simulated cycle time and the I2C transaction count are compared with bench_baseline.json;
+# the run fails if any case got slower or chattier on the bus.
+#
+#     cd HOST
+#     python bench_station.py                    # compare with the baseline
+#     python bench_station.py --update-baseline  # accept the current numbers
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from tester_sim import Board, ButtonOperator, MODE_BUTTON_PINS, Simulation
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+DEFAULT_REPEAT = 20
+ALLOC_CYCLES = 3            # Cycles measured under tracemalloc (slower, so kept short)
+TOLERANCE = 0.02            # Allowed relative increase before a case counts as a regression
+
+TESTS = list(MODE_BUTTON_PINS) + ["sequence"]
+
+
+def _open_wire(board):
+    board.harness.opens.add(2)
+
+
+def _short_wires(board):
+    board.harness.shorts.add((1, 4))
+
+
+def _missing(name):
+    def inject(board):
+        board.bus.detach(getattr(board, name).address)
+    return inject
+
+
+SCENARIOS = {
+    "good": lambda board: None,
+    "wire_open": _open_wire,
+    "wire_short": _short_wires,
+    "ina226_missing": _missing("ina226"),
+    "tsl2591_missing": _missing("tsl2591"),
+    "scd41_missing": _missing("scd41"),
+    "bme280_missing": _missing("bme280"),
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_case(test, scenario, repeat):
+
+    """
+    Benchmark one test under one scenario.
+
+    Parameters:
+    test (str): Mode name or "sequence".
+    scenario (str): Key of SCENARIOS.
+    repeat (int): Number of timed cycles.
+
+    Returns:
+    dict: Per-cycle metrics of the case.
+    """
+
+    board = Board()
+    SCENARIOS[scenario](board)
+    workdir = tempfile.TemporaryDirectory(prefix="bench_station_")
+    sim = Simulation(board, workdir=workdir.name)
+
+    if test != "sequence":
+        ButtonOperator(board, [test] * (repeat + ALLOC_CYCLES))
+
+    mode_select = sim.load("mode_select")
+    i2c_setup = sim.load("i2c_setup")
+    result_store = sim.load("result_store")
+
+    sim_ms, wall_us, transactions, verdicts = [], [], [], []
+    alloc_peak, alloc_blocks = [], []
+
+    with sim.running():
+        selector = mode_select.ModeSelect(i2c_setup.initialize_i2c(timed=True),
+                                          results=result_store.ResultStore())
+        if test == "sequence":
+            cycle = lambda: selector.run_sequence()[0]
+        else:
+            cycle = selector.activate_test
+
+        for _ in range(repeat):
+            sim_start = board.clock.now_us
+            bus_start = board.bus.transactions
+            wall_start = time.perf_counter()
+
+            verdicts.append(cycle())
+
+            wall_us.append((time.perf_counter() - wall_start) * 1e6)
+            sim_ms.append((board.clock.now_us - sim_start) / 1000)
+            transactions.append(board.bus.transactions - bus_start)
+
+        # Garbage collection is held off so the block count only reflects this cycle
+        gc.collect()
+        gc.disable()
+        tracemalloc.start()
+        for _ in range(ALLOC_CYCLES):
+            blocks = sys.getallocatedblocks()
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            cycle()
+            alloc_peak.append(tracemalloc.get_traced_memory()[1] - current)
+            alloc_blocks.append(sys.getallocatedblocks() - blocks)
+        tracemalloc.stop()
+        gc.enable()
+
+    workdir.cleanup()
+
+    return {
+        "sim_ms": statistics.mean(sim_ms),
+        "sim_p50_ms": percentile(sim_ms, 0.5),
+        "sim_p99_ms": percentile(sim_ms, 0.99),
+        "wall_us": statistics.mean(wall_us),
+        "i2c": statistics.mean(transactions),
+        "alloc_peak_kb": statistics.mean(alloc_peak) / 1024,
+        "alloc_blocks": statistics.mean(alloc_blocks),
+        "pass_rate": sum(1 for verdict in verdicts if verdict) / len(verdicts),
+    }
+
+
+def compare(results, baseline):
+
+    """
+    Return the list of regressions of results against a baseline.
+
+    A case regresses when its simulated cycle time or its I2C transaction count grew by more
+    than TOLERANCE, or when its pass rate changed.
+    """
+
+    regressions = []
+    for case, metrics in results.items():
+        reference = baseline.get(case)
+        if reference is None:
+            continue
+
+        for key in ("sim_ms", "i2c"):
+            if metrics[key] > reference[key] * (1 + TOLERANCE) + 1e-9:
+                regressions.append("{}: {} {:.2f} -> {:.2f}".format(case, key, reference[key], metrics[key]))
+
+        if abs(metrics["pass_rate"] - reference["pass_rate"]) > 1e-9:
+            regressions.append("{}: pass rate {:.2f} -> {:.2f}".format(
+                case, reference["pass_rate"], metrics["pass_rate"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark station cycle time on the host simulator.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed cycles per case")
+    parser.add_argument("--tests", nargs="+", default=TESTS, choices=TESTS)
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as the new baseline")
+    args = parser.parse_args()
+
+    results = {}
+    print("{:<36}{:>10}{:>10}{:>10}{:>10}{:>8}{:>10}{:>8}{:>6}".format(
+        "case", "sim ms", "p50 ms", "p99 ms", "wall us", "i2c", "alloc kB", "blocks", "pass"))
+
+    for test in args.tests:
+        for scenario in args.scenarios:
+            case = "{}/{}".format(test, scenario)
+            metrics = results[case] = run_case(test, scenario, args.repeat)
+            print("{:<36}{:>10.1f}{:>10.1f}{:>10.1f}{:>10.0f}{:>8.1f}{:>10.1f}{:>8.1f}{:>6.2f}".format(
+                case, metrics["sim_ms"], metrics["sim_p50_ms"], metrics["sim_p99_ms"], metrics["wall_us"],
+                metrics["i2c"], metrics["alloc_peak_kb"], metrics["alloc_blocks"], metrics["pass_rate"]))
+
+    if args.update_baseline:
+        stored = {case: {key: round(metrics[key], 3) for key in ("sim_ms", "i2c", "pass_rate")}
+                  for case, metrics in results.items()}
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(stored, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write("\n")
+        print("Baseline written to {}".format(args.baseline))
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found, run with --update-baseline to create one.")
+        return 0
+
+    with open(args.baseline) as baseline_file:
+        regressions = compare(results, json.load(baseline_file))
+
+    if regressions:
+        print("\nREGRESSIONS:")
+        for regression in regressions:
+            print("  " + regression)
+        return 1
+
+    print("\nNo regressions against {}".format(os.path.basename(args.baseline)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
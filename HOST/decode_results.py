@@ -0,0 +1,162 @@
+# Host-side decoder of the result file written by TESTER/result_store.py.
+# Copy results.bin from the Pico (e.g. with Thonny or mpremote) and turn it into CSV or NumPy arrays:
+#
+#     python decode_results.py results.bin --csv results.csv
+
+import argparse
+import csv
+import os
+import struct
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "TESTER"))
+
+from result_store import (HEADER_FORMAT, HEADER_SIZE, MAGIC, RECORD_FIELDS, RECORD_FORMAT,  # noqa: E402
+                          RECORD_SIZE, VERSION, MISSING_U16, MISSING_I16, MISSING_I32, NO_CHANNEL)
+
+MODE_NAMES = {0: "none", 1: "wire", 2: "current", 3: "co2", 4: "light", 5: "analog"}
+VERDICT_NAMES = {0: "fail", 1: "pass", 2: "error"}
+
+# NumPy layout of one record, identical to RECORD_FORMAT
+NUMPY_DTYPE = [
+    ("seq", "<u4"), ("mode", "u1"), ("verdict", "u1"), ("channel", "u1"), ("cable_matrix", "u1", (6,)),
+    ("bus_mv", "<u2"), ("current_ma100", "<i2"), ("co2_ppm", "<u2"), ("temperature_c100", "<i2"),
+    ("humidity_c100", "<u2"), ("lux_d10", "<i4"), ("duration_ms", "<u2"), ("timestamp", "<u4"),
+]
+
+# Sentinel stored for a measurement that was not taken, per field
+MISSING = {
+    "bus_mv": MISSING_U16, "current_ma100": MISSING_I16, "co2_ppm": MISSING_U16,
+    "temperature_c100": MISSING_I16, "humidity_c100": MISSING_U16, "lux_d10": MISSING_I32,
+}
+
+
+def read_header(data):
+
+    """
+    Parse the header of a result file.
+
+    Parameters:
+    data (bytes): Contents of the file.
+
+    Returns:
+    tuple: Capacity (record slots), next sequence number.
+    """
+
+    if len(data) < HEADER_SIZE:
+        raise ValueError("Not a TESTER result file (only {} bytes)".format(len(data)))
+
+    magic, version, record_size, capacity, next_seq = struct.unpack_from(HEADER_FORMAT, data, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a TESTER result file")
+    if version != VERSION or record_size != RECORD_SIZE:
+        raise ValueError("Unsupported result file version {} / record size {}".format(version, record_size))
+    if len(data) < HEADER_SIZE + capacity * RECORD_SIZE:
+        raise ValueError("Truncated result file: {} bytes for {} records".format(len(data), capacity))
+    return capacity, next_seq
+
+
+def _ordered_slots(capacity, next_seq):
+    # Slots in sequence order: the oldest record is next_seq - count
+    count = min(capacity, next_seq)
+    first = next_seq - count
+    return [(first + n) % capacity for n in range(count)]
+
+
+def read_records(path):
+
+    """
+    Read all stored records in sequence order.
+
+    Parameters:
+    path (str): Result file copied from the Pico.
+
+    Returns:
+    list: One tuple per record with the values of RECORD_FIELDS (raw integer units).
+    """
+
+    with open(path, "rb") as result_file:
+        data = result_file.read()
+
+    capacity, next_seq = read_header(data)
+    return [struct.unpack_from(RECORD_FORMAT, data, HEADER_SIZE + slot * RECORD_SIZE)
+            for slot in _ordered_slots(capacity, next_seq)]
+
+
+def to_numpy(path):
+
+    """
+    Load the records into a NumPy structured array (one column per field, raw units).
+
+    Parameters:
+    path (str): Result file copied from the Pico.
+
+    Returns:
+    numpy.ndarray: Records in sequence order.
+    """
+
+    import numpy as np
+
+    with open(path, "rb") as result_file:
+        data = result_file.read()
+
+    capacity, next_seq = read_header(data)
+    slots = np.frombuffer(data, dtype=np.dtype(NUMPY_DTYPE), count=capacity, offset=HEADER_SIZE)
+    return slots[np.array(_ordered_slots(capacity, next_seq), dtype=np.intp)]
+
+
+def _format_row(record):
+    row = dict(zip(RECORD_FIELDS, record))
+    row["mode"] = MODE_NAMES.get(row["mode"], row["mode"])
+    row["verdict"] = VERDICT_NAMES.get(row["verdict"], row["verdict"])
+    row["cable_matrix"] = row["cable_matrix"].hex()
+    if row["channel"] == NO_CHANNEL:
+        row["channel"] = ""
+
+    for field, missing in MISSING.items():
+        if row[field] == missing:
+            row[field] = ""
+    return row
+
+
+def to_csv(path, out):
+
+    """
+    Write the records of a result file as CSV.
+
+    Parameters:
+    path (str): Result file copied from the Pico.
+    out (file): Text stream the CSV is written to.
+
+    Returns:
+    int: Number of records written.
+    """
+
+    records = read_records(path)
+    writer = csv.DictWriter(out, fieldnames=RECORD_FIELDS)
+    writer.writeheader()
+    for record in records:
+        writer.writerow(_format_row(record))
+    return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode a TESTER results.bin file.")
+    parser.add_argument("path", help="result file copied from the Pico")
+    parser.add_argument("--csv", help="output CSV file (default: standard output)")
+    args = parser.parse_args()
+
+    try:
+        if args.csv:
+            with open(args.csv, "w", newline="") as out:
+                count = to_csv(args.path, out)
+            print("Decoded {} records into {}".format(count, args.csv))
+        else:
+            to_csv(args.path, sys.stdout)
+
+    except (OSError, ValueError) as e:
+        parser.error("{}: {}".format(args.path, e))
+
+
+if __name__ == "__main__":
+    main()
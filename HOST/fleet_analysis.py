@@ -0,0 +1,335 @@
+# Fleet analytics over the results of all stations (fleet.bin, see fleet_store.py).
+# Records are memory-mapped as NumPy columns and every query is vectorized, so reports over
+# millions of boards take seconds. Requires NumPy.
+#
+#     python fleet_analysis.py fleet.bin                         # yield, distributions, drift, cable faults
+#     python fleet_analysis.py fleet.bin --columns fleet_cols    # also cache one .npy file per column
+#     python fleet_analysis.py big.bin --synthetic 5000000       # generate a synthetic history first
+
+import argparse
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+from decode_results import MISSING, MODE_NAMES, NUMPY_DTYPE
+from fleet_store import (FLEET_HEADER_FORMAT, FLEET_HEADER_SIZE, FLEET_MAGIC, FLEET_RECORD_SIZE, FLEET_VERSION,
+                         read_header)
+from result_store import MODE_WIRE, NO_CABLE_MATRIX, NO_CHANNEL, VERDICT_PASS
+
+# NumPy layout of one fleet record, identical to FLEET_RECORD_FORMAT
+FLEET_DTYPE = np.dtype([("station", "<u2"), ("board", "<u4")] + NUMPY_DTYPE)
+
+# Raw column to engineering units: (column, scale, unit)
+MEASUREMENTS = {
+    "bus_voltage": ("bus_mv", 1e-3, "V"),
+    "current": ("current_ma100", 1e-2, "mA"),
+    "co2": ("co2_ppm", 1.0, "ppm"),
+    "temperature": ("temperature_c100", 1e-2, "C"),
+    "humidity": ("humidity_c100", 1e-2, "%RH"),
+    "lux": ("lux_d10", 1e-1, "lux"),
+}
+
+NUM_WIRES = len(NO_CABLE_MATRIX)
+SECONDS_PER_DAY = 86400.0
+
+
+def load_fleet(path):
+
+    """
+    Memory-map a fleet file.
+
+    Parameters:
+    path (str): Fleet file written by fleet_store.FleetStore.
+
+    Returns:
+    numpy.memmap: Structured array of FLEET_DTYPE, one element per record.
+    """
+
+    with open(path, "rb") as fleet_file:
+        read_header(fleet_file.read(FLEET_HEADER_SIZE))
+
+    count = (os.path.getsize(path) - FLEET_HEADER_SIZE) // FLEET_RECORD_SIZE
+    if count == 0:
+        return np.zeros(0, dtype=FLEET_DTYPE)
+    return np.memmap(path, dtype=FLEET_DTYPE, mode="r", offset=FLEET_HEADER_SIZE, shape=(count,))
+
+
+def columns(records):
+
+    """
+    Return {field: column} of a structured record array. The columns are strided views of the
+    records (of the memory map for load_fleet()), nothing is copied: each analysis reads a column
+    once or twice, so a contiguous copy would cost more than it saves.
+    """
+
+    return {name: records[name] for name in FLEET_DTYPE.names}
+
+
+def save_columns(records, directory):
+
+    """
+    Store every field as its own .npy file, for memory-mapped columnar loading with load_columns().
+    """
+
+    os.makedirs(directory, exist_ok=True)
+    for name in FLEET_DTYPE.names:
+        np.save(os.path.join(directory, name + ".npy"), np.ascontiguousarray(records[name]))
+
+
+def load_columns(directory):
+
+    """Memory-map the columns written by save_columns()."""
+
+    return {name: np.load(os.path.join(directory, name + ".npy"), mmap_mode="r") for name in FLEET_DTYPE.names}
+
+
+def measurement(cols, name):
+
+    """
+    Return a measurement in engineering units and the mask of records that have it.
+
+    Parameters:
+    cols (dict): Columns from columns() or load_columns().
+    name (str): Key of MEASUREMENTS.
+
+    Returns:
+    tuple: Values (float64, one per record), valid mask (bool).
+    """
+
+    column, scale, _ = MEASUREMENTS[name]
+    raw = cols[column]
+    return raw * scale, raw != MISSING[column]
+
+
+def yield_per_mode(cols):
+
+    """
+    Pass rate of every test mode.
+
+    Returns:
+    dict: Mode name -> (tests run, tests passed, yield).
+    """
+
+    modes = cols["mode"]
+    length = max(MODE_NAMES) + 1
+    runs = np.bincount(modes, minlength=length)
+    passes = np.bincount(modes, weights=cols["verdict"] == VERDICT_PASS, minlength=length)
+
+    return {MODE_NAMES[code]: (int(runs[code]), int(passes[code]), passes[code] / runs[code])
+            for code in range(length) if runs[code]}
+
+
+def board_yield(cols):
+
+    """
+    Share of boards that passed every test they ran.
+
+    Returns:
+    tuple: Boards tested, boards passed.
+    """
+
+    boards, index = np.unique(cols["board"], return_inverse=True)
+    failures = np.bincount(index, weights=cols["verdict"] != VERDICT_PASS, minlength=len(boards))
+    return len(boards), int(np.count_nonzero(failures == 0))
+
+
+def distribution(cols, name, bins=20):
+
+    """
+    Distribution of a measurement over all records that have it.
+
+    Returns:
+    dict: count, mean, std, p1, p50, p99, histogram counts and bin edges.
+    """
+
+    values, valid = measurement(cols, name)
+    values = values[valid]
+    if not len(values):
+        return {"count": 0}
+
+    p1, p50, p99 = np.percentile(values, (1, 50, 99))
+    counts, edges = np.histogram(values, bins=bins)
+    return {
+        "count": len(values), "mean": values.mean(), "std": values.std(),
+        "p1": p1, "p50": p50, "p99": p99, "histogram": counts, "edges": edges,
+    }
+
+
+def drift_per_station(cols, name):
+
+    """
+    Mean and linear drift of a measurement on every station.
+
+    The drift is the least-squares slope against the record timestamp, computed for all
+    stations at once from per-station sums.
+
+    Returns:
+    dict: Station -> (samples, mean, drift per day).
+    """
+
+    values, valid = measurement(cols, name)
+    stations = cols["station"][valid]
+    y = values[valid]
+    if not len(y):
+        return {}
+
+    # Days from the mean timestamp; centring keeps the sums well conditioned
+    t = cols["timestamp"][valid].astype(np.float64)
+    x = (t - t.mean()) / SECONDS_PER_DAY
+
+    length = int(stations.max()) + 1
+    n = np.bincount(stations, minlength=length)
+    sx = np.bincount(stations, weights=x, minlength=length)
+    sy = np.bincount(stations, weights=y, minlength=length)
+    sxx = np.bincount(stations, weights=x * x, minlength=length)
+    sxy = np.bincount(stations, weights=x * y, minlength=length)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        denominator = n * sxx - sx * sx
+        slope = np.where(denominator > 0, (n * sxy - sx * sy) / denominator, 0.0)
+        mean = sy / n
+
+    return {station: (int(n[station]), mean[station], slope[station])
+            for station in np.flatnonzero(n)}
+
+
+def cable_fault_heatmap(cols):
+
+    """
+    Where cable faults occur.
+
+    For every wire test, the observed matrix (bit j of byte i: wire-out j read high while
+    wire-in i was driven) is compared with a good cable (only bit i set).
+
+    Returns:
+    numpy.ndarray: NUM_WIRES x NUM_WIRES counts. The diagonal counts opens of each wire, cell
+                   (i, j) off the diagonal counts wire-out j wrongly driven by wire-in i (short
+                   or crossed wires).
+    """
+
+    wire = (cols["mode"] == MODE_WIRE)
+    matrices = np.asarray(cols["cable_matrix"])[wire]
+    matrices = matrices[~np.all(matrices == 0xFF, axis=1)]
+    if not len(matrices):
+        return np.zeros((NUM_WIRES, NUM_WIRES), dtype=np.int64)
+
+    observed = np.unpackbits(matrices[:, :, np.newaxis], axis=2, bitorder="little")[:, :, :NUM_WIRES]
+    expected = np.eye(NUM_WIRES, dtype=np.uint8)
+    return np.count_nonzero(observed != expected, axis=0)
+
+
+def synthesize(path, count, stations=8, seed=0):
+
+    """
+    Write a synthetic fleet file, for trying the analyses at scale.
+
+    Parameters:
+    path (str): Output file (overwritten).
+    count (int): Number of records.
+    stations (int): Number of stations.
+    seed (int): Random seed.
+    """
+
+    rng = np.random.default_rng(seed)
+    records = np.zeros(count, dtype=FLEET_DTYPE)
+
+    records["station"] = rng.integers(0, stations, count)
+    records["board"] = np.arange(count) // 4
+    records["seq"] = np.arange(count)
+    records["mode"] = np.arange(count) % 4 + 1
+    records["verdict"] = rng.random(count) > 0.03
+    records["channel"] = NO_CHANNEL
+    records["timestamp"] = 1_704_067_200 + np.arange(count) * 10
+    records["duration_ms"] = rng.integers(300, 10000, count)
+
+    for column in MISSING:
+        records[column] = MISSING[column]
+
+    mode = records["mode"]
+    wire, current, co2, light = (mode == code for code in (1, 2, 3, 4))
+
+    matrix = np.tile((1 << np.arange(NUM_WIRES)).astype(np.uint8), (count, 1))
+    faulty = wire & (records["verdict"] == 0)
+    matrix[faulty, rng.integers(0, NUM_WIRES, count)[faulty]] = 0
+    matrix[~wire] = 0xFF
+    records["cable_matrix"] = matrix
+
+    # Slow drift of the bus voltage measured by each station
+    drift = records["station"] * 1e-6 * (records["timestamp"] - records["timestamp"][0]) / SECONDS_PER_DAY
+    records["bus_mv"][current] = (5000 + rng.normal(0, 20, count) + drift * 1000)[current]
+    records["current_ma100"][current] = rng.normal(12000, 190, count)[current]
+    records["co2_ppm"][co2] = rng.normal(650, 40, count)[co2]
+    records["temperature_c100"][co2] = rng.normal(2400, 150, count)[co2]
+    records["humidity_c100"][co2] = rng.normal(4500, 300, count)[co2]
+    records["lux_d10"][light] = rng.normal(28000, 2000, count)[light]
+
+    with open(path, "wb") as fleet_file:
+        fleet_file.write(struct.pack(FLEET_HEADER_FORMAT, FLEET_MAGIC, FLEET_VERSION, FLEET_RECORD_SIZE))
+        records.tofile(fleet_file)
+
+
+def report(cols):
+    records = len(cols["mode"])
+    print("Records: {}".format(records))
+
+    boards, passed = board_yield(cols)
+    print("Boards:  {} ({:.2%} passed every test)".format(boards, passed / boards if boards else 0))
+
+    print("\n{:<10}{:>12}{:>12}{:>10}".format("mode", "tests", "passed", "yield"))
+    for mode, (runs, passes, rate) in yield_per_mode(cols).items():
+        print("{:<10}{:>12}{:>12}{:>9.2%}".format(mode, runs, passes, rate))
+
+    print("\n{:<13}{:>6}{:>10}{:>12}{:>12}{:>12}{:>12}{:>12}".format(
+        "measurement", "unit", "count", "mean", "std", "p1", "p50", "p99"))
+    for name, (_, _, unit) in MEASUREMENTS.items():
+        stats = distribution(cols, name)
+        if stats["count"]:
+            print("{:<13}{:>6}{:>10}{:>12.3f}{:>12.3f}{:>12.3f}{:>12.3f}{:>12.3f}".format(
+                name, unit, stats["count"], stats["mean"], stats["std"], stats["p1"], stats["p50"], stats["p99"]))
+
+    for name in ("bus_voltage", "co2", "lux"):
+        drift = drift_per_station(cols, name)
+        if not drift:
+            continue
+        unit = MEASUREMENTS[name][2]
+        print("\nDrift of {} per station".format(name))
+        print("{:>8}{:>10}{:>12}{:>16}".format("station", "samples", "mean", unit + "/day"))
+        for station, (samples, mean, slope) in drift.items():
+            print("{:>8}{:>10}{:>12.3f}{:>16.5f}".format(station, samples, mean, slope))
+
+    heatmap = cable_fault_heatmap(cols)
+    print("\nCable faults (row: driven wire-in, column: wire-out; diagonal: open)")
+    print("    " + "".join("{:>8}".format("out{}".format(j)) for j in range(NUM_WIRES)))
+    for i in range(NUM_WIRES):
+        print("in{} ".format(i) + "".join("{:>8}".format(heatmap[i, j]) for j in range(NUM_WIRES)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse the fleet result file.")
+    parser.add_argument("path", help="fleet file (fleet.bin)")
+    parser.add_argument("--columns", help="directory of a per-column .npy cache (created if missing)")
+    parser.add_argument("--synthetic", type=int, help="first write this many synthetic records to path")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        synthesize(args.path, args.synthetic)
+
+    start = time.perf_counter()
+    if args.columns and os.path.isdir(args.columns):
+        cols = load_columns(args.columns)
+    else:
+        cols = columns(load_fleet(args.path))
+        if args.columns:
+            save_columns(cols, args.columns)
+    loaded = time.perf_counter()
+
+    report(cols)
+    print("\nLoad {:.2f} s, analysis {:.2f} s".format(loaded - start, time.perf_counter() - loaded))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
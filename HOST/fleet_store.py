@@ -0,0 +1,114 @@
+# Host-side store of the results of every station of the line.
+# One append-only file of fixed-size records: the station and board ids followed by the result
+# record the station sent (same layout as TESTER/result_store.py), so the file can be
+# memory-mapped as columns by the analysis tools.
+
+import os
+import struct
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "TESTER"))
+
+from result_store import RECORD_FIELDS, RECORD_FORMAT, RECORD_SIZE  # noqa: E402
+
+FLEET_MAGIC = b"CTFL"
+FLEET_VERSION = 3
+
+# Header: magic, version, record size
+FLEET_HEADER_FORMAT = "<4sHH"
+FLEET_HEADER_SIZE = struct.calcsize(FLEET_HEADER_FORMAT)
+
+# Record: station id, board id, result record
+FLEET_RECORD_FORMAT = "<HI" + RECORD_FORMAT[1:]
+FLEET_RECORD_SIZE = struct.calcsize(FLEET_RECORD_FORMAT)
+FLEET_FIELDS = ("station", "board") + RECORD_FIELDS
+
+
+class FleetStore:
+
+    """
+    Append-only fleet result file.
+
+    Records are buffered and written with flush() (or when the store is closed).
+    """
+
+    def __init__(self, path):
+
+        """
+        Parameters:
+        path (str): Fleet file, created if it does not exist.
+        """
+
+        self.path = path
+        self.pending = []
+        self.count = 0
+
+        if os.path.exists(path) and os.path.getsize(path) >= FLEET_HEADER_SIZE:
+            with open(path, "rb") as fleet_file:
+                read_header(fleet_file.read(FLEET_HEADER_SIZE))
+            self.count = (os.path.getsize(path) - FLEET_HEADER_SIZE) // FLEET_RECORD_SIZE
+            # Drop a record cut short by an interrupted write, so new records stay aligned
+            os.truncate(path, FLEET_HEADER_SIZE + self.count * FLEET_RECORD_SIZE)
+        else:
+            with open(path, "wb") as fleet_file:
+                fleet_file.write(struct.pack(FLEET_HEADER_FORMAT, FLEET_MAGIC, FLEET_VERSION, FLEET_RECORD_SIZE))
+
+    def append(self, station, board, record):
+
+        """
+        Add one result.
+
+        Parameters:
+        station (int): Station id.
+        board (int): Board id (serial number of the board under test).
+        record (bytes): Result record sent by the station.
+        """
+
+        if len(record) != RECORD_SIZE:
+            raise ValueError("result record of {} bytes, expected {}".format(len(record), RECORD_SIZE))
+        self.pending.append(struct.pack("<HI", station, board) + bytes(record))
+        self.count += 1
+
+    def flush(self):
+        if self.pending:
+            with open(self.path, "ab") as fleet_file:
+                fleet_file.write(b"".join(self.pending))
+            self.pending = []
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_header(data):
+
+    """Check the header of a fleet file."""
+
+    magic, version, record_size = struct.unpack_from(FLEET_HEADER_FORMAT, data, 0)
+    if magic != FLEET_MAGIC:
+        raise ValueError("Not a fleet result file")
+    if version != FLEET_VERSION or record_size != FLEET_RECORD_SIZE:
+        raise ValueError("Unsupported fleet file version {} / record size {}".format(version, record_size))
+
+
+def read_fleet(path):
+
+    """
+    Read all records of a fleet file.
+
+    Returns:
+    list: One tuple per record with the values of FLEET_FIELDS (raw integer units).
+    """
+
+    with open(path, "rb") as fleet_file:
+        data = fleet_file.read()
+
+    read_header(data)
+    # A record cut short by an interrupted write is ignored
+    end = len(data) - (len(data) - FLEET_HEADER_SIZE) % FLEET_RECORD_SIZE
+    return list(struct.iter_unpack(FLEET_RECORD_FORMAT, data[FLEET_HEADER_SIZE:end]))
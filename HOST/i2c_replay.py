@@ -0,0 +1,318 @@
+# Host-side replay of the I2C traces written by TESTER/i2c_trace.py.
+# The recorded transactions are fed back into the unmodified TESTER drivers through a fake I2C
+# object, on the simulator's virtual clock, so a captured station session re-runs at full CPU
+# speed. Every write and read the drivers make must match the trace.
+#
+#     python i2c_replay.py i2c_trace.bin                       # replay a trace copied from the Pico
+#     python i2c_replay.py trace.bin --record --cycles 20      # record a trace on the simulator
+#     python i2c_replay.py trace.bin --record --mux 0,1,2,3 --alert-pin 22
+#
+# ModeSelect is created with the settings saved in the trace's init mark (multiplexer channels,
+# INA226 alert pin), like main() created it on the station.
+
+import argparse
+import itertools
+import os
+import shutil
+import sys
+import time
+from collections import namedtuple
+
+from tester_sim import Board, MODE_BUTTON_PINS, Simulation
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "TESTER"))
+
+from i2c_trace import (MAGIC, KIND_WRITE, KIND_READ, KIND_WRITE_MEM, KIND_READ_MEM,  # noqa: E402
+                       KIND_MARK, FLAG_ERROR, FLAG_MORE, MARK_INIT)
+
+KIND_NAMES = {KIND_WRITE: "writeto", KIND_READ: "readfrom", KIND_WRITE_MEM: "writeto_mem",
+              KIND_READ_MEM: "readfrom_mem", KIND_MARK: "mark"}
+
+Record = namedtuple("Record", "kind addr reg data delta_us error")
+
+
+def init_settings(label):
+
+    """
+    Return the ModeSelect keyword arguments saved in an init mark (see i2c_trace.init_label()),
+    or None if the label is not an init mark.
+    """
+
+    fields = label.split()
+    if not fields or fields[0] != MARK_INIT:
+        return None
+
+    settings = {}
+    for field in fields[1:]:
+        name, _, value = field.partition("=")
+        if name == "mux":
+            settings["mux_channels"] = tuple(int(channel) for channel in value.split(","))
+        elif name == "alert":
+            settings["ina_alert_pin"] = int(value)
+    return settings
+
+
+class ReplayMismatch(BaseException):
+
+    """
+    The drivers did something the trace does not contain.
+
+    Derived from BaseException so the drivers' own "except Exception" handlers cannot hide it.
+    """
+
+
+def read_trace(path):
+
+    """
+    Parse a trace file.
+
+    Parameters:
+    path (str): Trace file copied from the Pico.
+
+    Returns:
+    list: Record tuples in recording order, one per transaction (the pieces of a transfer longer
+          than 255 bytes are joined). error is True for a transaction that raised OSError, its data
+          then holds the errno.
+    """
+
+    with open(path, "rb") as trace_file:
+        data = trace_file.read()
+
+    if not data.startswith(MAGIC):
+        raise ValueError("{} is not an I2C trace".format(path))
+
+    records = []
+    more = False                # The previous record continues in this one
+    i = len(MAGIC)
+    while i < len(data):
+        if i + 6 > len(data):
+            raise ValueError("truncated record at byte {}".format(i))
+
+        kind, addr, reg, size = data[i], data[i + 1], data[i + 2], data[i + 3]
+        delta = data[i + 4] | data[i + 5] << 8
+        i += 6
+        if delta == 0xFFFF:
+            delta = int.from_bytes(data[i:i + 4], "little")
+            i += 4
+
+        chunk = bytes(data[i:i + size])
+        if more:
+            records[-1] = records[-1]._replace(data=records[-1].data + chunk)
+        else:
+            records.append(Record(kind & ~(FLAG_ERROR | FLAG_MORE), addr, reg, chunk, delta,
+                                  bool(kind & FLAG_ERROR)))
+        more = bool(kind & FLAG_MORE)
+        i += size
+
+    return records
+
+
+class ReplayI2C:
+
+    """
+    machine.I2C stand-in which answers the drivers from a trace.
+
+    Writes are checked against the recorded bytes, reads return the recorded bytes and recorded
+    errors are raised again as OSError.
+    """
+
+    def __init__(self, records):
+
+        """
+        Parameters:
+        records (list): Records returned by read_trace().
+        """
+
+        self.records = records
+        self.position = 0
+
+    def at_end(self):
+        return self.position >= len(self.records)
+
+    def next_mark(self):
+
+        """Consume the next record, which must be a mark, and return its label."""
+
+        record = self._next(KIND_MARK, 0, 0)
+        return record.data.decode()
+
+    def _next(self, kind, addr, reg):
+        if self.at_end():
+            raise ReplayMismatch("{} 0x{:02x} after the end of the trace".format(KIND_NAMES[kind], addr))
+
+        record = self.records[self.position]
+        if (record.kind, record.addr, record.reg) != (kind, addr, reg):
+            raise ReplayMismatch("record {}: expected {} 0x{:02x} reg 0x{:02x}, got {} 0x{:02x} reg 0x{:02x}".format(
+                self.position, KIND_NAMES.get(record.kind, record.kind), record.addr, record.reg,
+                KIND_NAMES[kind], addr, reg))
+
+        self.position += 1
+        if record.error:
+            raise OSError(record.data[0] if record.data else 0)
+        return record
+
+    def _write(self, kind, addr, reg, buf):
+        record = self._next(kind, addr, reg)
+        if bytes(buf) != record.data:
+            raise ReplayMismatch("record {}: wrote {} to 0x{:02x}, trace has {}".format(
+                self.position - 1, bytes(buf).hex(), addr, record.data.hex()))
+
+    def _read(self, kind, addr, reg, nbytes):
+        record = self._next(kind, addr, reg)
+        if nbytes != len(record.data):
+            raise ReplayMismatch("record {}: read {} bytes from 0x{:02x}, trace has {}".format(
+                self.position - 1, nbytes, addr, len(record.data)))
+        return record.data
+
+    def scan(self):
+        return []
+
+    def writeto(self, addr, buf, stop=True):
+        self._write(KIND_WRITE, addr, 0, buf)
+        return 1
+
+    def readfrom(self, addr, nbytes, stop=True):
+        return self._read(KIND_READ, addr, 0, nbytes)
+
+    def readfrom_into(self, addr, buf, stop=True):
+        buf[:] = self._read(KIND_READ, addr, 0, len(buf))
+
+    def writeto_mem(self, addr, memaddr, buf, addrsize=8):
+        self._write(KIND_WRITE_MEM, addr, memaddr & 0xFF, buf)
+
+    def readfrom_mem(self, addr, memaddr, nbytes, addrsize=8):
+        return self._read(KIND_READ_MEM, addr, memaddr & 0xFF, nbytes)
+
+    def readfrom_mem_into(self, addr, memaddr, buf, addrsize=8):
+        buf[:] = self._read(KIND_READ_MEM, addr, memaddr & 0xFF, len(buf))
+
+
+def replay(records, repeat=1):
+
+    """
+    Re-run the recorded ModeSelect creations and tests against the trace.
+
+    Parameters:
+    records (list): Records returned by read_trace().
+    repeat (int): Number of passes over the trace.
+
+    Returns:
+    dict: Verdicts of the tests of the last pass, transactions replayed, recorded and wall-clock
+          seconds.
+    """
+
+    sim = Simulation(Board(devices=False))
+    mode_select = sim.load("mode_select")
+    recorded_us = sum(record.delta_us for record in records)
+
+    wall_start = time.perf_counter()
+    with sim.running():
+        for _ in range(repeat):
+            i2c = ReplayI2C(records)
+            selector = None
+            verdicts = []
+
+            while not i2c.at_end():
+                label = i2c.next_mark()
+                settings = init_settings(label)
+                if settings is not None:
+                    selector = mode_select.ModeSelect(i2c, **settings)
+                elif selector is None:
+                    raise ReplayMismatch("test {} recorded before ModeSelect was created".format(label))
+                else:
+                    verdicts.append((label, selector.execute_test(label)))
+
+    return {
+        "verdicts": verdicts,
+        "transactions": sum(1 for record in records if record.kind != KIND_MARK) * repeat,
+        "recorded_s": recorded_us / 1e6 * repeat,
+        "wall_s": time.perf_counter() - wall_start,
+    }
+
+
+def record(path, modes, cycles, channels=None, alert_pin=None):
+
+    """
+    Record a trace of the main() loop on the simulator, as the station would with TRACE_I2C.
+
+    Parameters:
+    path (str): Output trace file.
+    modes (list): Modes pressed in turn.
+    cycles (int): Number of button presses.
+    channels (tuple): TCA9548A channels with a board (MUX_CHANNELS), None: one board without
+                      multiplexer.
+    alert_pin (int): INA_ALERT_PIN of the station, None: no alert.
+    """
+
+    board = Board(devices=not channels)
+    if channels:
+        # Boards on every channel up to the highest one, the unlisted ones are never selected
+        board.attach_mux(max(channels) + 1)
+    sim = Simulation(board)
+    main = sim.load("main")
+    main.TRACE_I2C = True
+    main.MUX_CHANNELS = tuple(channels) if channels else None
+    main.INA_ALERT_PIN = alert_pin
+    sim.run_main(itertools.islice(itertools.cycle(modes), cycles))
+
+    with sim.running():
+        sim.load("i2c_trace").TRACE.stop()
+    shutil.copyfile(os.path.join(sim.workdir, "i2c_trace.bin"), path)
+
+
+def mux_channels(value):
+
+    """Parse the --mux argument: comma-separated TCA9548A channels (0-7)."""
+
+    try:
+        channels = tuple(int(channel) for channel in value.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected channels like 0,1,2,3, got {!r}".format(value))
+    if not channels or any(not 0 <= channel <= 7 for channel in channels) or len(set(channels)) != len(channels):
+        raise argparse.ArgumentTypeError("channels must be distinct and between 0 and 7, got {!r}".format(value))
+    return channels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay an I2C trace into the TESTER drivers.")
+    parser.add_argument("trace", help="trace file (i2c_trace.bin)")
+    parser.add_argument("--repeat", type=int, default=1, help="passes over the trace")
+    parser.add_argument("--record", action="store_true", help="record the trace on the simulator first")
+    parser.add_argument("--cycles", type=int, default=8, help="button presses to record")
+    parser.add_argument("--modes", nargs="+", default=list(MODE_BUTTON_PINS), help="modes to record")
+    parser.add_argument("--mux", type=mux_channels, default=None,
+                        help="multiplexer channels with a board when recording, e.g. 0,1,2,3")
+    parser.add_argument("--alert-pin", type=int, default=None, help="INA226 alert pin when recording")
+    parser.add_argument("--dump", action="store_true", help="print every record")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.trace, args.modes, args.cycles, args.mux, args.alert_pin)
+
+    if not os.path.isfile(args.trace):
+        parser.error("trace file {} not found (use --record to record one on the simulator)".format(args.trace))
+    records = read_trace(args.trace)
+
+    if args.dump:
+        for index, rec in enumerate(records):
+            print("{:>6} {:>9} us  {:<13} 0x{:02x} reg 0x{:02x} {}{}".format(
+                index, rec.delta_us, KIND_NAMES.get(rec.kind, rec.kind), rec.addr, rec.reg,
+                rec.data.hex(), "  ERROR" if rec.error else ""))
+
+    try:
+        stats = replay(records, args.repeat)
+    except ReplayMismatch as e:
+        print("Replay diverged from the trace: {}".format(e))
+        return 1
+
+    print("Transactions replayed: {}".format(stats["transactions"]))
+    print("Recorded time:         {:.1f} s".format(stats["recorded_s"]))
+    print("Replay time:           {:.3f} s".format(stats["wall_s"]))
+    print("Speed-up:              {:.0f}x".format(stats["recorded_s"] / max(stats["wall_s"], 1e-9)))
+    for mode, passed in stats["verdicts"]:
+        print("  {:<18} {}".format(mode, {True: "pass", False: "fail", None: "error"}[passed]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,329 @@
+# Runs many TESTER stations in parallel from one computer.
+# Each station (HOST_COMMANDS = True in main.py) is driven over its USB serial port with the
+# protocol of TESTER/host_protocol.py. One asyncio task per station takes the next board from a
+# shared queue and runs the full sequence, so every station stays busy; all results go to one
+# fleet file (fleet_store.py).
+#
+#     python orchestrator.py /dev/ttyACM0 /dev/ttyACM1 --boards 100
+#     python orchestrator.py --simulate 4 --boards 200 --speed 50      # simulated stations on pseudo-terminals
+#     python orchestrator.py --scaling 1 2 4 8 --boards 64 --speed 50  # throughput against station count
+
+import argparse
+import asyncio
+import os
+import struct
+import sys
+import tempfile
+import time
+
+from fleet_store import FleetStore
+from tester_client import RawPort, TesterError, STATUS_NAMES, DEFAULT_TIMEOUT, TEST_TIMEOUT
+from tester_sim.station import SimulatedStation
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "TESTER"))
+
+from protocol_frames import (PROTOCOL_VERSION, RESPONSE_FLAG, FrameParser, encode_frame,  # noqa: E402
+                             CMD_PING, CMD_RUN_SEQUENCE, CMD_EXIT, STATUS_OK, STATUS_ERROR)
+from result_store import RECORD_SIZE, VERDICT_PASS  # noqa: E402
+
+DEFAULT_FLEET_FILE = "fleet.bin"
+
+
+class AsyncTesterClient:
+
+    """
+    asyncio client of one station.
+
+    Responses are matched to their requests by request id, so several requests may be in flight.
+    """
+
+    def __init__(self, path):
+
+        """
+        Parameters:
+        path (str): Serial port of the station.
+        """
+
+        self.port = RawPort(path)
+        os.set_blocking(self.port.fd, False)
+        self.parser = FrameParser()
+        self.request_id = 0
+        self.pending = {}
+        self.loop = asyncio.get_running_loop()
+        self.loop.add_reader(self.port.fd, self._on_readable)
+
+    def _on_readable(self):
+        try:
+            data = os.read(self.port.fd, 4096)
+        except BlockingIOError:
+            return
+
+        for byte in data:
+            complete = self.parser.feed(byte)
+            while complete:
+                future = self.pending.pop(self.parser.request_id, None)
+                if future is not None and not future.done():
+                    future.set_result((self.parser.command, self.parser.payload))
+                complete = self.parser.next_frame()
+
+    async def request(self, command, payload=b"", timeout=DEFAULT_TIMEOUT):
+
+        """Send a request and return its response payload after the status byte."""
+
+        self.request_id = (self.request_id + 1) & 0xFFFF
+        future = self.pending[self.request_id] = self.loop.create_future()
+        self.port.write(encode_frame(self.request_id, command, payload))
+
+        try:
+            response_command, response = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.pending.pop(self.request_id, None)
+            raise TesterError("no response to command 0x{:02x}".format(command))
+
+        if response_command != command | RESPONSE_FLAG:
+            raise TesterError("response to command 0x{:02x} for command 0x{:02x}".format(
+                response_command & ~RESPONSE_FLAG, command))
+
+        status, response = response[0], response[1:]
+        if status == STATUS_ERROR:
+            raise TesterError("command 0x{:02x} failed with error code {}".format(
+                command, struct.unpack("<i", response)[0]))
+        if status != STATUS_OK:
+            raise TesterError("command 0x{:02x}: {}".format(command, STATUS_NAMES.get(status, status)))
+        return response
+
+    async def ping(self):
+        version = (await self.request(CMD_PING))[0]
+        if version != PROTOCOL_VERSION:
+            raise TesterError("station speaks protocol version {}, expected {}".format(version, PROTOCOL_VERSION))
+
+    async def run_sequence(self, fail_fast=True):
+
+        """
+        Run the full-board sequence.
+
+        Returns:
+        tuple: True if every test passed, list of the packed result records of the tests run.
+        """
+
+        response = await self.request(CMD_RUN_SEQUENCE, bytes([1 if fail_fast else 0]), TEST_TIMEOUT)
+        step = 1 + RECORD_SIZE
+        records = [response[i + 1:i + step] for i in range(1, len(response), step)]
+        return response[0] == VERDICT_PASS, records
+
+    async def exit(self):
+        await self.request(CMD_EXIT)
+
+    def close(self):
+        self.loop.remove_reader(self.port.fd)
+        self.port.close()
+
+
+class Orchestrator:
+
+    """
+    Dispatches boards to stations and collects their results.
+
+    A worker task per station takes board ids from a shared queue until it gets the None sentinel.
+    A station that stops answering is dropped and its board goes back to the queue for another
+    station; when no station is left, the boards still queued are listed in untested.
+    """
+
+    def __init__(self, ports, store, fail_fast=True, swap_s=0.0):
+
+        """
+        Parameters:
+        ports (list): Serial ports of the stations; the station id is the index in this list.
+        store (FleetStore): Receives every result record.
+        fail_fast (bool): Stop a board's sequence at its first failed test.
+        swap_s (float): Seconds the operator needs to swap the board between two sequences.
+        """
+
+        self.ports = list(ports)
+        self.store = store
+        self.fail_fast = fail_fast
+        self.swap_s = swap_s
+        self.passed = 0
+        self.failed = 0
+        self.per_station = [0] * len(self.ports)
+        self.errors = []
+        self.untested = []
+        self._stations_left = 0
+
+    async def _connect(self, station):
+        try:
+            client = AsyncTesterClient(self.ports[station])
+            await client.ping()
+            return client
+        except (OSError, TesterError) as e:
+            self.errors.append("station {}: {}".format(station, e))
+            return None
+
+    def _drain(self, queue):
+        # No station is left: every queued board is untested, and queue.join() can return
+        while not queue.empty():
+            self.untested.append(queue.get_nowait())
+            queue.task_done()
+
+    async def _worker(self, station, client, queue):
+        while True:
+            board = await queue.get()
+            if board is None:
+                queue.task_done()
+                return
+
+            if self.swap_s:
+                await asyncio.sleep(self.swap_s)
+
+            try:
+                passed, records = await client.run_sequence(self.fail_fast)
+            except (OSError, TesterError) as e:
+                self.errors.append("station {}: {}".format(station, e))
+                # Queued again before task_done(), so queue.join() keeps waiting for it
+                queue.put_nowait(board)
+                queue.task_done()
+                self._stations_left -= 1
+                if not self._stations_left:
+                    self._drain(queue)
+                return
+
+            for record in records:
+                self.store.append(station, board, record)
+            self.per_station[station] += 1
+            if passed:
+                self.passed += 1
+            else:
+                self.failed += 1
+            queue.task_done()
+
+    async def run(self, boards):
+
+        """
+        Test boards on all stations.
+
+        Parameters:
+        boards (iterable): Board ids to test.
+
+        Returns:
+        float: Wall-clock seconds from the moment every station answered until every board was
+               tested, or listed in untested if every station failed.
+        """
+
+        queue = asyncio.Queue()
+        for board in boards:
+            queue.put_nowait(board)
+
+        clients = await asyncio.gather(*(self._connect(station) for station in range(len(self.ports))))
+
+        start = time.perf_counter()
+        workers = [asyncio.create_task(self._worker(station, client, queue))
+                   for station, client in enumerate(clients) if client is not None]
+        self._stations_left = len(workers)
+        if not workers:
+            self._drain(queue)
+
+        try:
+            await queue.join()
+            for _ in workers:
+                queue.put_nowait(None)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            for client in clients:
+                if client is not None:
+                    client.close()
+            self.store.flush()
+        return time.perf_counter() - start
+
+
+async def shutdown(ports):
+
+    """Send the exit command to every station (simulated stations then end)."""
+
+    for port in ports:
+        client = AsyncTesterClient(port)
+        try:
+            await client.exit()
+        except TesterError:
+            pass
+        finally:
+            client.close()
+
+
+def run_simulated(count, boards, store, speed, fail_rate, swap_s=0.0):
+
+    """
+    Run boards on count simulated stations.
+
+    Returns:
+    tuple: Orchestrator, wall-clock seconds.
+    """
+
+    stations = [SimulatedStation(speed=speed, fail_rate=fail_rate, seed=index) for index in range(count)]
+    try:
+        orchestrator = Orchestrator([station.port for station in stations], store, swap_s=swap_s)
+        wall_s = asyncio.run(orchestrator.run(range(boards)))
+        asyncio.run(shutdown([station.port for station in stations]))
+    finally:
+        for station in stations:
+            station.close()
+    return orchestrator, wall_s
+
+
+def report(orchestrator, wall_s, speed=None):
+    boards = orchestrator.passed + orchestrator.failed
+    per_hour = boards / wall_s * 3600 if wall_s else 0.0
+    print("Boards tested:       {} ({} passed, {} failed)".format(boards, orchestrator.passed, orchestrator.failed))
+    print("Per station:         {}".format(orchestrator.per_station))
+    print("Wall-clock time:     {:.2f} s".format(wall_s))
+    print("Throughput:          {:.0f} boards/hour".format(per_hour))
+    if speed:
+        print("At station speed:    {:.0f} boards/hour".format(per_hour / speed))
+    if orchestrator.untested:
+        print("Untested boards:     {} {}".format(len(orchestrator.untested), sorted(orchestrator.untested)))
+    for error in orchestrator.errors:
+        print("  " + error)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many TESTER stations in parallel.")
+    parser.add_argument("ports", nargs="*", help="serial ports of the stations")
+    parser.add_argument("--boards", type=int, default=20, help="number of boards to test")
+    parser.add_argument("--store", default=DEFAULT_FLEET_FILE, help="fleet result file")
+    parser.add_argument("--swap", type=float, default=0.0, help="seconds to swap a board")
+    parser.add_argument("--simulate", type=int, default=0, help="number of simulated stations")
+    parser.add_argument("--scaling", type=int, nargs="+", help="simulated station counts to compare")
+    parser.add_argument("--speed", type=float, default=None,
+                        help="simulated seconds per wall-clock second of the simulated stations")
+    parser.add_argument("--fail-rate", type=float, default=0.1, help="share of faulty simulated boards")
+    args = parser.parse_args()
+
+    if args.scaling:
+        print("{:>9}{:>12}{:>16}{:>12}".format("stations", "wall s", "boards/hour", "scaling"))
+        base = None
+        for count in args.scaling:
+            with tempfile.TemporaryDirectory() as workdir, FleetStore(os.path.join(workdir, "fleet.bin")) as store:
+                orchestrator, wall_s = run_simulated(count, args.boards, store, args.speed, args.fail_rate, args.swap)
+            per_hour = args.boards / wall_s * 3600
+            base = base or per_hour / count
+            print("{:>9}{:>12.2f}{:>16.0f}{:>11.2f}x".format(count, wall_s, per_hour, per_hour / base))
+        return 0
+
+    with FleetStore(args.store) as store:
+        if args.simulate:
+            orchestrator, wall_s = run_simulated(args.simulate, args.boards, store, args.speed,
+                                                 args.fail_rate, args.swap)
+        elif args.ports:
+            orchestrator = Orchestrator(args.ports, store, swap_s=args.swap)
+            wall_s = asyncio.run(orchestrator.run(range(args.boards)))
+        else:
+            parser.error("give the serial ports of the stations or --simulate N")
+
+    report(orchestrator, wall_s, args.speed if args.simulate else None)
+    print("Results appended to {} ({} records)".format(args.store, store.count))
+    return 1 if orchestrator.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
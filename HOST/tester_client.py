@@ -0,0 +1,341 @@
+# Host client of the binary command protocol of TESTER/host_protocol.py.
+# Set HOST_COMMANDS = True in main.py, then drive the station from a computer:
+#
+#     python tester_client.py /dev/ttyACM0 ping
+#     python tester_client.py /dev/ttyACM0 sequence
+#     python tester_client.py /dev/ttyACM0 test co2_test_mode
+#     python tester_client.py /dev/ttyACM0 timing
+#     python tester_client.py /dev/ttyACM0 wiggle --window 10000
+#
+# pyserial is used when installed; otherwise the port is opened directly (POSIX only).
+
+import argparse
+import os
+import select
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "TESTER"))
+
+from protocol_frames import (PROTOCOL_VERSION, RESPONSE_FLAG, FrameParser, encode_frame,  # noqa: E402
+                             CMD_PING, CMD_RUN_TEST, CMD_RUN_SEQUENCE, CMD_MEASUREMENTS, CMD_LAST_RESULT,
+                             CMD_TIMING, CMD_RESET_TIMING, CMD_GET_SETTING, CMD_SET_SETTING, CMD_WIGGLE,
+                             CMD_EXIT, STATUS_OK, STATUS_ERROR, SETTING_DEBOUNCE_MS, SETTING_TIMING_ENABLED,
+                             SETTING_LOG_LEVEL, TIMING_FORMAT, TIMING_SIZE, WIGGLE_SUMMARY_FORMAT,
+                             WIGGLE_SUMMARY_SIZE, WIGGLE_EVENT_FORMAT, WIGGLE_EVENT_SIZE)
+from result_store import MODE_CODES, RECORD_FIELDS, RECORD_FORMAT, RECORD_SIZE  # noqa: E402
+from timing import SPAN_NAMES  # noqa: E402
+
+DEFAULT_TIMEOUT = 5.0           # Seconds to wait for a response to a quick command
+TEST_TIMEOUT = 120.0            # Seconds to wait for a test or a sequence (the CO2 test takes ~30 s)
+
+SETTINGS = {
+    "debounce_ms": SETTING_DEBOUNCE_MS,
+    "timing_enabled": SETTING_TIMING_ENABLED,
+    "log_level": SETTING_LOG_LEVEL,
+}
+
+STATUS_NAMES = {0: "ok", 1: "unknown command", 2: "bad request", 3: "error"}
+
+
+class TesterError(Exception):
+
+    """The station answered with an error status or did not answer at all."""
+
+
+class RawPort:
+
+    """Serial port opened without pyserial: raw mode, non-blocking reads with a timeout."""
+
+    def __init__(self, path):
+        import termios
+        import tty
+
+        self.fd = os.open(path, os.O_RDWR | os.O_NOCTTY)
+        if os.isatty(self.fd):
+            tty.setraw(self.fd, termios.TCSANOW)
+
+    def read(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        return os.read(self.fd, 4096) if ready else b""
+
+    def write(self, data):
+        while data:
+            data = data[os.write(self.fd, data):]
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PySerialPort:
+
+    """Serial port opened with pyserial."""
+
+    def __init__(self, path):
+        import serial
+
+        self.serial = serial.Serial(path, 115200, timeout=0)
+
+    def read(self, timeout):
+        self.serial.timeout = timeout
+        data = self.serial.read(1)
+        return data + self.serial.read(self.serial.in_waiting) if data else b""
+
+    def write(self, data):
+        self.serial.write(data)
+
+    def close(self):
+        self.serial.close()
+
+
+def open_port(path):
+
+    """Open a serial port, with pyserial if it is installed."""
+
+    try:
+        import serial  # noqa: F401
+    except ImportError:
+        return RawPort(path)
+    return PySerialPort(path)
+
+
+def decode_record(data):
+
+    """
+    Unpack a result record (see result_store.py).
+
+    Returns:
+    dict: Values of RECORD_FIELDS in raw integer units.
+    """
+
+    return dict(zip(RECORD_FIELDS, struct.unpack(RECORD_FORMAT, data)))
+
+
+class TesterClient:
+
+    """
+    Synchronous client of one station.
+
+    Each request carries a new request id; responses with other ids (late answers to a request
+    that timed out) and bytes outside frames are skipped.
+    """
+
+    def __init__(self, port):
+
+        """
+        Parameters:
+        port: Object with read(timeout) and write(data), e.g. from open_port().
+        """
+
+        self.port = port
+        self.parser = FrameParser()
+        self.request_id = 0
+
+    def request(self, command, payload=b"", timeout=DEFAULT_TIMEOUT):
+
+        """
+        Send a request and wait for its response.
+
+        Parameters:
+        command (int): One of the CMD_* codes.
+        payload (bytes): Request payload.
+        timeout (float): Seconds to wait for the response.
+
+        Returns:
+        bytes: Response payload after the status byte.
+        """
+
+        self.request_id = (self.request_id + 1) & 0xFFFF
+        self.port.write(encode_frame(self.request_id, command, payload))
+
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TesterError("no response to command 0x{:02x}".format(command))
+
+            for byte in self.port.read(remaining):
+                parser = self.parser
+                complete = parser.feed(byte)
+                while complete and (parser.request_id != self.request_id or parser.command != command | RESPONSE_FLAG):
+                    complete = parser.next_frame()
+                if not complete:
+                    continue
+
+                status, response = parser.payload[0], parser.payload[1:]
+                if status == STATUS_ERROR:
+                    raise TesterError("command 0x{:02x} failed with error code {}".format(
+                        command, struct.unpack("<i", response)[0]))
+                if status != STATUS_OK:
+                    raise TesterError("command 0x{:02x}: {}".format(command, STATUS_NAMES.get(status, status)))
+                return response
+
+    def ping(self):
+
+        """Return the protocol version of the station."""
+
+        version = self.request(CMD_PING)[0]
+        if version != PROTOCOL_VERSION:
+            raise TesterError("station speaks protocol version {}, expected {}".format(version, PROTOCOL_VERSION))
+        return version
+
+    def run_test(self, mode):
+
+        """
+        Run one test.
+
+        Parameters:
+        mode (str): Mode name, e.g. "wire_test_mode".
+
+        Returns:
+        dict: The result record of the test.
+        """
+
+        response = self.request(CMD_RUN_TEST, bytes([MODE_CODES[mode]]), TEST_TIMEOUT)
+        return decode_record(response[1:])
+
+    def run_sequence(self, fail_fast=True):
+
+        """
+        Run the full-board sequence.
+
+        Returns:
+        tuple: True if every test passed, list of the result records of the tests run.
+        """
+
+        response = self.request(CMD_RUN_SEQUENCE, bytes([1 if fail_fast else 0]), TEST_TIMEOUT)
+        step = 1 + RECORD_SIZE
+        records = [decode_record(response[i + 1:i + step]) for i in range(1, len(response), step)]
+        return response[0] == 1, records
+
+    def measurements(self):
+
+        """Return the last measurement of every mode as one record."""
+
+        return decode_record(self.request(CMD_MEASUREMENTS))
+
+    def last_result(self):
+
+        """Return the last stored result record, or None."""
+
+        response = self.request(CMD_LAST_RESULT)
+        return decode_record(response) if response else None
+
+    def timing(self):
+
+        """Return {span name: (count, p50 us, p99 us, max us)} of every span with samples."""
+
+        response = self.request(CMD_TIMING)
+        report = {}
+        for offset in range(0, len(response), TIMING_SIZE):
+            span, count, p50, p99, maximum = struct.unpack_from(TIMING_FORMAT, response, offset)
+            report[SPAN_NAMES[span]] = (count, p50, p99, maximum)
+        return report
+
+    def reset_timing(self):
+        self.request(CMD_RESET_TIMING)
+
+    def get_setting(self, name):
+        return struct.unpack("<i", self.request(CMD_GET_SETTING, bytes([SETTINGS[name]])))[0]
+
+    def set_setting(self, name, value):
+        self.request(CMD_SET_SETTING, struct.pack("<Bi", SETTINGS[name], value))
+
+    def wiggle(self, window_ms):
+
+        """
+        Monitor the cable while the operator flexes it.
+
+        Parameters:
+        window_ms (int): Length of the monitoring window, at most 300 000 (longer ones are refused).
+
+        Returns:
+        tuple: Samples taken, late samples, number of events, list of (wire-out index, us since
+               the start, wire reads wrong, pattern index) of the events that fit the response.
+        """
+
+        response = self.request(CMD_WIGGLE, struct.pack("<I", window_ms), window_ms / 1000 + DEFAULT_TIMEOUT)
+        samples, overruns, total = struct.unpack_from(WIGGLE_SUMMARY_FORMAT, response, 0)
+        events = []
+        for offset in range(WIGGLE_SUMMARY_SIZE, len(response), WIGGLE_EVENT_SIZE):
+            wire, tick, state = struct.unpack_from(WIGGLE_EVENT_FORMAT, response, offset)
+            events.append((wire, tick, bool(state & 1), state >> 1))
+        return samples, overruns, total, events
+
+    def exit(self):
+
+        """Stop main() on the station and return to the REPL."""
+
+        self.request(CMD_EXIT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive a TESTER station over USB serial.")
+    parser.add_argument("port", help="serial port, e.g. /dev/ttyACM0")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("ping")
+    sub.add_parser("test").add_argument("mode", choices=list(MODE_CODES))
+    sub.add_parser("sequence").add_argument("--all", action="store_true", help="do not stop at the first failure")
+    sub.add_parser("measurements")
+    sub.add_parser("last")
+    sub.add_parser("timing")
+    sub.add_parser("reset-timing")
+    sub.add_parser("get").add_argument("setting", choices=list(SETTINGS))
+    setter = sub.add_parser("set")
+    setter.add_argument("setting", choices=list(SETTINGS))
+    setter.add_argument("value", type=int)
+    sub.add_parser("wiggle").add_argument("--window", type=int, default=10_000, help="monitoring window (ms)")
+    sub.add_parser("exit")
+    args = parser.parse_args()
+
+    port = open_port(args.port)
+    client = TesterClient(port)
+    start = time.perf_counter()
+
+    try:
+        if args.command == "ping":
+            print("Protocol version {}".format(client.ping()))
+        elif args.command == "test":
+            print(client.run_test(args.mode))
+        elif args.command == "sequence":
+            passed, records = client.run_sequence(fail_fast=not args.all)
+            for record in records:
+                print(record)
+            print("PASS" if passed else "FAIL")
+        elif args.command == "measurements":
+            print(client.measurements())
+        elif args.command == "last":
+            print(client.last_result())
+        elif args.command == "timing":
+            print("{:<20}{:>8}{:>12}{:>12}{:>12}".format("span", "count", "p50 us", "p99 us", "max us"))
+            for name, values in client.timing().items():
+                print("{:<20}{:>8}{:>12}{:>12}{:>12}".format(name, *values))
+        elif args.command == "reset-timing":
+            client.reset_timing()
+        elif args.command == "get":
+            print(client.get_setting(args.setting))
+        elif args.command == "set":
+            client.set_setting(args.setting, args.value)
+        elif args.command == "wiggle":
+            print("Flex the cable now ({} ms)".format(args.window))
+            samples, overruns, total, events = client.wiggle(args.window)
+            for wire, tick, wrong, pattern in events:
+                print("{:>10} us  wire {}  {}  (pattern {})".format(tick, wire + 1, "WRONG" if wrong else "ok", pattern))
+            if total > len(events):
+                print("{} more events not transferred".format(total - len(events)))
+            print("{} samples, {} late, {} events: {}".format(samples, overruns, total, "PASS" if not total else "FAIL"))
+        elif args.command == "exit":
+            client.exit()
+    except TesterError as e:
+        print(e)
+        return 1
+    finally:
+        port.close()
+
+    print("({:.1f} ms)".format((time.perf_counter() - start) * 1000))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,8 @@
+# Host-side hardware simulator for the TESTER firmware.
+# Runs the unmodified TESTER modules on CPython with register-level fakes of the sensors,
+# a cable harness with injectable faults, scripted mode buttons and a virtual clock.
+
+from tester_sim.clock import VirtualClock
+from tester_sim.devices import I2CBus, FakeINA226, FakeTSL2591, FakeSCD41, FakeBME280, FakeTCA9548A
+from tester_sim.board import Board, CableHarness, ButtonOperator, SimulationComplete, MODE_BUTTON_PINS
+from tester_sim.simulation import Simulation, TESTER_DIR
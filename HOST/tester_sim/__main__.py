@@ -0,0 +1,46 @@
+# Run the TESTER main() loop on the simulator:
+#
+#     cd HOST && python -m tester_sim --cycles 1000 --open 2
+
+import argparse
+import itertools
+
+from tester_sim import Board, CableHarness, MODE_BUTTON_PINS, Simulation
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the TESTER firmware on the host simulator.")
+    parser.add_argument("--cycles", type=int, default=100, help="number of button presses")
+    parser.add_argument("--modes", nargs="+", default=list(MODE_BUTTON_PINS),
+                        help="modes pressed in turn (default: all four)")
+    parser.add_argument("--open", type=int, action="append", default=[], help="wire index that does not conduct")
+    parser.add_argument("--short", type=int, nargs=2, action="append", default=[], help="two shorted wires")
+    parser.add_argument("--missing", action="append", default=[], choices=["ina226", "tsl2591", "scd41", "bme280"],
+                        help="sensor missing from the bus")
+    parser.add_argument("--verbose", action="store_true", help="print the firmware serial output")
+    args = parser.parse_args()
+
+    board = Board(harness=CableHarness(opens=args.open, shorts=args.short))
+    for name in args.missing:
+        board.bus.detach(getattr(board, name).address)
+
+    sim = Simulation(board, quiet=not args.verbose)
+    script = itertools.islice(itertools.cycle(args.modes), args.cycles)
+    stats = sim.run_main(script)
+
+    print("Button presses:      {}".format(stats["presses"]))
+    print("Simulated time:      {:.1f} s".format(stats["simulated_s"]))
+    print("Wall-clock time:     {:.3f} s".format(stats["wall_s"]))
+    print("Speed-up:            {:.0f}x".format(stats["simulated_s"] / max(stats["wall_s"], 1e-9)))
+    print("I2C transactions:    {}".format(stats["i2c_transactions"]))
+
+    counts = {}
+    for mode, passed in sim.verdicts:
+        key = (mode, {True: "pass", False: "fail", None: "error"}[passed])
+        counts[key] = counts.get(key, 0) + 1
+    for (mode, verdict), count in sorted(counts.items()):
+        print("  {:<18} {:<6} {}".format(mode, verdict, count))
+
+
+if __name__ == "__main__":
+    main()
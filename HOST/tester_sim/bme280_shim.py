@@ -0,0 +1,64 @@
+# Stand-in for the BME280 MicroPython library installed on the Pico with Thonny.
+# Installed as the "bme280" module by the simulator. It talks to the sensor through the I2C
+# object like the real library does, and returns the units sensor_control expects:
+# temperature in 0.01 °C, pressure in Q24.8 Pa (Pa * 256) and humidity in Q22.10 %RH.
+
+from tester_sim.devices import bme280_compensate
+
+BME280_I2CADDR = 0x76
+BME280_CHIP_ID = 0x60
+
+
+class BME280:
+
+    def __init__(self, mode=1, address=BME280_I2CADDR, i2c=None, **kwargs):
+        if i2c is None:
+            raise ValueError("An I2C object is required.")
+
+        self.i2c = i2c
+        self.address = address
+        self.mode = mode
+
+        chip_id = self.i2c.readfrom_mem(self.address, 0xD0, 1)[0]
+        if chip_id != BME280_CHIP_ID:
+            raise OSError("Unexpected BME280 chip id 0x{:02x}".format(chip_id))
+
+        calib = self.i2c.readfrom_mem(self.address, 0x88, 26)
+        calib_h = self.i2c.readfrom_mem(self.address, 0xE1, 7)
+
+        def u16(offset):
+            return calib[offset] | (calib[offset + 1] << 8)
+
+        def s16(offset):
+            value = u16(offset)
+            return value - 0x10000 if value & 0x8000 else value
+
+        def s12(value):
+            return value - 0x1000 if value & 0x800 else value
+
+        self.calibration = {
+            "T1": u16(0), "T2": s16(2), "T3": s16(4),
+            "P1": u16(6), "P2": s16(8), "P3": s16(10), "P4": s16(12), "P5": s16(14),
+            "P6": s16(16), "P7": s16(18), "P8": s16(20), "P9": s16(22),
+            "H1": calib[25],
+            "H2": calib_h[0] | (calib_h[1] << 8) if not calib_h[1] & 0x80
+                  else (calib_h[0] | (calib_h[1] << 8)) - 0x10000,
+            "H3": calib_h[2],
+            "H4": s12((calib_h[3] << 4) | (calib_h[4] & 0x0F)),
+            "H5": s12((calib_h[5] << 4) | (calib_h[4] >> 4)),
+            "H6": calib_h[6] - 0x100 if calib_h[6] & 0x80 else calib_h[6],
+        }
+
+        self.i2c.writeto_mem(self.address, 0xF2, bytes([self.mode]))
+        self.i2c.writeto_mem(self.address, 0xF4, bytes([(self.mode << 5) | (self.mode << 2) | 0x01]))
+
+    def read_raw_data(self):
+        data = self.i2c.readfrom_mem(self.address, 0xF7, 8)
+        adc_p = (data[0] << 12) | (data[1] << 4) | (data[2] >> 4)
+        adc_t = (data[3] << 12) | (data[4] << 4) | (data[5] >> 4)
+        adc_h = (data[6] << 8) | data[7]
+        return adc_t, adc_p, adc_h
+
+    def read_compensated_data(self):
+        adc_t, adc_p, adc_h = self.read_raw_data()
+        return bme280_compensate(self.calibration, adc_t, adc_p, adc_h)
@@ -0,0 +1,432 @@
+# Simulated Raspberry Pi Pico board: GPIO levels, the cable harness under test, the operator
+# pressing the mode buttons, and the fake "machine" module the TESTER code imports.
+
+import errno
+import types
+
+from tester_sim.clock import VirtualClock
+from tester_sim.devices import I2CBus, FakeINA226, FakeTSL2591, FakeSCD41, FakeBME280, FakeTCA9548A
+
+# Pins of the TESTER hardware (see cable_test.py and mode_select.py)
+WIRE_IN_PINS = (0, 1, 2, 3, 4, 5)
+WIRE_OUT_PINS = (6, 7, 8, 9, 10, 11)
+# Volts at the ADC pins of a good board (rails behind 1:2 dividers, see analog_check.py)
+ANALOG_LEVELS = {26: 3.3 / 2, 27: 5.0 / 2}
+ADC_SAMPLE_US = 4               # Conversion plus interpreter overhead of one read_u16()
+MODE_BUTTON_PINS = {
+    'wire_test_mode': 21,
+    'current_test_mode': 18,
+    'co2_test_mode': 20,
+    'light_test_mode': 19,
+}
+
+
+class SimulationComplete(BaseException):
+
+    """
+    Raised when the operator script is exhausted.
+
+    Derived from BaseException so the broad "except Exception" handlers of the TESTER code do
+    not swallow it and the main() loop ends.
+    """
+
+
+class CableHarness:
+
+    """
+    Cable under test between the wire-in (output) and wire-out (input) pins.
+
+    Faults:
+    opens (set): Wire indexes that do not conduct.
+    shorts (set): Pairs (a, b) of wires shorted to each other.
+    crossed (set): Pairs (a, b) of wires swapped in the connector.
+    """
+
+    def __init__(self, in_pins=WIRE_IN_PINS, out_pins=WIRE_OUT_PINS, opens=(), shorts=(), crossed=()):
+        self.in_pins = tuple(in_pins)
+        self.out_pins = tuple(out_pins)
+        self.opens = set(opens)
+        self.shorts = {tuple(sorted(pair)) for pair in shorts}
+        self.crossed = {tuple(sorted(pair)) for pair in crossed}
+
+    def sources(self, wire):
+
+        """Return the wire-in indexes which drive the wire-out pin of a wire."""
+
+        sources = set()
+        swapped = [b if a == wire else a for a, b in self.crossed if wire in (a, b)]
+
+        if swapped:
+            sources.update(swapped)
+        elif wire not in self.opens:
+            sources.add(wire)
+
+        for a, b in self.shorts:
+            if wire == a:
+                sources.add(b)
+            elif wire == b:
+                sources.add(a)
+        return sources
+
+    def level(self, board, pin):
+
+        """Return the level seen on a wire-out pin for the current wire-in outputs."""
+
+        wire = self.out_pins.index(pin)
+        for source in self.sources(wire):
+            if board.output_level(self.in_pins[source]):
+                return 1
+        return 0
+
+
+class ButtonOperator:
+
+    """
+    Scripted operator pressing the mode buttons.
+
+    Each script entry is a mode name (the button is held until ModeSelect has read it twice,
+    i.e. through one debounce) or None (no button pressed during one full scan). When the script
+    is exhausted the next button read raises SimulationComplete.
+    """
+
+    def __init__(self, board, script, buttons=MODE_BUTTON_PINS):
+        self.board = board
+        self.buttons = dict(buttons)
+        self.pins = set(self.buttons.values())
+        self.script = iter(script)
+        self.entry = None
+        self.reads = 0
+        self.done = False
+        self.presses = 0
+
+        for pin in self.pins:
+            board.set_external(pin, 1)
+        board.read_hooks.append(self.on_read)
+        self._next_entry()
+
+    def _next_entry(self):
+        try:
+            self.entry = next(self.script)
+        except StopIteration:
+            self.done = True
+            return
+
+        self.reads = 0
+        if self.entry is not None:
+            self.presses += 1
+            self.board.set_external(self.buttons[self.entry], 0)
+
+    def on_read(self, pin):
+        if pin not in self.pins:
+            return
+        if self.done:
+            raise SimulationComplete()
+
+        needed = 2 if self.entry is not None else 2 * len(self.pins)
+        if self.reads >= needed:
+            # The previous entry has been seen, release the button and move on
+            if self.entry is not None:
+                self.board.set_external(self.buttons[self.entry], 1)
+            self._next_entry()
+            if self.done:
+                raise SimulationComplete()
+
+        if self.entry is None or pin == self.buttons[self.entry]:
+            self.reads += 1
+
+
+class Board:
+
+    """
+    State of the simulated Pico and of everything wired to it.
+
+    Holds the virtual clock, the I2C bus with the fake sensors, the GPIO levels, the cable
+    harness and the PWM/timer peripherals created by the TESTER code.
+    """
+
+    def __init__(self, clock=None, harness=None, devices=True):
+
+        """
+        Parameters:
+        clock (VirtualClock): Simulated time, a new one by default.
+        harness (CableHarness): Cable under test, a good cable by default.
+        devices (bool): Attach working INA226, TSL2591, SCD41 and BME280 fakes.
+        """
+
+        self.clock = clock or VirtualClock()
+        self.bus = I2CBus(self.clock)
+        self.harness = harness or CableHarness()
+        self.pins = {}            # Pin id -> Pin object
+        self.external = {}        # Pin id -> level driven from outside the Pico
+        self.read_hooks = []      # Called as hook(pin_id) before an input is read
+        self.pwm = {}             # Pin id -> duty (u16)
+        self.analog = dict(ANALOG_LEVELS)   # ADC pin id -> volts, or function of the time (us) giving volts
+        self.timers = []
+        self.pin_reads = 0
+
+        if devices:
+            self.ina226 = self.bus.attach(FakeINA226())
+            self.tsl2591 = self.bus.attach(FakeTSL2591(self.clock))
+            self.scd41 = self.bus.attach(FakeSCD41(self.clock))
+            self.bme280 = self.bus.attach(FakeBME280())
+
+    def attach_mux(self, boards, address=0x70):
+
+        """
+        Put a TCA9548A on the bus with one board under test (INA226, TSL2591, SCD41, BME280)
+        on each of its first channels.
+
+        Parameters:
+        boards (int): Number of boards (1-8).
+        address (int): Address of the switch.
+
+        Returns:
+        FakeTCA9548A: The switch; channels[n] holds the devices of board n by address.
+        """
+
+        mux = self.bus.attach(FakeTCA9548A(address))
+        for channel in range(boards):
+            mux.attach(channel, FakeINA226())
+            mux.attach(channel, FakeTSL2591(self.clock))
+            mux.attach(channel, FakeSCD41(self.clock))
+            mux.attach(channel, FakeBME280())
+        return mux
+
+    # GPIO --------------------------------------------------------------------
+
+    def output_level(self, pin_id):
+        pin = self.pins.get(pin_id)
+        if pin is None or pin.mode != Pin.OUT:
+            return 0
+        return pin.out_value
+
+    def input_level(self, pin_id):
+        self.pin_reads += 1
+        for hook in self.read_hooks:
+            hook(pin_id)
+
+        if pin_id in self.harness.out_pins:
+            return self.harness.level(self, pin_id)
+        if pin_id in self.external:
+            return self.external[pin_id]
+
+        pin = self.pins.get(pin_id)
+        return 1 if pin is not None and pin.pull == Pin.PULL_UP else 0
+
+    def set_external(self, pin_id, level):
+
+        """Drive a pin from outside (button, alert line...) and fire its IRQ on a matching edge."""
+
+        pin = self.pins.get(pin_id)
+        old = self.external.get(pin_id, 1 if pin is not None and pin.pull == Pin.PULL_UP else 0)
+        self.external[pin_id] = level
+
+        if pin is not None and pin.handler is not None and old != level:
+            edge = Pin.IRQ_RISING if level else Pin.IRQ_FALLING
+            if pin.trigger & edge:
+                pin.handler(pin)
+
+    # Fake machine module -----------------------------------------------------
+
+    def machine_module(self):
+
+        """Build the "machine" module bound to this board."""
+
+        board = self
+        module = types.ModuleType("machine")
+
+        module.Pin = type("Pin", (Pin,), {"board": board})
+        module.PWM = type("PWM", (PWM,), {"board": board})
+        module.Timer = type("Timer", (Timer,), {"board": board})
+        module.I2C = type("I2C", (I2C,), {"board": board})
+        module.ADC = type("ADC", (ADC,), {"board": board})
+
+        module.freq = lambda *args: 125_000_000
+        module.unique_id = lambda: b"\xe6\x61\x38\x52\x83\x2f\x46\x2a"
+        module.idle = lambda: board.clock.advance_us(1)
+        module.lightsleep = lambda ms=None: board.clock.advance_us((ms or 0) * 1000)
+        module.deepsleep = lambda ms=None: board.clock.advance_us((ms or 0) * 1000)
+        module.disable_irq = lambda: 0
+        module.enable_irq = lambda state=0: None
+        module.reset = lambda: (_ for _ in ()).throw(SimulationComplete())
+        module.board = board
+        return module
+
+
+class Pin:
+
+    """machine.Pin on the simulated board."""
+
+    board = None
+
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    ALT = 3
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, id, mode=-1, pull=-1, value=None, **kwargs):
+        self.id = id
+        self.mode = self.IN
+        self.pull = None
+        self.out_value = 0
+        self.handler = None
+        self.trigger = 0
+        self.board.pins[id] = self
+        self.init(mode, pull, value)
+
+    def init(self, mode=-1, pull=-1, value=None, **kwargs):
+        if mode != -1:
+            self.mode = mode
+        if pull != -1:
+            self.pull = pull
+        if value is not None:
+            self.out_value = 1 if value else 0
+
+    def value(self, x=None):
+        if x is None:
+            if self.mode == self.OUT:
+                return self.out_value
+            return self.board.input_level(self.id)
+        self.out_value = 1 if x else 0
+
+    __call__ = value
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    high = on
+    low = off
+
+    def toggle(self):
+        self.value(0 if self.out_value else 1)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, hard=False, **kwargs):
+        self.handler = handler
+        self.trigger = trigger if handler is not None else 0
+        return self
+
+    def __repr__(self):
+        return "Pin({})".format(self.id)
+
+
+class PWM:
+
+    """machine.PWM on the simulated board, keeps the duty cycle for inspection."""
+
+    board = None
+
+    def __init__(self, pin, freq=None, duty_u16=None, **kwargs):
+        self.pin = pin
+        self._freq = freq or 1000
+        self.board.pwm[pin.id] = duty_u16 or 0
+
+    def freq(self, value=None):
+        if value is None:
+            return self._freq
+        self._freq = value
+
+    def duty_u16(self, value=None):
+        if value is None:
+            return self.board.pwm.get(self.pin.id, 0)
+        self.board.pwm[self.pin.id] = max(0, min(65535, int(value)))
+
+    def deinit(self):
+        self.board.pwm[self.pin.id] = 0
+
+
+class ADC:
+
+    """machine.ADC on the simulated board: reads the voltage set in board.analog."""
+
+    board = None
+
+    def __init__(self, pin):
+        self.pin = pin.id if hasattr(pin, "id") else pin
+
+    def read_u16(self):
+        board = self.board
+        board.clock.advance_us(ADC_SAMPLE_US)
+        level = board.analog.get(self.pin, 0.0)
+        if callable(level):
+            level = level(board.clock.now_us)
+        return max(0, min(65535, int(level / 3.3 * 65535)))
+
+
+class Timer:
+
+    """
+    machine.Timer on the simulated board.
+
+    Timers are recorded but their callbacks are not run: LED animation has no effect on the test
+    logic, and firing them would tie simulation speed to the animation rate.
+    """
+
+    board = None
+
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1, **kwargs):
+        self.callback = None
+        self.active = False
+        if kwargs:
+            self.init(**kwargs)
+
+    def init(self, mode=PERIODIC, freq=None, period=None, callback=None, **kwargs):
+        self.mode = mode
+        self.freq = freq
+        self.period = period
+        self.callback = callback
+        self.active = True
+        if self not in self.board.timers:
+            self.board.timers.append(self)
+
+    def deinit(self):
+        self.active = False
+        if self in self.board.timers:
+            self.board.timers.remove(self)
+
+
+class I2C:
+
+    """machine.I2C on the simulated board, routed to the board's I2CBus."""
+
+    board = None
+
+    def __init__(self, id=0, scl=None, sda=None, freq=400_000, **kwargs):
+        self.id = id
+        self.bus = self.board.bus
+        self.bus.freq = freq
+
+    def scan(self):
+        return sorted(self.bus.devices)
+
+    def writeto(self, addr, buf, stop=True):
+        return self.bus.write(addr, buf)
+
+    def writevto(self, addr, vector, stop=True):
+        return self.bus.write(addr, b"".join(bytes(buf) for buf in vector))
+
+    def readfrom(self, addr, nbytes, stop=True):
+        return self.bus.read(addr, nbytes)
+
+    def readfrom_into(self, addr, buf, stop=True):
+        buf[:] = self.bus.read(addr, len(buf))
+
+    def writeto_mem(self, addr, memaddr, buf, addrsize=8):
+        if addrsize != 8:
+            raise OSError(errno.EINVAL, "Only 8-bit register addresses are simulated")
+        self.bus.write_mem(addr, memaddr, buf)
+
+    def readfrom_mem(self, addr, memaddr, nbytes, addrsize=8):
+        return self.bus.read_mem(addr, memaddr, nbytes)
+
+    def readfrom_mem_into(self, addr, memaddr, buf, addrsize=8):
+        buf[:] = self.bus.read_mem(addr, memaddr, len(buf))
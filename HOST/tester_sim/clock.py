@@ -0,0 +1,112 @@
+# Virtual clock of the simulator.
+# Every sleep advances simulated time instantly, so a 5 s SCD41 wait costs no wall-clock time.
+
+import time as _real_time
+import types
+
+TICKS_PERIOD = 1 << 30            # MicroPython ticks wrap at 2^30
+TICKS_MAX = TICKS_PERIOD - 1
+TICKS_HALFPERIOD = TICKS_PERIOD // 2
+DEFAULT_EPOCH = 1_704_067_200     # 2024-01-01 00:00:00 UTC, value of time.time() at start
+
+
+class VirtualClock:
+
+    """
+    Simulated time in microseconds.
+
+    The clock only moves when code sleeps or a simulated bus transaction takes time. The
+    ticks_* functions follow MicroPython semantics, including the 2^30 wrap around.
+    """
+
+    def __init__(self, start_epoch=DEFAULT_EPOCH):
+
+        """
+        Parameters:
+        start_epoch (int): Value returned by time() at simulated time zero.
+        """
+
+        self.now_us = 0
+        self.start_epoch = start_epoch
+        self.sleep_calls = 0
+        self.speed = None         # Simulated seconds per wall-clock second, None: as fast as possible
+        self._wall_origin = 0.0
+
+    def pace(self, speed):
+
+        """
+        Keep simulated time at most speed times ahead of wall-clock time, e.g. to stand in for
+        a station on a serial line. None runs as fast as possible again.
+        """
+
+        self.speed = speed
+        self._wall_origin = _real_time.perf_counter() - (self.now_us / 1e6 / speed if speed else 0)
+
+    # Time control ------------------------------------------------------------
+
+    def advance_us(self, us):
+
+        """Move simulated time forward by us microseconds."""
+
+        if us > 0:
+            self.now_us += int(us)
+
+            if self.speed:
+                delay = self._wall_origin + self.now_us / 1e6 / self.speed - _real_time.perf_counter()
+                if delay > 0:
+                    _real_time.sleep(delay)
+
+    def sleep(self, seconds):
+        self.sleep_calls += 1
+        self.advance_us(seconds * 1_000_000)
+
+    def sleep_ms(self, ms):
+        self.sleep_calls += 1
+        self.advance_us(ms * 1000)
+
+    def sleep_us(self, us):
+        self.sleep_calls += 1
+        self.advance_us(us)
+
+    # MicroPython time API ----------------------------------------------------
+
+    def ticks_us(self):
+        return self.now_us & TICKS_MAX
+
+    def ticks_ms(self):
+        return (self.now_us // 1000) & TICKS_MAX
+
+    def ticks_cpu(self):
+        return self.now_us & TICKS_MAX
+
+    @staticmethod
+    def ticks_diff(end, start):
+        return ((end - start + TICKS_HALFPERIOD) & TICKS_MAX) - TICKS_HALFPERIOD
+
+    @staticmethod
+    def ticks_add(ticks, delta):
+        return (ticks + delta) & TICKS_MAX
+
+    def time(self):
+        return self.start_epoch + self.now_us // 1_000_000
+
+    def time_ns(self):
+        return self.start_epoch * 1_000_000_000 + self.now_us * 1000
+
+    def module(self, name="utime"):
+
+        """
+        Build a module object exposing the clock with the MicroPython time/utime API.
+
+        Attributes the simulator does not model (strftime, localtime...) come from the real
+        time module.
+        """
+
+        module = types.ModuleType(name)
+        for attr in ("sleep", "sleep_ms", "sleep_us", "ticks_us", "ticks_ms", "ticks_cpu",
+                     "ticks_diff", "ticks_add", "time", "time_ns"):
+            setattr(module, attr, getattr(self, attr))
+
+        module.__getattr__ = lambda attr: getattr(_real_time, attr)
+        module.clock = self
+        return module
@@ -0,0 +1,607 @@
+# Register-level fakes of the I2C devices used by TESTER.
+# Each fake answers the same bytes as the real chip, so the unmodified drivers run against it.
+
+import errno
+
+# Bus timing model: 9 clocks per byte (8 data + ACK) plus start/stop and driver overhead
+I2C_OVERHEAD_US = 20
+
+
+class I2CBus:
+
+    """
+    Simulated I2C bus shared by all devices.
+
+    Counts every transaction and advances the virtual clock by the time the transfer would take
+    on the wire. A transaction to an address without a device raises OSError(EIO), like the
+    rp2 port does on a NACK.
+    """
+
+    def __init__(self, clock, freq=100_000):
+
+        """
+        Parameters:
+        clock (VirtualClock): Clock advanced by each transaction.
+        freq (int): Bus frequency in Hz.
+        """
+
+        self.clock = clock
+        self.freq = freq
+        self.devices = {}
+        self.transactions = 0
+        self.bytes = 0
+        self.per_address = {}
+        self.listeners = []       # Called as listener(kind, addr, reg, data) after each transaction
+        self.muxes = []           # Attached I2C switches, searched for addresses not on the bus itself
+
+    def attach(self, device):
+
+        """Add a device at its address and return it."""
+
+        self.devices[device.address] = device
+        if isinstance(device, FakeTCA9548A):
+            self.muxes.append(device)
+        return device
+
+    def detach(self, address):
+
+        """Remove the device at an address (simulates a missing or dead chip)."""
+
+        device = self.devices.pop(address, None)
+        if device in self.muxes:
+            self.muxes.remove(device)
+        return device
+
+    def reset_counters(self):
+        self.transactions = 0
+        self.bytes = 0
+        self.per_address = {}
+
+    def _begin(self, addr, nbytes):
+        self.transactions += 1
+        self.bytes += nbytes
+        self.per_address[addr] = self.per_address.get(addr, 0) + 1
+        self.clock.advance_us(I2C_OVERHEAD_US + (nbytes + 1) * 9 * 1_000_000 // self.freq)
+
+        device = self.devices.get(addr)
+        for mux in self.muxes:
+            if device is not None:
+                break
+            device = mux.route(addr)
+
+        if device is None:
+            raise OSError(errno.EIO, "I2C NACK")
+        return device
+
+    def _notify(self, kind, addr, reg, data):
+        for listener in self.listeners:
+            listener(kind, addr, reg, data)
+
+    def write(self, addr, data):
+        device = self._begin(addr, len(data))
+        device.write(bytes(data))
+        self._notify("w", addr, None, bytes(data))
+        return len(data)
+
+    def read(self, addr, nbytes):
+        device = self._begin(addr, nbytes)
+        data = bytes(device.read(nbytes))
+        self._notify("r", addr, None, data)
+        return data
+
+    def write_mem(self, addr, reg, data):
+        device = self._begin(addr, len(data) + 1)
+        device.write_mem(reg, bytes(data))
+        self._notify("W", addr, reg, bytes(data))
+
+    def read_mem(self, addr, reg, nbytes):
+        device = self._begin(addr, nbytes + 1)
+        data = bytes(device.read_mem(reg, nbytes))
+        self._notify("R", addr, reg, data)
+        return data
+
+
+class I2CDevice:
+
+    """Base class of the fakes: a register pointer followed by register reads or writes."""
+
+    address = None
+
+    def write(self, data):
+        raise NotImplementedError
+
+    def read(self, nbytes):
+        raise NotImplementedError
+
+    def write_mem(self, reg, data):
+        self.write(bytes([reg]) + data)
+
+    def read_mem(self, reg, nbytes):
+        self.write(bytes([reg]))
+        return self.read(nbytes)
+
+
+class FakeTCA9548A(I2CDevice):
+
+    """
+    TCA9548A I2C switch: the control register enables downstream channels, each with its own
+    devices. Two enabled channels answering the same address would collide; the lowest wins.
+    """
+
+    def __init__(self, address=0x70):
+        self.address = address
+        self.control = 0
+        self.channels = [{} for _ in range(8)]
+        self.writes = 0
+
+    def attach(self, channel, device):
+
+        """Add a device behind a channel and return it."""
+
+        self.channels[channel][device.address] = device
+        return device
+
+    def detach(self, channel, address):
+        return self.channels[channel].pop(address, None)
+
+    def route(self, addr):
+
+        """Return the device answering addr on the enabled channels, or None."""
+
+        for channel in range(8):
+            if self.control & (1 << channel) and addr in self.channels[channel]:
+                return self.channels[channel][addr]
+        return None
+
+    def write(self, data):
+        self.writes += 1
+        if data:
+            self.control = data[-1]
+
+    def read(self, nbytes):
+        return bytes([self.control]) * nbytes
+
+
+class FakeINA226(I2CDevice):
+
+    """
+    INA226 current/power monitor with 16-bit big-endian registers.
+
+    The measured values are set in engineering units (bus_voltage, current) and converted into
+    register values with the configured calibration, as the chip would do.
+    """
+
+    REG_CONFIG = 0x00
+    REG_SHUNT_VOLTAGE = 0x01
+    REG_BUS_VOLTAGE = 0x02
+    REG_POWER = 0x03
+    REG_CURRENT = 0x04
+    REG_CALIBRATION = 0x05
+    REG_MASK_ENABLE = 0x06
+    REG_ALERT_LIMIT = 0x07
+    REG_MANUFACTURER_ID = 0xFE
+    REG_DIE_ID = 0xFF
+
+    def __init__(self, address=0x40, bus_voltage=5.0, current=0.120, shunt_ohms=0.1):
+
+        """
+        Parameters:
+        address (int): I2C address.
+        bus_voltage (float): Bus voltage in volts.
+        current (float): Load current in amperes.
+        shunt_ohms (float): Shunt resistor in ohms.
+        """
+
+        self.address = address
+        self.bus_voltage = bus_voltage
+        self.current = current
+        self.shunt_ohms = shunt_ohms
+        self.pointer = 0
+        self.registers = {
+            self.REG_CONFIG: 0x4127,
+            self.REG_CALIBRATION: 0x0000,
+            self.REG_MASK_ENABLE: 0x0000,
+            self.REG_ALERT_LIMIT: 0x0000,
+            self.REG_MANUFACTURER_ID: 0x5449,
+            self.REG_DIE_ID: 0x2260,
+        }
+
+    @staticmethod
+    def _u16(value):
+        return int(value) & 0xFFFF
+
+    def alert_active(self):
+
+        """
+        Return True if the enabled alert function of the Mask/Enable register is crossed by the
+        current measurements. A test drives the board's alert pin low with Board.set_external()
+        when this turns True.
+        """
+
+        function = self.registers[self.REG_MASK_ENABLE] & 0xF800
+        limit = self.registers[self.REG_ALERT_LIMIT]
+        shunt_raw = int(round(self.current * self.shunt_ohms / 2.5e-6))
+        bus_raw = int(round(self.bus_voltage / 1.25e-3))
+        if limit & 0x8000 and function & 0xC000:
+            limit -= 0x10000
+        current_raw = shunt_raw * self.registers[self.REG_CALIBRATION] // 2048
+        power_raw = abs(current_raw) * bus_raw // 20000
+
+        if function & 0x8000:
+            return shunt_raw > limit
+        if function & 0x4000:
+            return shunt_raw < limit
+        if function & 0x2000:
+            return bus_raw > limit
+        if function & 0x1000:
+            return bus_raw < limit
+        if function & 0x0800:
+            return power_raw > limit
+        return False
+
+    def register_value(self, reg):
+
+        """Return the 16-bit value of a register for the current measurements."""
+
+        shunt_raw = int(round(self.current * self.shunt_ohms / 2.5e-6))
+        calibration = self.registers[self.REG_CALIBRATION]
+        current_raw = shunt_raw * calibration // 2048
+        bus_raw = int(round(self.bus_voltage / 1.25e-3))
+
+        if reg == self.REG_SHUNT_VOLTAGE:
+            return self._u16(shunt_raw)
+        if reg == self.REG_BUS_VOLTAGE:
+            return self._u16(bus_raw)
+        if reg == self.REG_CURRENT:
+            return self._u16(current_raw)
+        if reg == self.REG_POWER:
+            return self._u16(abs(current_raw) * bus_raw // 20000)
+        if reg == self.REG_MASK_ENABLE:
+            value = self.registers[reg]
+            if self.alert_active():
+                value |= 0x0010                       # Alert function flag
+            self.registers[reg] = value & ~0x0010     # Reading clears the alert latch
+            return value | 0x0008                     # Conversion ready
+        return self.registers.get(reg, 0)
+
+    def write(self, data):
+        self.pointer = data[0]
+        if len(data) >= 3:
+            self.registers[self.pointer] = (data[1] << 8) | data[2]
+
+    def read(self, nbytes):
+        value = self.register_value(self.pointer)
+        return bytes([value >> 8, value & 0xFF])[:nbytes]
+
+
+class FakeTSL2591(I2CDevice):
+
+    """
+    TSL2591 light sensor.
+
+    Registers are addressed with the command byte (0xA0 | register). The channel registers are
+    updated only while the ALS is enabled, one integration time after enabling.
+    """
+
+    COMMAND_BIT = 0xA0
+    REG_ENABLE = 0x00
+    REG_CONTROL = 0x01
+    REG_ID = 0x12
+    REG_STATUS = 0x13
+    REG_C0DATAL = 0x14
+
+    INTEGRATION_US = {0: 100_000, 1: 200_000, 2: 300_000, 3: 400_000, 4: 500_000, 5: 600_000}
+
+    def __init__(self, clock, address=0x29, full=12000, ir=3000):
+
+        """
+        Parameters:
+        clock (VirtualClock): Clock used for the integration time.
+        address (int): I2C address.
+        full (int): Full spectrum count (CH0).
+        ir (int): Infrared count (CH1).
+        """
+
+        self.clock = clock
+        self.address = address
+        self.full = full
+        self.ir = ir
+        self.pointer = 0
+        self.enable_reg = 0
+        self.control_reg = 0
+        self.enabled_at = None
+        self.channels = [0, 0]
+
+    def _latch(self):
+        # Copy the light level into the channel registers once an integration cycle is complete
+        if self.enabled_at is None:
+            return
+        integration = self.INTEGRATION_US.get(self.control_reg & 0x07, 100_000)
+        if self.clock.now_us - self.enabled_at >= integration:
+            self.channels = [min(self.full, 0xFFFF), min(self.ir, 0xFFFF)]
+
+    def write(self, data):
+        if data[0] & 0xE0 != self.COMMAND_BIT:
+            return                                  # Not a normal register command: ignored
+        self.pointer = data[0] & 0x1F
+
+        if len(data) >= 2:
+            value = data[1]
+            if self.pointer == self.REG_ENABLE:
+                self._latch()
+                was_on = self.enable_reg & 0x03 == 0x03
+                self.enable_reg = value
+                if value & 0x03 == 0x03 and not was_on:
+                    self.enabled_at = self.clock.now_us
+                elif value & 0x03 != 0x03:
+                    self.enabled_at = None
+            elif self.pointer == self.REG_CONTROL:
+                self.control_reg = value
+
+    def read(self, nbytes):
+        self._latch()
+        out = bytearray()
+        pointer = self.pointer
+        for _ in range(nbytes):
+            out.append(self._register(pointer))
+            pointer += 1
+        return bytes(out)
+
+    def _register(self, reg):
+        if reg == self.REG_ENABLE:
+            return self.enable_reg
+        if reg == self.REG_CONTROL:
+            return self.control_reg
+        if reg == self.REG_ID:
+            return 0x50
+        if reg == self.REG_STATUS:
+            return 0x01 if self.enabled_at is not None else 0x00
+        if self.REG_C0DATAL <= reg <= self.REG_C0DATAL + 3:
+            channel = self.channels[(reg - self.REG_C0DATAL) // 2]
+            return channel & 0xFF if reg % 2 == 0 else channel >> 8
+        return 0
+
+
+def sensirion_crc(data):
+
+    """CRC-8 of the Sensirion sensors (polynomial 0x31, init 0xFF)."""
+
+    crc = 0xFF
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x31) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+
+class FakeSCD41(I2CDevice):
+
+    """
+    SCD41 CO2 sensor driven by 16-bit commands.
+
+    After start_periodic_measurement a new sample is ready every 5 s. read_measurement returns
+    the 9-byte frame (three words with CRC) and clears the data-ready flag; reading when no new
+    sample is available is NACKed.
+    """
+
+    START_PERIODIC = 0x21B1
+    STOP_PERIODIC = 0x3F86
+    READ_MEASUREMENT = 0xEC05
+    GET_DATA_READY = 0xE4B8
+    SAMPLE_PERIOD_US = 5_000_000
+
+    def __init__(self, clock, address=0x62, co2=650, temperature=24.0, humidity=45.0):
+
+        """
+        Parameters:
+        clock (VirtualClock): Clock used for the sampling period.
+        address (int): I2C address.
+        co2 (int): CO2 concentration in ppm.
+        temperature (float): Temperature in °C.
+        humidity (float): Relative humidity in %.
+        """
+
+        self.clock = clock
+        self.address = address
+        self.co2 = co2
+        self.temperature = temperature
+        self.humidity = humidity
+        self.started_at = None
+        self.samples_read = 0
+        self.response = b""
+
+    def _samples_available(self):
+        if self.started_at is None:
+            return 0
+        return (self.clock.now_us - self.started_at) // self.SAMPLE_PERIOD_US
+
+    def _frame(self):
+        words = (
+            int(self.co2) & 0xFFFF,
+            int(round((self.temperature + 45) * 65536 / 175)) & 0xFFFF,
+            int(round(self.humidity * 65536 / 100)) & 0xFFFF,
+        )
+        frame = bytearray()
+        for word in words:
+            pair = bytes([word >> 8, word & 0xFF])
+            frame += pair + bytes([sensirion_crc(pair)])
+        return bytes(frame)
+
+    def write(self, data):
+        if len(data) < 2:
+            raise OSError(errno.EIO, "SCD41 expects 16-bit commands")
+        command = (data[0] << 8) | data[1]
+        self.response = b""
+
+        if command == self.START_PERIODIC:
+            self.started_at = self.clock.now_us
+            self.samples_read = 0
+        elif command == self.STOP_PERIODIC:
+            self.started_at = None
+        elif command == self.READ_MEASUREMENT:
+            if self._samples_available() > self.samples_read:
+                self.samples_read = self._samples_available()
+                self.response = self._frame()
+        elif command == self.GET_DATA_READY:
+            ready = 0x0001 if self._samples_available() > self.samples_read else 0x0000
+            pair = bytes([ready >> 8, ready & 0xFF])
+            self.response = pair + bytes([sensirion_crc(pair)])
+
+    def read(self, nbytes):
+        if not self.response:
+            raise OSError(errno.EIO, "SCD41 NACK, no data")
+        data = self.response[:nbytes]
+        self.response = b""
+        return data
+
+
+# BME280 trimming parameters (datasheet example values for T/P, typical values for H)
+BME280_CALIBRATION = {
+    "T1": 27504, "T2": 26435, "T3": -1000,
+    "P1": 36477, "P2": -10685, "P3": 3024, "P4": 2855, "P5": 140, "P6": -7,
+    "P7": 15500, "P8": -14600, "P9": 6000,
+    "H1": 75, "H2": 362, "H3": 0, "H4": 313, "H5": 50, "H6": 30,
+}
+
+
+def bme280_compensate(cal, adc_t, adc_p, adc_h):
+
+    """
+    Bosch integer compensation of BME280 raw readings.
+
+    Parameters:
+    cal (dict): Trimming parameters (T1..T3, P1..P9, H1..H6).
+    adc_t, adc_p, adc_h (int): Raw ADC values.
+
+    Returns:
+    tuple: Temperature (0.01 °C), pressure (Q24.8 Pa, i.e. Pa * 256), humidity (Q22.10 %RH), the
+           units of read_compensated_data() of the MicroPython BME280 library.
+    """
+
+    var1 = (((adc_t >> 3) - (cal["T1"] << 1)) * cal["T2"]) >> 11
+    var2 = (((((adc_t >> 4) - cal["T1"]) * ((adc_t >> 4) - cal["T1"])) >> 12) * cal["T3"]) >> 14
+    t_fine = var1 + var2
+    temperature = (t_fine * 5 + 128) >> 8
+
+    var1 = t_fine - 128000
+    var2 = var1 * var1 * cal["P6"]
+    var2 = var2 + ((var1 * cal["P5"]) << 17)
+    var2 = var2 + (cal["P4"] << 35)
+    var1 = ((var1 * var1 * cal["P3"]) >> 8) + ((var1 * cal["P2"]) << 12)
+    var1 = (((1 << 47) + var1) * cal["P1"]) >> 33
+    if var1 == 0:
+        pressure = 0
+    else:
+        p = 1048576 - adc_p
+        p = (((p << 31) - var2) * 3125) // var1
+        var1 = (cal["P9"] * (p >> 13) * (p >> 13)) >> 25
+        var2 = (cal["P8"] * p) >> 19
+        pressure = ((p + var1 + var2) >> 8) + (cal["P7"] << 4)
+
+    h = t_fine - 76800
+    h = (((((adc_h << 14) - (cal["H4"] << 20) - (cal["H5"] * h)) + 16384) >> 15)
+         * (((((((h * cal["H6"]) >> 10) * (((h * cal["H3"]) >> 11) + 32768)) >> 10) + 2097152)
+             * cal["H2"] + 8192) >> 14))
+    h = h - (((((h >> 15) * (h >> 15)) >> 7) * cal["H1"]) >> 4)
+    h = 0 if h < 0 else h
+    h = 419430400 if h > 419430400 else h
+    humidity = h >> 12
+
+    return temperature, pressure, humidity
+
+
+class FakeBME280(I2CDevice):
+
+    """
+    BME280 environmental sensor.
+
+    Exposes the chip id, the trimming parameter registers and the burst data registers
+    (0xF7-0xFE). The raw ADC values are searched so that the Bosch compensation gives back the
+    requested temperature, pressure and humidity.
+    """
+
+    REG_CALIB00 = 0x88
+    REG_ID = 0xD0
+    REG_RESET = 0xE0
+    REG_CALIB26 = 0xE1
+    REG_CTRL_HUM = 0xF2
+    REG_STATUS = 0xF3
+    REG_CTRL_MEAS = 0xF4
+    REG_CONFIG = 0xF5
+    REG_DATA = 0xF7
+
+    def __init__(self, address=0x76, temperature=23.5, pressure=101325, humidity=46.0):
+
+        """
+        Parameters:
+        address (int): I2C address (0x76 or 0x77).
+        temperature (float): Temperature in °C.
+        pressure (float): Pressure in Pa.
+        humidity (float): Relative humidity in %.
+        """
+
+        self.address = address
+        self.calibration = dict(BME280_CALIBRATION)
+        self.memory = bytearray(256)
+        self.pointer = 0
+        self.memory[self.REG_ID] = 0x60
+        self._store_calibration()
+        self.set_environment(temperature, pressure, humidity)
+
+    def _store_calibration(self):
+        cal = self.calibration
+        block = bytearray()
+        for name in ("T1", "T2", "T3", "P1", "P2", "P3", "P4", "P5", "P6", "P7", "P8", "P9"):
+            block += (cal[name] & 0xFFFF).to_bytes(2, "little")
+        self.memory[self.REG_CALIB00:self.REG_CALIB00 + 24] = block
+        self.memory[0xA1] = cal["H1"]
+
+        h4, h5 = cal["H4"] & 0xFFF, cal["H5"] & 0xFFF
+        self.memory[self.REG_CALIB26:self.REG_CALIB26 + 7] = bytes([
+            cal["H2"] & 0xFF, (cal["H2"] >> 8) & 0xFF, cal["H3"],
+            h4 >> 4, ((h5 & 0x0F) << 4) | (h4 & 0x0F), h5 >> 4, cal["H6"] & 0xFF,
+        ])
+
+    @staticmethod
+    def _search(target, evaluate, increasing):
+        # Binary search of a 20-bit (or 16-bit) raw value for a monotonic compensation
+        low, high = 0, (1 << 20) - 1
+        while low < high:
+            middle = (low + high) // 2
+            value = evaluate(middle)
+            if (value < target) == increasing:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def set_environment(self, temperature, pressure, humidity):
+
+        """Set the environment the sensor measures and update the raw data registers."""
+
+        cal = self.calibration
+        adc_t = self._search(int(round(temperature * 100)),
+                             lambda raw: bme280_compensate(cal, raw, 0, 0)[0], True)
+        adc_p = self._search(int(round(pressure * 256)),
+                             lambda raw: bme280_compensate(cal, adc_t, raw, 0)[1], False)
+        adc_h = min(self._search(int(round(humidity * 1024)),
+                                 lambda raw: bme280_compensate(cal, adc_t, 0, raw)[2], True), 0xFFFF)
+
+        self.memory[self.REG_DATA:self.REG_DATA + 8] = bytes([
+            adc_p >> 12, (adc_p >> 4) & 0xFF, (adc_p & 0x0F) << 4,
+            adc_t >> 12, (adc_t >> 4) & 0xFF, (adc_t & 0x0F) << 4,
+            adc_h >> 8, adc_h & 0xFF,
+        ])
+
+    def write(self, data):
+        self.pointer = data[0]
+        for offset, value in enumerate(data[1:]):
+            reg = (self.pointer + offset) & 0xFF
+            if reg in (self.REG_CTRL_HUM, self.REG_CTRL_MEAS, self.REG_CONFIG):
+                self.memory[reg] = value
+
+    def read(self, nbytes):
+        start = self.pointer
+        data = bytes(self.memory[(start + n) & 0xFF] for n in range(nbytes))
+        self.pointer = (start + nbytes) & 0xFF
+        return data
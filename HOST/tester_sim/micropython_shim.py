@@ -0,0 +1,27 @@
+# Stand-in for the MicroPython "micropython" module.
+# Installed as the "micropython" module by the simulator, so the TESTER modules import unmodified
+# on CPython: the code-emitter decorators return the function as it is and const() its value.
+
+
+def native(func):
+    return func
+
+
+def viper(func):
+    return func
+
+
+def const(value):
+    return value
+
+
+def kbd_intr(char):
+    pass
+
+
+def schedule(func, arg):
+    func(arg)
+
+
+def mem_info(verbose=False):
+    print("mem_info() is not available on the host")
@@ -0,0 +1,171 @@
+# Loads the unmodified TESTER modules on CPython against a simulated board.
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time as _real_time
+
+from tester_sim import bme280_shim, micropython_shim
+from tester_sim.board import Board, ButtonOperator, SimulationComplete
+
+TESTER_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "TESTER"))
+
+
+def tester_module_names():
+
+    """Return the names of the modules in the TESTER directory."""
+
+    return sorted(name[:-3] for name in os.listdir(TESTER_DIR) if name.endswith(".py"))
+
+
+class Simulation:
+
+    """
+    A simulated TESTER station.
+
+    Installs fake "machine", "utime", "time", "bme280" and "micropython" modules bound to a Board, then imports
+    fresh copies of the TESTER modules so they run on the virtual clock. Each Simulation has its
+    own copies, so several simulations can run one after the other in one process.
+    """
+
+    def __init__(self, board=None, workdir=None, quiet=True):
+
+        """
+        Parameters:
+        board (Board): Simulated hardware, a good board by default.
+        workdir (str): Directory standing in for the Pico filesystem, a temporary one by default.
+        quiet (bool): Capture the serial output instead of printing it.
+        """
+
+        self.board = board or Board()
+        self.clock = self.board.clock
+        self.workdir = workdir or tempfile.mkdtemp(prefix="tester_sim_")
+        self.quiet = quiet
+        self.output = io.StringIO()
+        self.modules = {}
+        self.verdicts = []        # (mode, result of activate_test) of every test run
+        self.machine = self.board.machine_module()
+        self.time = self.clock.module("utime")
+
+    def _fake_modules(self):
+        return {
+            "machine": self.machine,
+            "utime": self.time,
+            "time": self.time,
+            "bme280": bme280_shim,
+            "micropython": micropython_shim,
+        }
+
+    def load(self, name):
+
+        """
+        Import a TESTER module (and the TESTER modules it imports) against this board.
+
+        Parameters:
+        name (str): Module name, e.g. "mode_select".
+
+        Returns:
+        module: The imported module.
+        """
+
+        if name in self.modules:
+            return self.modules[name]
+
+        tester_names = set(tester_module_names())
+        saved = {}
+
+        # Swap in the fakes and this simulation's TESTER modules only while importing, so the
+        # imported modules keep references to the fakes and the host Python is left untouched
+        for module_name, module in self._fake_modules().items():
+            saved[module_name] = sys.modules.get(module_name)
+            sys.modules[module_name] = module
+        for module_name in tester_names:
+            saved[module_name] = sys.modules.pop(module_name, None)
+            if module_name in self.modules:
+                sys.modules[module_name] = self.modules[module_name]
+
+        sys.path.insert(0, TESTER_DIR)
+        try:
+            __import__(name)
+            for module_name in tester_names:
+                if module_name in sys.modules:
+                    self.modules[module_name] = sys.modules[module_name]
+        finally:
+            sys.path.remove(TESTER_DIR)
+            for module_name, module in saved.items():
+                if module is None:
+                    sys.modules.pop(module_name, None)
+                else:
+                    sys.modules[module_name] = module
+
+        return self.modules[name]
+
+    def _watch_verdicts(self):
+        # Record the outcome of every ModeSelect.activate_test() call without touching the class
+        # for other simulations: the wrapper is installed on this simulation's copy only
+        mode_select = self.load("mode_select").ModeSelect
+        if getattr(mode_select.activate_test, "sim_wrapped", False):
+            return
+
+        activate_test = mode_select.activate_test
+        verdicts = self.verdicts
+
+        def watched(selector):
+            result = activate_test(selector)
+            if selector.active_mode is not None:
+                verdicts.append((selector.active_mode, result))
+            return result
+
+        watched.sim_wrapped = True
+        mode_select.activate_test = watched
+
+    @contextlib.contextmanager
+    def running(self):
+
+        """Context in which TESTER code runs: Pico filesystem directory and serial output."""
+
+        previous = os.getcwd()
+        os.chdir(self.workdir)
+        try:
+            if self.quiet:
+                with contextlib.redirect_stdout(self.output):
+                    yield self
+            else:
+                yield self
+        finally:
+            os.chdir(previous)
+
+    def run_main(self, script):
+
+        """
+        Run the unmodified main.main() loop until the operator script is exhausted.
+
+        Parameters:
+        script (iterable): Mode names (button presses) or None (idle scans).
+
+        Returns:
+        dict: Simulated seconds, wall-clock seconds, button presses and I2C transactions.
+        """
+
+        operator = ButtonOperator(self.board, script)
+        main = self.load("main")
+        self._watch_verdicts()
+
+        sim_start = self.clock.now_us
+        transactions = self.board.bus.transactions
+        wall_start = _real_time.perf_counter()
+
+        with self.running():
+            try:
+                main.main()
+            except SimulationComplete:
+                pass
+
+        return {
+            "simulated_s": (self.clock.now_us - sim_start) / 1e6,
+            "wall_s": _real_time.perf_counter() - wall_start,
+            "presses": operator.presses,
+            "i2c_transactions": self.board.bus.transactions - transactions,
+        }
@@ -0,0 +1,161 @@
+# A simulated station on a serial line.
+# The unmodified main() loop runs with HOST_COMMANDS on a pseudo-terminal, so host tools open the
+# station exactly like a Pico on /dev/ttyACM*. Each station is a separate process with its own
+# board; a new board under test (good, or with a random fault) is "inserted" before every
+# sequence.
+#
+#     station = SimulatedStation(speed=50)
+#     client = TesterClient(open_port(station.port))
+
+import argparse
+import os
+import pty
+import random
+import subprocess
+import sys
+import tty
+
+from tester_sim.board import Board
+from tester_sim.simulation import Simulation
+
+HOST_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+SENSORS = ("ina226", "tsl2591", "scd41", "bme280")
+
+
+class _SerialStdin:
+
+    # Unbuffered stand-in for sys.stdin: CommandServer polls the descriptor and reads one byte at
+    # a time, which a buffered reader would defeat by reading ahead
+
+    def __init__(self, fd):
+        self.buffer = open(fd, "rb", buffering=0, closefd=False)
+        self._fd = fd
+
+    def fileno(self):
+        return self._fd
+
+
+class BoardFeeder:
+
+    """
+    Puts a new board under test before every sequence: a good one, or with probability
+    fail_rate one with an open wire or a missing sensor.
+    """
+
+    def __init__(self, board, fail_rate=0.0, seed=None):
+        self.board = board
+        self.fail_rate = fail_rate
+        self.random = random.Random(seed)
+        self.devices = {name: getattr(board, name) for name in SENSORS}
+        self.boards = 0
+
+    def insert(self):
+        board = self.board
+        board.harness.opens.clear()
+        for device in self.devices.values():
+            if device.address not in board.bus.devices:
+                board.bus.attach(device)
+
+        self.boards += 1
+        if self.random.random() >= self.fail_rate:
+            return
+
+        fault = self.random.choice(("wire",) + SENSORS)
+        if fault == "wire":
+            board.harness.opens.add(self.random.randrange(len(board.harness.in_pins)))
+        else:
+            board.bus.detach(self.devices[fault].address)
+
+
+def serve(speed=None, fail_rate=0.0, seed=None):
+
+    """
+    Run the firmware main() loop with host commands on this process's stdin/stdout until the
+    host sends the exit command.
+
+    Parameters:
+    speed (float): Simulated seconds per wall-clock second, None: as fast as possible.
+    fail_rate (float): Probability that an inserted board has a fault.
+    seed (int): Random seed of the faults.
+    """
+
+    board = Board()
+    sim = Simulation(board, quiet=False)
+    main = sim.load("main")
+    main.HOST_COMMANDS = True
+
+    feeder = BoardFeeder(board, fail_rate, seed)
+    server = sim.load("host_protocol").CommandServer
+    run_sequence = server.HANDLERS[sim.load("protocol_frames").CMD_RUN_SEQUENCE]
+
+    def insert_and_run(self, payload):
+        feeder.insert()
+        return run_sequence(self, payload)
+
+    server.HANDLERS = dict(server.HANDLERS)
+    server.HANDLERS[sim.load("protocol_frames").CMD_RUN_SEQUENCE] = insert_and_run
+
+    sys.stdin = _SerialStdin(sys.stdin.fileno())
+    board.clock.pace(speed)
+    with sim.running():
+        main.main()
+
+
+class SimulatedStation:
+
+    """
+    A station process behind a pseudo-terminal.
+
+    port is the path of the terminal, to be opened like a real serial port.
+    """
+
+    def __init__(self, speed=None, fail_rate=0.0, seed=None):
+
+        """
+        Parameters:
+        speed (float): Simulated seconds per wall-clock second, None: as fast as possible.
+        fail_rate (float): Probability that an inserted board has a fault.
+        seed (int): Random seed of the faults.
+        """
+
+        master, slave = pty.openpty()
+        tty.setraw(slave)
+        self.port = os.ttyname(slave)
+
+        command = [sys.executable, "-m", "tester_sim.station", "--fail-rate", str(fail_rate)]
+        if speed:
+            command += ["--speed", str(speed)]
+        if seed is not None:
+            command += ["--seed", str(seed)]
+
+        # The station process holds the master side; the host opens the terminal path like a
+        # serial port. The slave descriptor stays open so the terminal survives reconnections.
+        self.process = subprocess.Popen(command, cwd=HOST_DIR, stdin=master, stdout=master,
+                                        stderr=subprocess.DEVNULL)
+        os.close(master)
+        self._slave = slave
+
+    def close(self, timeout=5):
+
+        """Stop the station process (send the exit command first for a clean shutdown)."""
+
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        os.close(self._slave)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a simulated station on stdin/stdout.")
+    parser.add_argument("--speed", type=float, default=None, help="simulated seconds per wall-clock second")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="probability of a faulty board")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    serve(args.speed, args.fail_rate, args.seed)
+
+
+if __name__ == "__main__":
+    main()
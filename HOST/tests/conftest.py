@@ -0,0 +1,23 @@
+# Shared fixtures of the host tests. The TESTER modules are loaded through the simulator, so they run
+# unmodified on CPython with the fake "machine", "time" and "micropython" modules.
+#
+#     python -m pytest HOST/tests
+
+import os
+import sys
+
+import pytest
+
+HOST_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if HOST_DIR not in sys.path:
+    sys.path.insert(0, HOST_DIR)
+
+from tester_sim import Simulation  # noqa: E402
+
+
+@pytest.fixture
+def sim(tmp_path):
+
+    """A simulated station with a good board, its Pico filesystem in a temporary directory."""
+
+    return Simulation(workdir=str(tmp_path))
@@ -0,0 +1,32 @@
+# schmitt(): threshold with hysteresis over an ADC burst.
+
+import pytest
+
+RISING = 1000
+FALLING = 900
+
+
+@pytest.fixture
+def schmitt(sim):
+    return sim.load("analog_check").schmitt
+
+
+def test_steady_levels(schmitt):
+    assert schmitt([1200] * 8, RISING, FALLING) == (1, 0)
+    assert schmitt([100] * 8, RISING, FALLING) == (0, 0)
+
+
+def test_noise_inside_the_band_does_not_switch(schmitt):
+    # Between the thresholds the state is held, whichever side it started on
+    assert schmitt([1000, 950, 990, 910, 960], RISING, FALLING) == (1, 0)
+    assert schmitt([950, 990, 910, 999, 920], RISING, FALLING) == (0, 0)
+
+
+def test_crossings_are_counted(schmitt):
+    assert schmitt([800, 1000, 950, 899, 905, 1001], RISING, FALLING) == (1, 3)
+
+
+def test_rising_threshold_is_inclusive_and_falling_is_exclusive(schmitt):
+    assert schmitt([0, RISING], RISING, FALLING) == (1, 1)
+    assert schmitt([RISING, FALLING], RISING, FALLING) == (1, 0)
+    assert schmitt([RISING, FALLING - 1], RISING, FALLING) == (0, 1)
@@ -0,0 +1,79 @@
+# Simulated test runs for a good board and for each injectable fault: only the test of the faulty
+# part fails.
+
+import pytest
+
+from tester_sim import Board, Simulation
+
+MODES = ('wire_test_mode', 'current_test_mode', 'light_test_mode', 'co2_test_mode')
+
+
+def open_wire(board):
+    board.harness.opens.add(2)
+
+
+def short_wires(board):
+    board.harness.shorts.add((1, 4))
+
+
+def missing(name):
+    def inject(board):
+        board.bus.detach(getattr(board, name).address)
+    return inject
+
+
+# Fault: (injection, mode expected to fail)
+FAULTS = {
+    "wire_open": (open_wire, 'wire_test_mode'),
+    "wire_short": (short_wires, 'wire_test_mode'),
+    "ina226_missing": (missing("ina226"), 'current_test_mode'),
+    "tsl2591_missing": (missing("tsl2591"), 'light_test_mode'),
+    "bme280_missing": (missing("bme280"), 'light_test_mode'),
+    "scd41_missing": (missing("scd41"), 'co2_test_mode'),
+}
+
+
+def run_tests(board, tmp_path):
+    sim = Simulation(board, workdir=str(tmp_path))
+    mode_select = sim.load("mode_select")
+    i2c_setup = sim.load("i2c_setup")
+    with sim.running():
+        selector = mode_select.ModeSelect(i2c_setup.initialize_i2c())
+        return {mode: selector.execute_test(mode) for mode in MODES}
+
+
+def test_good_board_passes_every_test(tmp_path):
+    assert run_tests(Board(), tmp_path) == {mode: True for mode in MODES}
+
+
+@pytest.mark.parametrize("fault", sorted(FAULTS))
+def test_fault_fails_its_test_only(tmp_path, fault):
+    inject, failing_mode = FAULTS[fault]
+    board = Board()
+    inject(board)
+
+    verdicts = run_tests(board, tmp_path)
+
+    assert not verdicts[failing_mode]
+    assert all(verdicts[mode] for mode in MODES if mode != failing_mode)
+
+
+def test_out_of_spec_current_fails(tmp_path):
+    # 2 mA: the load of the board is not connected
+    board = Board()
+    board.ina226.current = 0.002
+    assert run_tests(board, tmp_path)['current_test_mode'] is False
+
+
+def test_sequence_stops_at_the_first_failure(tmp_path):
+    board = Board()
+    open_wire(board)
+    sim = Simulation(board, workdir=str(tmp_path))
+    mode_select = sim.load("mode_select")
+    i2c_setup = sim.load("i2c_setup")
+    with sim.running():
+        selector = mode_select.ModeSelect(i2c_setup.initialize_i2c())
+        passed, reports = selector.run_sequence()
+    assert passed is False
+    assert reports[-1][:2] == ('wire_test_mode', False)
+    assert len(reports) == selector.sequence_order().index('wire_test_mode') + 1
@@ -0,0 +1,32 @@
+# I2C traces: records written by TraceBuffer read back by i2c_replay.read_trace().
+
+import os
+
+import i2c_replay
+
+
+def write_trace(sim, transfers):
+    i2c_trace = sim.load("i2c_trace")
+    path = os.path.join(sim.workdir, "i2c_trace.bin")
+    with sim.running():
+        trace = i2c_trace.TraceBuffer(capacity=256, path=path)
+        trace.start()
+        for kind, addr, reg, data in transfers:
+            trace.add(kind, addr, reg, data)
+        trace.stop()
+    return i2c_replay.read_trace(path)
+
+
+def test_records_read_back(sim):
+    records = write_trace(sim, [(i2c_replay.KIND_WRITE_MEM, 0x40, 0x05, b"\x20\x00"),
+                                (i2c_replay.KIND_READ, 0x62, 0, bytes(9))])
+    assert [(r.kind, r.addr, r.reg, r.data) for r in records] == [
+        (i2c_replay.KIND_WRITE_MEM, 0x40, 0x05, b"\x20\x00"), (i2c_replay.KIND_READ, 0x62, 0, bytes(9))]
+
+
+def test_transfer_longer_than_255_bytes_is_split_and_joined(sim):
+    # 600 bytes: three records, and more than the RAM buffer, so the pieces are saved in between
+    data = bytes(n & 0xFF for n in range(600))
+    records = write_trace(sim, [(i2c_replay.KIND_WRITE, 0x29, 0, data), (i2c_replay.KIND_READ, 0x29, 0, b"\x01")])
+    assert [(r.kind, r.data) for r in records] == [(i2c_replay.KIND_WRITE, data), (i2c_replay.KIND_READ, b"\x01")]
+    assert not records[0].error
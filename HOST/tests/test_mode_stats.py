@@ -0,0 +1,68 @@
+# ModeStats: failure/duration statistics and the fail-fast sequence order.
+
+import pytest
+
+MODES = ('wire_test_mode', 'current_test_mode', 'light_test_mode', 'co2_test_mode')
+
+
+@pytest.fixture
+def modules(sim):
+    return sim.load("mode_stats"), sim.load("result_store")
+
+
+def test_order_before_any_run_follows_the_default_durations(sim, modules):
+    mode_stats, result_store = modules
+    with sim.running():
+        stats = mode_stats.ModeStats()
+    # Same prior failure rate everywhere: the quickest tests go first
+    assert stats.order(MODES, result_store.MODE_CODES) == [
+        'current_test_mode', 'wire_test_mode', 'light_test_mode', 'co2_test_mode']
+
+
+def test_often_failing_test_moves_first(sim, modules):
+    mode_stats, result_store = modules
+    codes = result_store.MODE_CODES
+    with sim.running():
+        stats = mode_stats.ModeStats()
+        for n in range(20):
+            stats.record(codes['wire_test_mode'], n % 2 == 0, 300)
+            stats.record(codes['current_test_mode'], True, 300)
+    assert stats.order(MODES, codes)[0] == 'wire_test_mode'
+
+
+def test_ties_keep_the_given_order(sim, modules):
+    mode_stats, result_store = modules
+    codes = result_store.MODE_CODES
+    with sim.running():
+        stats = mode_stats.ModeStats()
+        for mode in MODES:
+            stats.record(codes[mode], True, 100)
+    assert stats.order(MODES, codes) == list(MODES)
+
+
+def test_statistics_survive_a_reboot(sim, modules):
+    mode_stats, result_store = modules
+    code = result_store.MODE_CODES['co2_test_mode']
+    with sim.running():
+        stats = mode_stats.ModeStats()
+        stats.record(code, False, 1000)
+        stats.record(code, True, 3000)
+        stats.save()
+        loaded = mode_stats.ModeStats()
+    assert loaded.entries[code] == [2, 1, 2000.0]
+    assert loaded.failure_rate(code) == 0.5
+
+
+@pytest.mark.parametrize("keep", [0, 3, -1])
+def test_truncated_file_starts_empty(sim, modules, keep):
+    mode_stats, _ = modules
+    with sim.running():
+        stats = mode_stats.ModeStats()
+        for code in (1, 2, 3):
+            stats.record(code, True, 100)
+        stats.save()
+        with open(mode_stats.DEFAULT_STATS_FILE, "rb") as stats_file:
+            data = stats_file.read()
+        with open(mode_stats.DEFAULT_STATS_FILE, "wb") as stats_file:
+            stats_file.write(data[:keep])
+        assert mode_stats.ModeStats().entries == {}
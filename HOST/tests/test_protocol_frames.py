@@ -0,0 +1,61 @@
+# FrameParser: reception of whole, split and corrupted frames.
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "TESTER"))
+
+from protocol_frames import CMD_PING, CMD_RUN_TEST, SYNC, FrameParser, encode_frame  # noqa: E402
+
+
+def feed_all(parser, data):
+    # Feed the bytes one at a time and collect every complete frame
+    frames = []
+    for byte in data:
+        if parser.feed(byte):
+            frames.append((parser.request_id, parser.command, parser.payload))
+            while parser.next_frame():
+                frames.append((parser.request_id, parser.command, parser.payload))
+    return frames
+
+
+def test_single_frame():
+    parser = FrameParser()
+    assert feed_all(parser, encode_frame(7, CMD_RUN_TEST, b"\x02")) == [(7, CMD_RUN_TEST, b"\x02")]
+    assert parser.length == 0
+
+
+def test_frame_split_across_reads():
+    parser = FrameParser()
+    frame = encode_frame(300, CMD_RUN_TEST, b"\x01\x02\x03")
+    assert feed_all(parser, frame[:4]) == []
+    assert feed_all(parser, frame[4:]) == [(300, CMD_RUN_TEST, b"\x01\x02\x03")]
+
+
+def test_back_to_back_frames():
+    parser = FrameParser()
+    data = encode_frame(1, CMD_PING) + encode_frame(2, CMD_RUN_TEST, b"\x04")
+    assert feed_all(parser, data) == [(1, CMD_PING, b""), (2, CMD_RUN_TEST, b"\x04")]
+
+
+@pytest.mark.parametrize("garbage", [b"\x00\x13\x37", bytes([SYNC, 0x01]), bytes([SYNC, 0xFF, 0xFF, 0, 0, 1])])
+def test_resync_after_garbage(garbage):
+    parser = FrameParser()
+    assert feed_all(parser, garbage + encode_frame(5, CMD_PING)) == [(5, CMD_PING, b"")]
+
+
+def test_corrupted_frame_is_dropped():
+    parser = FrameParser()
+    bad = bytearray(encode_frame(1, CMD_RUN_TEST, b"\x01"))
+    bad[-1] ^= 0xFF
+    assert feed_all(parser, bytes(bad) + encode_frame(2, CMD_PING)) == [(2, CMD_PING, b"")]
+    assert parser.dropped == 1
+
+
+def test_oversized_length_is_dropped():
+    parser = FrameParser(max_payload=8)
+    oversized = encode_frame(1, CMD_RUN_TEST, bytes(9))
+    assert feed_all(parser, oversized + encode_frame(2, CMD_PING)) == [(2, CMD_PING, b"")]
+    assert parser.dropped >= 1
@@ -0,0 +1,80 @@
+# ResultStore: slot rotation, wraparound of a batch at the end of the file, and decoding on the host.
+
+import os
+import struct
+
+import pytest
+
+import decode_results
+
+
+def store_path(sim):
+    return os.path.join(sim.workdir, "results.bin")
+
+
+def append_records(sim, count, capacity):
+    result_store = sim.load("result_store")
+    with sim.running():
+        store = result_store.ResultStore(capacity=capacity)
+        for n in range(count):
+            store.append(result_store.MODE_CURRENT, result_store.VERDICT_PASS, duration_ms=n)
+        store.flush()
+    return store
+
+
+def test_records_in_sequence_order(sim):
+    store = append_records(sim, 3, capacity=8)
+    records = decode_results.read_records(store_path(sim))
+    assert [record[0] for record in records] == [0, 1, 2]
+    assert store.next_seq == 3
+
+
+def test_oldest_records_are_overwritten(sim):
+    # 12 records in one batch through 5 slots: the batch wraps around the end of the file twice
+    append_records(sim, 12, capacity=5)
+    fields = decode_results.RECORD_FIELDS
+    records = [dict(zip(fields, record)) for record in decode_results.read_records(store_path(sim))]
+    assert [record["seq"] for record in records] == [7, 8, 9, 10, 11]
+    assert [record["duration_ms"] for record in records] == [7, 8, 9, 10, 11]
+
+
+def test_record_goes_to_slot_seq_modulo_capacity(sim):
+    append_records(sim, 7, capacity=5)
+    slots = decode_results.to_numpy(store_path(sim))
+    with open(store_path(sim), "rb") as result_file:
+        data = result_file.read()
+    first_slot = struct.unpack_from("<I", data, decode_results.HEADER_SIZE)[0]
+    assert first_slot == 5
+    assert list(slots["seq"]) == [2, 3, 4, 5, 6]
+
+
+def test_reopened_store_continues_the_sequence(sim):
+    append_records(sim, 6, capacity=4)
+    store = append_records(sim, 2, capacity=4)
+    assert store.next_seq == 8
+    records = decode_results.read_records(store_path(sim))
+    assert [record[0] for record in records] == [4, 5, 6, 7]
+
+
+def test_channel_of_a_direct_board(sim):
+    append_records(sim, 1, capacity=4)
+    record = dict(zip(decode_results.RECORD_FIELDS, decode_results.read_records(store_path(sim))[0]))
+    assert record["channel"] == decode_results.NO_CHANNEL
+
+
+def test_truncated_file_is_rejected(sim):
+    append_records(sim, 3, capacity=4)
+    with open(store_path(sim), "rb") as result_file:
+        data = result_file.read()
+
+    for size in (0, decode_results.HEADER_SIZE - 1, len(data) - 1):
+        with pytest.raises(ValueError):
+            decode_results.read_header(data[:size])
+
+
+def test_store_with_a_truncated_header_starts_over(sim):
+    with open(store_path(sim), "wb") as result_file:
+        result_file.write(b"CTRS\x03")
+    store = append_records(sim, 2, capacity=4)
+    assert store.next_seq == 2
+    assert len(decode_results.read_records(store_path(sim))) == 2
@@ -0,0 +1,54 @@
+# The integer kernels of sensor_math must match their plain Python references exactly.
+
+import pytest
+
+RAW_VALUES = range(0, 0x10000, 7)
+
+KERNELS = [
+    "scd41_centidegrees",
+    "scd41_centipercent",
+    "ina226_bus_microvolts",
+    "ina226_shunt_nanovolts",
+    "ina226_signed",
+    "ina226_power_microwatts",
+    "bme280_centipercent",
+]
+
+
+@pytest.fixture
+def sensor_math(sim):
+    return sim.load("sensor_math")
+
+
+@pytest.mark.parametrize("name", KERNELS)
+def test_register_kernels_match_reference(sensor_math, name):
+    kernel = getattr(sensor_math, name)
+    reference = getattr(sensor_math, "ref_" + name)
+    assert [kernel(raw) for raw in RAW_VALUES] == [reference(raw) for raw in RAW_VALUES]
+
+
+def test_bme280_milliatm_matches_reference(sensor_math):
+    # Whole Pa over the sensor range (30-110 kPa)
+    for pascal in range(30_000, 110_001, 13):
+        assert sensor_math.bme280_milliatm(pascal) == sensor_math.ref_bme280_milliatm(pascal)
+
+
+@pytest.mark.parametrize("ir_fraction", [0, 0.33, 1])
+def test_tsl2591_decilux_matches_reference(sensor_math, ir_fraction):
+    for full in RAW_VALUES:
+        ir = int(full * ir_fraction)
+        for atime_ms, again in ((100, 1), (200, 25), (600, 428)):
+            assert (sensor_math.tsl2591_decilux(full, ir, atime_ms, again)
+                    == sensor_math.ref_tsl2591_decilux(full, ir, atime_ms, again))
+
+
+def test_tsl2591_saturated_channel_reads_zero(sensor_math):
+    assert sensor_math.tsl2591_decilux(sensor_math.TSL2591_SATURATED, 100, 100, 1) == 0
+    assert sensor_math.tsl2591_decilux(1000, sensor_math.TSL2591_SATURATED, 100, 1) == 0
+
+
+def test_bme280_scale_takes_q24_8_pressure(sensor_math):
+    temperature, pressure, humidity = sensor_math.bme280_scale(2350, 101_325 << 8, 46 << 10)
+    assert temperature == 23.5
+    assert pressure == 1.0
+    assert humidity == 46.0
@@ -2,7 +2,48 @@
 # There are some missing parts.
 
 from machine import I2C, Pin
+from micropython import const
 import time
+import sensor_math
+from sequential_check import SequentialCheck, SpecLimit
+from event_log import log, EV_INA226_ALERT, EV_INA226_ALERT_ARMED
+
+# Register addresses and default configuration. The underscore names are folded into the bytecode
+# by the compiler and take no RAM at run time.
+_REG_CONFIG = const(0x00)
+_REG_SHUNT_VOLTAGE = const(0x01)
+_REG_BUS_VOLTAGE = const(0x02)
+_REG_POWER = const(0x03)
+_REG_CURRENT = const(0x04)
+_REG_CALIBRATION = const(0x05)
+_REG_MASK_ENABLE = const(0x06)
+_REG_ALERT_LIMIT = const(0x07)
+_CONFIG_VALUE = const(0x4127)       # Example config value
+_CALIBRATION_VALUE = const(0x2000)  # Example calibration value
+
+# Spec limits of a good board for is_working(): volts and amperes (10-200 mA)
+BUS_VOLTAGE_LIMIT = SpecLimit(4.5, 5.5, 0.01)
+CURRENT_LIMIT = SpecLimit(0.010, 0.200, 0.0001)
+SAMPLE_INTERVAL_MS = const(3)   # A new conversion is ready every 2.2 ms with the default configuration
+
+# Alert functions of the Mask/Enable register. The chip compares every conversion with the Alert
+# Limit register and pulls its open-drain ALERT pin low, so only one function can be enabled at a time.
+ALERT_SHUNT_OVER = const(0x8000)    # Shunt voltage over the limit: overcurrent
+ALERT_SHUNT_UNDER = const(0x4000)
+ALERT_BUS_OVER = const(0x2000)
+ALERT_BUS_UNDER = const(0x1000)     # Bus voltage under the limit: brown-out
+ALERT_POWER_OVER = const(0x0800)
+_MASK_ALERT_FLAG = const(0x0010)    # Set when the alert fired, cleared by reading the register
+_MASK_LATCH_ENABLE = const(0x0001)  # ALERT stays low until the Mask/Enable register is read
+
+SHUNT_OHMS = 0.1
+SHUNT_LSB_V = 2.5e-6
+BUS_LSB_V = 1.25e-3
+# Calibration = 0.00512 / (current LSB * shunt), so the current LSB follows from the calibration
+# value (6.25 uA with 0x2000 and 0.1 ohm); the power register LSB is 25 current LSBs (156.25 uW,
+# see sensor_math.ina226_power_microwatts())
+CURRENT_LSB_A = 0.00512 / (_CALIBRATION_VALUE * SHUNT_OHMS)
+POWER_LSB_W = 25 * CURRENT_LSB_A
 
 class INA226:
     
@@ -10,34 +51,59 @@ class INA226:
         self.i2c = i2c
         self.address = address
         
-        # Register addresses
-        self.REG_CONFIG = 0x00
-        self.REG_SHUNT_VOLTAGE = 0x01
-        self.REG_BUS_VOLTAGE = 0x02
-        self.REG_POWER = 0x03
-        self.REG_CURRENT = 0x04
-        self.REG_CALIBRATION = 0x05
+        # Register transfers go through one preallocated buffer
+        self._buffer = bytearray(2)
         
-        # Default configuration and calibration values
-        self.config_value = 0x4127  # Example config value
-        self.calibration_value = 0x2000  # Example calibration value
+        # Readings of the last is_working() call (bus voltage, shunt voltage, current, power),
+        # averaged over the samples it took
+        self.last_reading = (None, None, None, None)
+        self.check = SequentialCheck((BUS_VOLTAGE_LIMIT, None, CURRENT_LIMIT, None))
+        
+        # Alert function programmed by set_alert() and the ALERT falling edges seen since the
+        # last clear_alert(); counted by the pin interrupt, without any I2C traffic
+        self.alert_function = 0
+        self.alert_limit = 0        # Alert Limit register value of alert_function
+        self.alerts = 0
+        self.alert_pin = None
         
         # Initialize the sensor
-        self.write_register(self.REG_CONFIG, self.config_value)
-        self.write_register(self.REG_CALIBRATION, self.calibration_value)
+        # A missing sensor must not stop the other tests, is_working() reports it
+        try:
+            self.configure()
+            
+        except OSError:
+            pass
+    
+    def configure(self):
+        """
+        Writes the configuration and calibration registers, and the alert function of set_alert()
+        if any. The chip is on the board under test and powers up with its defaults, so call it
+        again after the board was swapped.
+        """
+        self.write_register(_REG_CONFIG, _CONFIG_VALUE)
+        self.write_register(_REG_CALIBRATION, _CALIBRATION_VALUE)
+        if self.alert_function:
+            self._write_alert()
+    
+    def _write_alert(self):
+        self.write_register(_REG_ALERT_LIMIT, self.alert_limit)
+        self.write_register(_REG_MASK_ENABLE, self.alert_function | _MASK_LATCH_ENABLE)
     
     def write_register(self, reg, data):
-        data_bytes = data.to_bytes(2, 'big')
-        self.i2c.writeto_mem(self.address, reg, data_bytes)
+        buffer = self._buffer
+        buffer[0] = data >> 8 & 0xFF
+        buffer[1] = data & 0xFF
+        self.i2c.writeto_mem(self.address, reg, buffer)
     
     def read_register(self, reg):
-        data = self.i2c.readfrom_mem(self.address, reg, 2)
-        return int.from_bytes(data, 'big')
+        buffer = self._buffer
+        self.i2c.readfrom_mem_into(self.address, reg, buffer)
+        return buffer[0] << 8 | buffer[1]
     
     def read_bus_voltage(self):
         try:
-            bus_voltage_raw = self.read_register(self.REG_BUS_VOLTAGE)
-            bus_voltage = bus_voltage_raw * 1.25 / 1000.0  # Convert to volts
+            bus_voltage_raw = self.read_register(_REG_BUS_VOLTAGE)
+            bus_voltage = sensor_math.ina226_bus_volts(bus_voltage_raw)  # Convert to volts
             return bus_voltage
         
         except:
@@ -45,8 +111,8 @@ class INA226:
     
     def read_shunt_voltage(self):
         try:
-            shunt_voltage_raw = self.read_register(self.REG_SHUNT_VOLTAGE)
-            shunt_voltage = shunt_voltage_raw * 2.5 / 1000.0  # Convert to millivolts
+            shunt_voltage_raw = self.read_register(_REG_SHUNT_VOLTAGE)
+            shunt_voltage = sensor_math.ina226_shunt_millivolts(shunt_voltage_raw)  # Convert to millivolts
             return shunt_voltage
         
         except:
@@ -54,34 +120,111 @@ class INA226:
     
     def read_current(self):
         try:
-            current_raw = self.read_register(self.REG_CURRENT)
-            current = current_raw  # Apply calibration formula here if necessary
+            current_raw = self.read_register(_REG_CURRENT)
+            current = sensor_math.ina226_signed(current_raw) * CURRENT_LSB_A  # Convert to amperes
             return current
+        
         except:
             return None
     
     def read_power(self):
         try:
-            power_raw = self.read_register(self.REG_POWER)
-            power = power_raw * 25.0 / 1000.0  # Convert to watts
+            power_raw = self.read_register(_REG_POWER)
+            power = sensor_math.ina226_power_watts(power_raw)  # Convert to watts
             return power
         
         except:
             return None
     
+    def alert_limit_value(self, function, limit):
+        """
+        Converts a limit in engineering units to the Alert Limit register value of an alert function:
+        amperes through the shunt for the shunt functions, volts for the bus functions, watts for
+        ALERT_POWER_OVER.
+        """
+        if function in (ALERT_SHUNT_OVER, ALERT_SHUNT_UNDER):
+            raw = int(limit * SHUNT_OHMS / SHUNT_LSB_V)
+            return max(-0x8000, min(0x7FFF, raw)) & 0xFFFF     # Two's complement, like the shunt register
+        if function in (ALERT_BUS_OVER, ALERT_BUS_UNDER):
+            return max(0, min(0x7FFF, int(limit / BUS_LSB_V)))
+        if function == ALERT_POWER_OVER:
+            return max(0, min(0xFFFF, int(limit / POWER_LSB_W)))
+        raise ValueError("Unknown alert function")
+    
+    def set_alert(self, function, limit, pin=None):
+        """
+        Programs the chip to latch its ALERT pin when a conversion crosses the limit (see
+        alert_limit_value() for the units), replacing the previous alert function.
+        With a pin, its falling edge is counted in self.alerts while other tests run; ALERT is
+        open-drain and active low, so the pin gets a pull-up.
+        Raises OSError if the chip does not answer (e.g. no board plugged in yet); the alert is
+        still kept and configure() writes it with the next board.
+        """
+        self.alert_limit = self.alert_limit_value(function, limit)
+        self.alert_function = function
+        
+        if pin is not None:
+            self.alert_pin = Pin(pin, Pin.IN, Pin.PULL_UP)
+            self.alert_pin.irq(trigger=Pin.IRQ_FALLING, handler=self._on_alert)
+        log(EV_INA226_ALERT_ARMED, function)
+        
+        self._write_alert()
+        self.clear_alert()
+    
+    def set_overcurrent_alert(self, amperes, pin=None):
+        self.set_alert(ALERT_SHUNT_OVER, amperes, pin)
+    
+    def set_brownout_alert(self, volts, pin=None):
+        self.set_alert(ALERT_BUS_UNDER, volts, pin)
+    
+    def set_power_alert(self, watts, pin=None):
+        self.set_alert(ALERT_POWER_OVER, watts, pin)
+    
+    def _on_alert(self, pin):
+        # Runs in the pin interrupt: no I2C, no allocation and no log() (its lock may be held by
+        # the interrupted code in dual-core mode), the edges are logged by clear_alert()
+        self.alerts += 1
+    
+    def clear_alert(self):
+        """
+        Releases the latched ALERT pin and resets self.alerts.
+        Returns True if the alert fired since the last call (flag or pin interrupt).
+        """
+        alerts = self.alerts
+        self.alerts = 0
+        fired = alerts > 0
+        if fired:
+            log(EV_INA226_ALERT, alerts)
+        flags = self.read_register(_REG_MASK_ENABLE)    # Reading clears the latch
+        return fired or bool(flags & _MASK_ALERT_FLAG)
+    
+    def disable_alert(self):
+        if self.alert_pin is not None:
+            self.alert_pin.irq(handler=None)
+            self.alert_pin = None
+        self.write_register(_REG_MASK_ENABLE, 0)
+        self.alert_function = 0
+        self.alert_limit = 0
+        self.alerts = 0
+    
     def is_working(self):
         """
-        Checks if any of the sensor readings (bus voltage, shunt voltage, current, power)
-        returns None. Returns True if all readings are valid, otherwise False.
+        Reads the sensor (bus voltage, shunt voltage, current, power) until the bus voltage and
+        current are certainly within or outside their spec limits (see sequential_check.py).
+        Returns True if the board is within its limits, False if it is not or a reading
+        returns None.
         """
-        bus_voltage = self.read_bus_voltage()
-        shunt_voltage = self.read_shunt_voltage()
-        current = self.read_current()
-        power = self.read_power()
+        self.check.reset()
+        verdict = None
+        
+        while verdict is None:
+            if self.check.count:
+                time.sleep_ms(SAMPLE_INTERVAL_MS)
+            reading = (self.read_bus_voltage(), self.read_shunt_voltage(), self.read_current(), self.read_power())
+            verdict = self.check.add(reading)
+            self.last_reading = reading if None in reading else self.check.means()
         
-        if bus_voltage is None or shunt_voltage is None or current is None or power is None:
-            return False
-        return True
+        return verdict
 
 
 def main():
@@ -97,7 +240,7 @@ def main():
             print("INA226 is working correctly.")
             print("Bus Voltage: {:.3f} V".format(ina226.read_bus_voltage()))
             print("Shunt Voltage: {:.3f} mV".format(ina226.read_shunt_voltage()))
-            print("Current: {:.3f} mA".format(ina226.read_current()))
+            print("Current: {:.3f} mA".format(ina226.read_current() * 1000))
             print("Power: {:.3f} W".format(ina226.read_power()))
         else:
             print("INA226 is not working correctly.")
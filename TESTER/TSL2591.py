@@ -1,25 +1,29 @@
 # LIBRARY OF TSL2591 LIGHT SENSOR
+from micropython import const
 import time
-
-# Constants for TSL2591 sensor
-SENSOR_ADDRESS = 0x29           # I2C address of the sensor
-REGISTER_ENABLE = 0x00          # Register to enable/disable the sensor
-REGISTER_CONTROL = 0x01         # Register to control settings
-REGISTER_CHAN0_LOW = 0x14       # Low byte register for full spectrum data
-REGISTER_CHAN0_HIGH = 0x15      # High byte register for full spectrum data
-REGISTER_CHAN1_LOW = 0x16       # Low byte register for infrared data
-REGISTER_CHAN1_HIGH = 0x17      # High byte register for infrared data
-COMMAND_BIT = 0xA0              # Command bit for I2C communication
-ENABLE_POWERON = 0x01           # Command to power on the sensor
-ENABLE_POWEROFF = 0x00          # Command to power off the sensor
-ENABLE_AEN = 0x02               # Command to enable analog engine
-ENABLE_AIEN = 0x10              # Command to enable interrupt
-INTEGRATIONTIME_100MS = 0x00    # Integration time of 100 milliseconds
-GAIN_LOW = 0x00                 # Low gain setting
-LUX_DF = 408.0                  # Lux conversion factor
-LUX_COEFB = 1.64                # Lux calculation coefficient B
-LUX_COEFC = 0.59                # Lux calculation coefficient C
-LUX_COEFD = 0.86                # Lux calculation coefficient D
+import sensor_math
+
+# Constants for TSL2591 sensor. The underscore names are folded into the bytecode by the compiler
+# and take no RAM at run time; the lux coefficients are in sensor_math.
+_SENSOR_ADDRESS = const(0x29)       # I2C address of the sensor
+_REGISTER_ENABLE = const(0x00)      # Register to enable/disable the sensor
+_REGISTER_CONTROL = const(0x01)     # Register to control settings
+_REGISTER_CHAN0_LOW = const(0x14)   # Low byte register for full spectrum data
+_REGISTER_CHAN1_LOW = const(0x16)   # Low byte register for infrared data
+_COMMAND_BIT = const(0xA0)          # Command bit for I2C communication
+_ENABLE_POWERON = const(0x01)       # Command to power on the sensor
+_ENABLE_POWEROFF = const(0x00)      # Command to power off the sensor
+_ENABLE_AEN = const(0x02)           # Command to enable analog engine
+_ENABLE_AIEN = const(0x10)          # Command to enable interrupt
+INTEGRATIONTIME_100MS = const(0x00) # Integration time of 100 milliseconds
+GAIN_LOW = const(0x00)              # Low gain setting
+
+INTEGRATION_TIME_MS = {
+    INTEGRATIONTIME_100MS: 100,     # Mapping integration time to milliseconds
+}
+GAIN_FACTOR = {
+    GAIN_LOW: 1,                    # Mapping gain to factor
+}
 
 class TSL2591:
     def __init__(self, i2c, integration=INTEGRATIONTIME_100MS, gain = GAIN_LOW):
@@ -27,6 +31,8 @@ class TSL2591:
         self.i2c = i2c                          # Store the I2C interface object
         self.integration_time = integration     # Set the integration time (how long the sensor collects data)
         self.gain = gain                        # Set the sensor's sensitivity
+        self._buffer = bytearray(2)             # Preallocated buffers for every transfer
+        self._command = bytearray(1)
         self.enable()                           # Turn on the sensor
         self.set_timing(self.integration_time)  # Set the integration time
         self.set_gain(self.gain)                # Set the gain
@@ -34,22 +40,26 @@ class TSL2591:
 
     def write_byte_data(self, addr, cmd, val):
         # Write a single byte of data to the sensor
-        buf = bytes([cmd, val])             # Create a byte buffer with the command and value
+        buf = self._buffer                  # Fill the buffer with the command and value
+        buf[0] = cmd
+        buf[1] = val
         self.i2c.writeto(addr, buf)         # Send the byte buffer to the sensor over I2C
 
     def read_word_data(self, addr, cmd):
         # Read two bytes of data from the sensor
-        buf = bytes([cmd])                     # Create a byte buffer with the command
-        self.i2c.writeto(addr, buf)        	   # Send the command to the sensor
-        data = self.i2c.readfrom(addr, 2)      # Read two bytes of data from the sensor
-        return int.from_bytes(data, 'little')  # Convert the bytes to an integer and return it
+        command = self._command
+        command[0] = cmd
+        self.i2c.writeto(addr, command)        # Send the command to the sensor
+        buf = self._buffer
+        self.i2c.readfrom_into(addr, buf)      # Read two bytes of data from the sensor
+        return buf[0] | buf[1] << 8            # Little-endian word
 
     def set_timing(self, integration):
         # Set the integration time for the sensor
         self.integration_time = integration     # Update the integration time
         self.write_byte_data(
-            SENSOR_ADDRESS,
-            COMMAND_BIT | REGISTER_CONTROL,      # Address of the control register
+            _SENSOR_ADDRESS,
+            _COMMAND_BIT | _REGISTER_CONTROL,    # Address of the control register
             self.integration_time | self.gain    # Write integration time and gain to the control register
         )
 
@@ -57,54 +67,40 @@ class TSL2591:
         # Set the gain for the sensor
         self.gain = gain                        # Update the gain
         self.write_byte_data(
-            SENSOR_ADDRESS,
-            COMMAND_BIT | REGISTER_CONTROL,      # Address of the control register
+            _SENSOR_ADDRESS,
+            _COMMAND_BIT | _REGISTER_CONTROL,    # Address of the control register
             self.integration_time | self.gain    # Write integration time and gain to the control register
         )
 
     def calculate_lux(self, full, ir):
         # Calculate the lux value based on full spectrum and infrared readings
-        if full == 0xFFFF or ir == 0xFFFF:
-            return 0  # Return 0 if data is invalid
-
-        case_integ = {
-            INTEGRATIONTIME_100MS: 100.,        # Mapping integration time to milliseconds
-        }
-        atime = case_integ.get(self.integration_time, 100.)  # Get the integration time in milliseconds
-
-        case_gain = {
-            GAIN_LOW: 1.,                        # Mapping gain to factor
-        }
-        again = case_gain.get(self.gain, 1.)     # Get the gain factor
-
-        cpl = (atime * again) / LUX_DF           # Calculate counts per lux
-        lux1 = (full - (LUX_COEFB * ir)) / cpl   # Calculate first lux value
-        lux2 = ((LUX_COEFC * full) - (LUX_COEFD * ir)) / cpl  # Calculate second lux value
-
-        return max(lux1, lux2)  # Return the higher of the two lux calculations
+        # The math runs in the integer kernel of sensor_math (0.1 lux resolution)
+        atime = INTEGRATION_TIME_MS.get(self.integration_time, 100)  # Get the integration time in milliseconds
+        again = GAIN_FACTOR.get(self.gain, 1)                        # Get the gain factor
+        return sensor_math.tsl2591_lux(full, ir, atime, again)     # Returns 0 if data is invalid
 
     def enable(self):
         # Turn on the sensor
         self.write_byte_data(
-            SENSOR_ADDRESS,
-            COMMAND_BIT | REGISTER_ENABLE,             # Address of the enable register
-            ENABLE_POWERON | ENABLE_AEN | ENABLE_AIEN  # Commands to power on and enable the sensor
+            _SENSOR_ADDRESS,
+            _COMMAND_BIT | _REGISTER_ENABLE,                # Address of the enable register
+            _ENABLE_POWERON | _ENABLE_AEN | _ENABLE_AIEN   # Commands to power on and enable the sensor
         )
 
     def disable(self):
         # Turn off the sensor
         self.write_byte_data(
-            SENSOR_ADDRESS,
-            COMMAND_BIT | REGISTER_ENABLE,       # Address of the enable register
-            ENABLE_POWEROFF                      # Command to power off the sensor
+            _SENSOR_ADDRESS,
+            _COMMAND_BIT | _REGISTER_ENABLE,      # Address of the enable register
+            _ENABLE_POWEROFF                      # Command to power off the sensor
         )
 
     def get_full_luminosity(self):
         # Get the full spectrum and infrared luminosity values
         self.enable()                        # Turn on the sensor
         time.sleep(0.120)                   # Wait for 120 milliseconds to allow sensor to take a reading
-        full = self.read_word_data(SENSOR_ADDRESS, COMMAND_BIT | REGISTER_CHAN0_LOW)  # Read full spectrum data
-        ir = self.read_word_data(SENSOR_ADDRESS, COMMAND_BIT | REGISTER_CHAN1_LOW)    # Read infrared data
+        full = self.read_word_data(_SENSOR_ADDRESS, _COMMAND_BIT | _REGISTER_CHAN0_LOW)  # Read full spectrum data
+        ir = self.read_word_data(_SENSOR_ADDRESS, _COMMAND_BIT | _REGISTER_CHAN1_LOW)    # Read infrared data
         self.disable()                      # Turn off the sensor
         return full, ir                     # Return the luminosity values
 
@@ -0,0 +1,230 @@
+# Analog rail check.
+# Each supply rail of the board under test is wired through a resistor divider to an ADC pin of
+# the Pico (GP26-GP28). A rail is sampled in one burst into a preallocated array, the burst is
+# turned into a digital value (1 or 0) with a threshold and hysteresis, and the rail's output pin
+# is driven with that value. Thousands of samples take a few milliseconds, so a noisy single
+# reading can no longer pass or fail a board.
+
+from array import array
+from machine import ADC, Pin
+import time
+
+from event_log import (log, error_code, EV_ANALOG_RAIL_OK, EV_ANALOG_RAIL_LOW, EV_ANALOG_RAIL_UNSTABLE,
+                       EV_ANALOG_RAIL_RIPPLE, EV_ANALOG_RAIL_MEAN, EV_ANALOG_ERROR)
+
+ADC_REFERENCE_V = 3.3
+ADC_FULL_SCALE = 65535
+SAMPLES = 2048                  # Samples per rail and burst
+
+# name, ADC pin, divider ratio (rail volts per ADC volt), threshold (V), hysteresis (V),
+# highest ripple (V, peak to peak), output pin (None: not driven)
+# GP28 (ADC2) is the interrupt pin of DualSensorManager, so only GP26 and GP27 are used by default.
+# GP22 is the only free output pin.
+DEFAULT_RAILS = (
+    ("3V3", 26, 2.0, 3.0, 0.1, 0.1, 22),
+    ("5V", 27, 2.0, 4.5, 0.2, 0.25, None),
+)
+
+# Created on the first analog test and kept, so the pins and the sample buffer are set up once
+_checker = None
+
+
+def schmitt(samples, rising, falling):
+
+    """
+    Run a threshold with hysteresis over a burst.
+
+    The state starts at the level of the first sample; it goes to 1 at or above rising and back to
+    0 below falling.
+
+    Parameters:
+    samples (array): Raw ADC values.
+    rising (int): Raw value that switches the state to 1.
+    falling (int): Raw value below which the state switches to 0.
+
+    Returns:
+    tuple: Final state (0 or 1), number of state changes.
+    """
+
+    state = 1 if samples[0] >= rising else 0
+
+    # A burst that never crosses the opposite threshold needs no per-sample pass
+    if (state and min(samples) >= falling) or (not state and max(samples) < rising):
+        return state, 0
+
+    transitions = 0
+    for value in samples:
+        if state:
+            if value < falling:
+                state = 0
+                transitions += 1
+        elif value >= rising:
+            state = 1
+            transitions += 1
+    return state, transitions
+
+
+class Rail:
+
+    """One supply rail: its ADC input, thresholds in raw ADC counts and its output pin."""
+
+    def __init__(self, name, adc_pin, divider, threshold, hysteresis, max_ripple, out_pin=None):
+
+        """
+        Parameters:
+        name (str): Rail name, for reports.
+        adc_pin (int): ADC pin (26, 27 or 28).
+        divider (float): Rail volts per volt at the ADC pin.
+        threshold (float): Rail voltage separating 0 from 1 (V).
+        hysteresis (float): Width of the band around the threshold (V).
+        max_ripple (float): Highest peak-to-peak ripple of a good rail (V).
+        out_pin (int): Pin driven with the digital value of the rail, None for none.
+        """
+
+        self.name = name
+        self.adc = ADC(Pin(adc_pin))
+        self.out = Pin(out_pin, Pin.OUT, value=0) if out_pin is not None else None
+        self.volts_per_count = ADC_REFERENCE_V * divider / ADC_FULL_SCALE
+        self.rising = self.counts(threshold + hysteresis / 2)
+        self.falling = self.counts(threshold - hysteresis / 2)
+        self.max_ripple = self.counts(max_ripple)
+
+    def counts(self, volts):
+
+        """Convert a rail voltage to raw ADC counts."""
+
+        return int(volts / self.volts_per_count)
+
+
+class RailChecker:
+
+    """
+    Samples every rail in bursts and decides whether each one is present and steady.
+
+    A rail passes when it ends high, never dropped below the falling threshold once high, and its
+    ripple stays under the limit.
+    """
+
+    def __init__(self, rails=DEFAULT_RAILS, samples=SAMPLES):
+
+        """
+        Parameters:
+        rails (tuple): Rail definitions, see DEFAULT_RAILS.
+        samples (int): Samples per rail and burst.
+        """
+
+        self.rails = [Rail(*rail) for rail in rails]
+        self.buffer = array('H', bytes(2 * samples))
+        # Per rail: min, max, mean, ripple (V), digital value, state changes, verdict
+        self.last_stats = [None] * len(self.rails)
+        self.last_rate = 0      # Samples per second of the last burst
+
+    def sample(self, rail):
+
+        """
+        Fill the buffer with one burst of a rail.
+
+        Returns:
+        int: Duration of the burst in microseconds.
+        """
+
+        buffer = self.buffer
+        read = rail.adc.read_u16
+        start = time.ticks_us()
+        for i in range(len(buffer)):
+            buffer[i] = read()
+        return time.ticks_diff(time.ticks_us(), start)
+
+    def check_rail(self, index):
+
+        """
+        Sample one rail, drive its output pin and store its statistics.
+
+        Returns:
+        bool: True if the rail is good.
+        """
+
+        rail = self.rails[index]
+        duration = self.sample(rail)
+        buffer = self.buffer
+        self.last_rate = len(buffer) * 1_000_000 // max(duration, 1)
+
+        low = min(buffer)
+        high = max(buffer)
+        ripple = high - low
+        state, transitions = schmitt(buffer, rail.rising, rail.falling)
+
+        if rail.out is not None:
+            rail.out.value(state)
+
+        scale = rail.volts_per_count
+        mean = sum(buffer) / len(buffer)
+        log(EV_ANALOG_RAIL_MEAN, int(mean * scale * 1000))
+        log(EV_ANALOG_RAIL_RIPPLE, int(ripple * scale * 1000))
+
+        if not state:
+            log(EV_ANALOG_RAIL_LOW, index)
+            passed = False
+        elif transitions or ripple > rail.max_ripple:
+            log(EV_ANALOG_RAIL_UNSTABLE, index)
+            passed = False
+        else:
+            log(EV_ANALOG_RAIL_OK, index)
+            passed = True
+
+        self.last_stats[index] = (low * scale, high * scale, mean * scale, ripple * scale,
+                                  state, transitions, passed)
+        return passed
+
+    def is_working(self):
+
+        """
+        Check every rail.
+
+        Returns:
+        bool: True if all rails are good.
+        """
+
+        passed = True
+        for index in range(len(self.rails)):
+            try:
+                passed = self.check_rail(index) and passed
+            except Exception as e:
+                log(EV_ANALOG_ERROR, error_code(e))
+                passed = False
+        return passed
+
+    def measurements(self):
+
+        """
+        Return the measurements of the last check for ResultStore.append().
+
+        Returns:
+        dict: Mean voltage of the first bad rail (of the first rail if all are good) as bus_voltage.
+        """
+
+        stats = [rail for rail in self.last_stats if rail is not None]
+        if not stats:
+            return {}
+
+        for stat in stats:
+            if not stat[6]:
+                return {'bus_voltage': stat[2]}
+        return {'bus_voltage': stats[0][2]}
+
+
+def shared_checker():
+
+    """Return the RailChecker of the default rails, created on the first call."""
+
+    global _checker
+    if _checker is None:
+        _checker = RailChecker()
+    return _checker
+
+
+def last_measurements():
+
+    """Return the measurements of the last analog test, {} if none was run."""
+
+    return _checker.measurements() if _checker is not None else {}
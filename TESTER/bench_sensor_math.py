@@ -0,0 +1,138 @@
+# Micro-benchmark of the sensor conversion kernels in sensor_math.
+# Checks the kernels against the reference implementations and prints the per-call time
+# of the original interpreted float math ("before") and of the kernels ("after").
+# Runs on the Pico and on a host Python (from the TESTER directory, with the simulator's stand-in
+# for the micropython module).
+
+import sys
+
+try:
+    import micropython
+
+except ImportError:
+    # Host Python: sensor_math needs the micropython decorators
+    sys.path.insert(0, "../HOST")
+    from tester_sim import micropython_shim
+    sys.modules["micropython"] = micropython_shim
+
+import sensor_math
+
+try:
+    from time import ticks_us, ticks_diff
+
+except ImportError:
+    # Host Python has no ticks_* functions
+    from time import perf_counter_ns
+
+    def ticks_us():
+        return perf_counter_ns() // 1000
+
+    def ticks_diff(end, start):
+        return end - start
+
+ITERATIONS = 2000  # Calls per measurement
+
+
+# Conversions as they were written in the drivers before sensor_math existed
+def legacy_lux(full, ir):
+    if full == 0xFFFF or ir == 0xFFFF:
+        return 0
+    case_integ = {0x00: 100.}
+    atime = case_integ.get(0x00, 100.)
+    case_gain = {0x00: 1.}
+    again = case_gain.get(0x00, 1.)
+    cpl = (atime * again) / 408.0
+    lux1 = (full - (1.64 * ir)) / cpl
+    lux2 = ((0.59 * full) - (0.86 * ir)) / cpl
+    return max(lux1, lux2)
+
+
+def legacy_scd41(data):
+    co2 = (data[0] << 8) | data[1]
+    temperature_raw = (data[3] << 8) | data[4]
+    temperature = -45 + 175 * temperature_raw / 65536
+    humidity_raw = (data[6] << 8) | data[7]
+    humidity = 100 * humidity_raw / 65536
+    return co2, temperature, humidity
+
+
+def legacy_ina226(raw):
+    return raw * 1.25 / 1000.0, raw * 2.5 / 1000.0, raw * 25.0 / 1000.0
+
+
+def legacy_bme280(temperature, pressure, humidity):
+    return temperature / 100.0, pressure / 101_325, humidity / 1024.0
+
+
+def kernel_ina226(raw):
+    return (sensor_math.ina226_bus_volts(raw),
+            sensor_math.ina226_shunt_millivolts(raw),
+            sensor_math.ina226_power_watts(raw))
+
+
+def verify():
+
+    """
+    Compare every integer kernel with its reference over a sweep of raw values.
+
+    Returns:
+    int: Number of mismatches found (0 when the kernels are exact).
+    """
+
+    mismatches = 0
+    step = 97  # Prime step keeps the sweep short while touching all bit patterns
+
+    for raw in range(0, 0x10000, step):
+        pairs = (
+            (sensor_math.scd41_centidegrees(raw), sensor_math.ref_scd41_centidegrees(raw)),
+            (sensor_math.scd41_centipercent(raw), sensor_math.ref_scd41_centipercent(raw)),
+            (sensor_math.ina226_bus_microvolts(raw), sensor_math.ref_ina226_bus_microvolts(raw)),
+            (sensor_math.ina226_shunt_nanovolts(raw), sensor_math.ref_ina226_shunt_nanovolts(raw)),
+            (sensor_math.ina226_signed(raw), sensor_math.ref_ina226_signed(raw)),
+            (sensor_math.ina226_power_microwatts(raw), sensor_math.ref_ina226_power_microwatts(raw)),
+            (sensor_math.bme280_centipercent(raw), sensor_math.ref_bme280_centipercent(raw)),
+            (sensor_math.bme280_milliatm(raw + 60000), sensor_math.ref_bme280_milliatm(raw + 60000)),
+        )
+        for got, expected in pairs:
+            if got != expected:
+                mismatches += 1
+
+        for ir in (0, raw // 3, raw, 0xFFFF):
+            if sensor_math.tsl2591_decilux(raw, ir, 100, 1) != sensor_math.ref_tsl2591_decilux(raw, ir, 100, 1):
+                mismatches += 1
+
+    return mismatches
+
+
+def time_call(func, *args):
+
+    """Return the mean time of one call of func(*args) in microseconds."""
+
+    start = ticks_us()
+    for _ in range(ITERATIONS):
+        func(*args)
+    return ticks_diff(ticks_us(), start) / ITERATIONS
+
+
+def main():
+
+    """Verify the kernels and print the before/after table."""
+
+    mismatches = verify()
+    print("Kernel mismatches against reference: {}".format(mismatches))
+
+    frame = bytes([0x01, 0xF4, 0x00, 0x66, 0x66, 0x00, 0x80, 0x00, 0x00])
+    cases = (
+        ("TSL2591 lux", legacy_lux, (30000, 12000), sensor_math.tsl2591_lux, (30000, 12000, 100, 1)),
+        ("SCD41 frame", legacy_scd41, (frame,), sensor_math.scd41_measurement, (frame,)),
+        ("INA226 scaling", legacy_ina226, (0x2580,), kernel_ina226, (0x2580,)),
+        ("BME280 scaling", legacy_bme280, (2312, 101325, 47104), sensor_math.bme280_scale, (2312, 101325 << 8, 47104)),
+    )
+
+    print("{:<16}{:>12}{:>12}".format("Conversion", "before us", "after us"))
+    for name, before, before_args, after, after_args in cases:
+        print("{:<16}{:>12.2f}{:>12.2f}".format(name, time_call(before, *before_args), time_call(after, *after_args)))
+
+
+if __name__ == "__main__":
+    main()
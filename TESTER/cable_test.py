@@ -2,6 +2,10 @@
 
 from machine import Pin
 import time
+import timing
+from event_log import (LOG, log, error_code, EV_CABLE_PIN_SETUP_ERROR, EV_CABLE_OK, EV_CABLE_BROKEN,
+                       EV_CABLE_CROSSING, EV_CABLE_NOT_CONDUCTING, EV_CABLE_CROSSING_EXISTS,
+                       EV_CABLE_CONNECTOR_OK, EV_CABLE_ISSUES)
 
 class CableTester:
     
@@ -18,6 +22,8 @@ class CableTester:
         
         self.wire_in_pins = []
         self.wire_out_pins = []
+        # Per wire-in pin, bit mask of the wire-out pins read high during the last test
+        self.matrix = bytearray(self.NUM_CABLES)
         self._setup_pins()
 
     def _setup_pins(self):
@@ -38,7 +44,7 @@ class CableTester:
                 self.wire_out_pins.append(Pin(pin, Pin.IN, Pin.PULL_DOWN))  # Input GPIO pins
                 
         except Exception as e:
-            print(f"Error setting up pins: {e}")
+            log(EV_CABLE_PIN_SETUP_ERROR, error_code(e))
 
     def is_wire_crossing_problem(self):
         
@@ -64,7 +70,8 @@ class CableTester:
             for j, wire_out_pin in enumerate(self.wire_out_pins):
                 
                 if (i != j) and wire_out_pin.value() == 1:
-                    print(f"Wire crossing detected between wire-in pin {i} and wire-out pin {j}.")
+                    log(EV_CABLE_CROSSING, i * 16 + j)
+                    self.matrix[i] |= 1 << j
                     has_crossing = True
             
             # Reset the wire-in pin
@@ -95,11 +102,12 @@ class CableTester:
             
             # Read input pin state
             if self.wire_out_pins[i].value():
-                print(f"Cable {i + 1} is working.")
+                log(EV_CABLE_OK, i + 1)
+                self.matrix[i] |= 1 << i
                 working_cable_count += 1
                 
             else:
-                print(f"Cable {i + 1} is not working.")
+                log(EV_CABLE_BROKEN, i + 1)
             
             wire_in_pin.value(0)  # Set output pin low
             
@@ -115,7 +123,7 @@ class CableTester:
         Run the cable testing process.
         
         Runs the complete testing process by checking cable status and wire 
-        crossing issues. Prints the results and concludes the testing with a 
+        crossing issues. Logs the results and concludes the testing with a 
         message indicating whether the connector is functioning correctly or 
         if issues were detected.
         
@@ -124,27 +132,35 @@ class CableTester:
                   False otherwise.
         """
         
+        for i in range(self.NUM_CABLES):
+            self.matrix[i] = 0
+
+        start = timing.start()
         all_cables_working = self.are_all_cables_working()
+        timing.stop(timing.SPAN_CABLE_CONTINUITY, start)
+        
+        start = timing.start()
         wire_crossing = self.is_wire_crossing_problem()
+        timing.stop(timing.SPAN_CABLE_CROSSING, start)
 
         issues_detected = False
         
         # Check for cable issues
         if not all_cables_working:
-            print("--------At least one cable is not conducting--------\n")
+            log(EV_CABLE_NOT_CONDUCTING)
             issues_detected = True
             
         # Check for wire crossing issues
         if wire_crossing:
-            print("--------Wire crossing problem exists--------\n")
+            log(EV_CABLE_CROSSING_EXISTS)
             issues_detected = True
 
         # Final check and exit if no issues are detected
         if not issues_detected:
-            print("--------Connector works well. All cables are functioning correctly and no wiring issues detected.--------\n")
+            log(EV_CABLE_CONNECTOR_OK)
             
         else:
-            print("--------Testing concluded with issues detected.--------\n")
+            log(EV_CABLE_ISSUES)
         
         return not issues_detected
 
@@ -159,6 +175,7 @@ def main():
     try:
         tester = CableTester()
         tester.is_working()
+        LOG.drain()
         
     except Exception as e:
         print(f"An error occurred: {e}")
@@ -0,0 +1,230 @@
+# Continuous "wiggle" monitoring of a cable harness.
+# CableTester takes one snapshot per wire, so a break or short that only shows while the cable is
+# flexed gets through. WiggleMonitor keeps the wires energized and samples the whole input bank at
+# a fixed rate for a window of time while the operator flexes the cable. Every change of a wire
+# between reading correctly and reading wrong is recorded with a microsecond timestamp.
+#
+# The wires are driven with a cycle of patterns in which every wire is high at least once and every
+# two wires differ at least once, so both breaks and shorts between any two wires become visible.
+
+from array import array
+import time
+
+from event_log import log, EV_WIGGLE_START, EV_WIGGLE_CLEAN, EV_WIGGLE_GLITCHES, EV_WIGGLE_OVERRUNS
+
+# Direct access to the SIO registers reads or drives a bank of GPIOs in one operation (RP2040)
+try:
+    from machine import mem32
+except ImportError:
+    mem32 = None
+
+SIO_GPIO_IN = 0xD0000004
+SIO_GPIO_OUT_SET = 0xD0000014
+SIO_GPIO_OUT_CLR = 0xD0000018
+
+DEFAULT_WINDOW_MS = 10_000
+MAX_WINDOW_MS = 300_000         # Longer windows are cut: ticks_us() differences wrap after ~537 s
+SAMPLE_PERIOD_US = 100          # One pattern applied and read every 100 us
+SETTLE_US = 5                   # Cable settling time after the pattern changes
+EVENT_CAPACITY = 1024           # Events kept per window, later ones are counted as lost
+
+# Event state byte: bit 0 is 1 when the wire reads wrong, bits 1-7 hold the pattern index
+# (2 patterns per bit of the wire index, so bits 1-3 are enough up to 16 wires)
+STATE_FAULT = 0x01
+
+
+def wire_patterns(wires):
+
+    """
+    Return drive patterns (bit masks) in which every wire is high at least once and every two
+    wires differ at least once: for each bit of the wire index, the wires with that bit set and
+    the complement.
+
+    Parameters:
+    wires (int): Number of wires.
+    """
+
+    mask = (1 << wires) - 1
+    patterns = []
+    bit = 0
+    while (1 << bit) < wires:
+        pattern = 0
+        for wire in range(wires):
+            if wire >> bit & 1:
+                pattern |= 1 << wire
+        patterns.append(pattern)
+        patterns.append(~pattern & mask)
+        bit += 1
+    return patterns or [mask]
+
+
+def _first_of_run(pin_ids):
+    # First pin number if the pins are consecutive, otherwise None
+    first = pin_ids[0]
+    for offset, pin_id in enumerate(pin_ids):
+        if pin_id != first + offset:
+            return None
+    return first
+
+
+class WiggleMonitor:
+
+    """
+    Samples the cable of a CableTester continuously and records each change of a wire.
+
+    Events are kept in preallocated arrays: the wire-out index, the time since the start of the
+    window (us) and the state byte (STATE_FAULT, pattern index << 1).
+    """
+
+    def __init__(self, cable_tester, capacity=EVENT_CAPACITY):
+
+        """
+        Parameters:
+        cable_tester (CableTester): Its pins are used as they are configured.
+        capacity (int): Events kept per window.
+        """
+
+        self.outputs = cable_tester.wire_in_pins
+        self.inputs = cable_tester.wire_out_pins
+        self.wires = len(self.inputs)
+        self.patterns = wire_patterns(self.wires)
+
+        self.wire_ids = array('B', bytes(capacity))
+        self.ticks = array('I', [0] * capacity)
+        self.states = array('B', bytes(capacity))
+        self.capacity = capacity
+        self.count = 0
+        self.lost = 0
+        self.samples = 0
+        self.overruns = 0       # Samples taken late because the previous one took too long
+        self.glitches = array('H', [0] * self.wires)    # Changes to the wrong level, per wire
+
+        # The fast bank access needs the pin numbers in consecutive order
+        self._out_shift = _first_of_run(cable_tester.WIRE_IN_PINS)
+        self._in_shift = _first_of_run(cable_tester.WIRE_OUT_PINS)
+        self._banked = mem32 is not None and self._out_shift is not None and self._in_shift is not None
+
+    def _drive(self, pattern):
+        if self._banked:
+            mask = (1 << self.wires) - 1
+            mem32[SIO_GPIO_OUT_SET] = pattern << self._out_shift
+            mem32[SIO_GPIO_OUT_CLR] = (~pattern & mask) << self._out_shift
+            return
+        for wire, pin in enumerate(self.outputs):
+            pin.value(pattern >> wire & 1)
+
+    def _read(self):
+        if self._banked:
+            return mem32[SIO_GPIO_IN] >> self._in_shift & ((1 << self.wires) - 1)
+        bank = 0
+        for wire, pin in enumerate(self.inputs):
+            if pin.value():
+                bank |= 1 << wire
+        return bank
+
+    def _record(self, wire, tick, state):
+        if state & STATE_FAULT:
+            self.glitches[wire] += 1
+        if self.count == self.capacity:
+            self.lost += 1
+            return
+        self.wire_ids[self.count] = wire
+        self.ticks[self.count] = tick
+        self.states[self.count] = state
+        self.count += 1
+
+    def run(self, window_ms=DEFAULT_WINDOW_MS, period_us=SAMPLE_PERIOD_US):
+
+        """
+        Monitor the cable for a window of time.
+
+        Parameters:
+        window_ms (int): Length of the window, at most MAX_WINDOW_MS.
+        period_us (int): Time between two samples (each sample applies the next pattern).
+
+        Returns:
+        bool: True if every wire read correctly for the whole window.
+        """
+
+        window_ms = min(window_ms, MAX_WINDOW_MS)
+        log(EV_WIGGLE_START, window_ms)
+        self.count = 0
+        self.lost = 0
+        self.samples = 0
+        self.overruns = 0
+        for wire in range(self.wires):
+            self.glitches[wire] = 0
+
+        patterns = self.patterns
+        # Wires reading wrong in each pattern when it was last applied; a good cable starts at 0
+        faults = [0] * len(patterns)
+        index = 0
+        ticks_us = time.ticks_us
+        ticks_diff = time.ticks_diff
+
+        start = ticks_us()
+        deadline = start
+        window_us = window_ms * 1000
+
+        while True:
+            wait = ticks_diff(deadline, ticks_us())
+            if wait > 0:
+                time.sleep_us(wait)
+            elif wait < 0 and self.samples:
+                self.overruns += 1
+                deadline = ticks_us()
+
+            elapsed = ticks_diff(deadline, start)
+            if elapsed >= window_us:
+                break
+
+            pattern = patterns[index]
+            self._drive(pattern)
+            time.sleep_us(SETTLE_US)
+            wrong = self._read() ^ pattern
+            self.samples += 1
+
+            changed = wrong ^ faults[index]
+            if changed:
+                faults[index] = wrong
+                tick = ticks_diff(ticks_us(), start)
+                for wire in range(self.wires):
+                    if changed >> wire & 1:
+                        self._record(wire, tick, (wrong >> wire & 1) | index << 1)
+
+            index += 1
+            if index == len(patterns):
+                index = 0
+            deadline = time.ticks_add(deadline, period_us)
+
+        self._drive(0)
+
+        if self.overruns:
+            log(EV_WIGGLE_OVERRUNS, self.overruns)
+        if self.count or self.lost:
+            log(EV_WIGGLE_GLITCHES, self.count + self.lost)
+            return False
+        log(EV_WIGGLE_CLEAN, self.samples)
+        return True
+
+    def events(self):
+
+        """
+        Iterate over the recorded events.
+
+        Yields:
+        tuple: Wire-out index, time since the start of the window (us), state byte.
+        """
+
+        for i in range(self.count):
+            yield self.wire_ids[i], self.ticks[i], self.states[i]
+
+    def dump(self):
+
+        """Print the recorded events, one line each."""
+
+        for wire, tick, state in self.events():
+            print("{:>10} us  wire {}  {}  (pattern {})".format(
+                tick, wire + 1, "WRONG" if state & STATE_FAULT else "ok", state >> 1))
+        if self.lost:
+            print("{} more events lost".format(self.lost))
@@ -0,0 +1,279 @@
+# Optional second-core worker for the RP2040.
+# With DUAL_CORE = True in main.py, core 1 runs the run LED and RGB LED animations, drains the
+# event log to the USB serial and receives/sends the host protocol frames. Core 0 is left with the
+# button scan and the tests, so cable scans and sensor sampling are no longer interrupted by timer
+# callbacks or USB output.
+# The cores exchange data only through the preallocated, lock-protected queues below; the tests and
+# every I2C transaction stay on core 0.
+
+from array import array
+import select
+import struct
+import sys
+import _thread
+import utime
+
+from event_log import (LOG, EventLog, log, error_code, EV_CORE1_STARTED, EV_CORE1_STOPPED, EV_CORE1_ERROR,
+                       EV_CORE1_REQUEST_DROPPED)
+from protocol_frames import SYNC, HEADER_FORMAT, HEADER_SIZE, CRC_SIZE, MAX_PAYLOAD, FrameParser
+import rgb_led_control
+import run_led
+
+LED_PERIOD_MS = 20          # 50 Hz, the rate of the timers it replaces
+LOG_DRAIN_MS = 200          # Interval between two event log drains
+REQUEST_SLOTS = 2           # Host requests waiting for core 0
+RESPONSE_SLOTS = 4          # Responses waiting for core 1
+FRAME_SIZE = HEADER_SIZE + MAX_PAYLOAD + CRC_SIZE
+
+
+class FrameQueue:
+
+    """
+    Fixed-capacity FIFO of byte strings shared between the cores.
+
+    The slots are allocated once; put() copies into a slot and get_into() copies out of one, so
+    neither core allocates and the lock is only held for the copy.
+    """
+
+    def __init__(self, slots, slot_size=FRAME_SIZE):
+
+        """
+        Parameters:
+        slots (int): Number of entries the queue holds.
+        slot_size (int): Longest entry in bytes.
+        """
+
+        self.slots = [bytearray(slot_size) for _ in range(slots)]
+        self.lengths = array('H', [0] * slots)
+        self.slot_size = slot_size
+        self.head = 0       # Next slot to read
+        self.count = 0
+        self.lock = _thread.allocate_lock()
+
+    def put(self, data):
+
+        """
+        Append an entry.
+
+        Returns:
+        bool: False if the queue is full (the entry is not stored).
+        """
+
+        size = len(data)
+        if size > self.slot_size:
+            raise ValueError("Entry larger than the queue slots")
+
+        self.lock.acquire()
+        try:
+            if self.count == len(self.slots):
+                return False
+            index = (self.head + self.count) % len(self.slots)
+            self.slots[index][:size] = data
+            self.lengths[index] = size
+            self.count += 1
+            return True
+        finally:
+            self.lock.release()
+
+    def get_into(self, buffer):
+
+        """
+        Remove the oldest entry.
+
+        Parameters:
+        buffer (bytearray): Receives the entry, at least slot_size bytes.
+
+        Returns:
+        int: Length of the entry, 0 if the queue is empty.
+        """
+
+        self.lock.acquire()
+        try:
+            if self.count == 0:
+                return 0
+            index = self.head
+            size = self.lengths[index]
+            buffer[:size] = self.slots[index][:size]
+            self.head = (index + 1) % len(self.slots)
+            self.count -= 1
+            return size
+        finally:
+            self.lock.release()
+
+    def write(self, data):
+
+        """Stream interface for CommandServer: wait until there is room, then append."""
+
+        while not self.put(data):
+            utime.sleep_ms(1)
+
+
+class CoreWorker:
+
+    """
+    Runs the LED animations, log draining and host frame I/O on core 1.
+
+    Core 0 calls serve() from its main loop to handle the host requests that core 1 received.
+    """
+
+    def __init__(self, host=False):
+
+        """
+        Parameters:
+        host (bool): Receive and send host protocol frames on the USB serial.
+        """
+
+        self.host = host
+        self.requests = FrameQueue(REQUEST_SLOTS)
+        self.responses = FrameQueue(RESPONSE_SLOTS)
+        self.dropped = 0                    # Requests lost because core 0 was busy
+        self.running = False
+        self.stopped = True
+
+        self._color = array('f', [0.0, 0.0, 0.0])
+        self._color_lock = _thread.allocate_lock()
+        self._request = bytearray(FRAME_SIZE)       # Used by core 0
+        self._response = bytearray(FRAME_SIZE)      # Used by core 1
+        self._received = bytearray(FRAME_SIZE)      # Used by core 1
+        self._outbox = EventLog(LOG.capacity, LOG.level)
+
+    def start(self):
+
+        """Move the LED timers and log output to core 1 and start it."""
+
+        LOG.lock = _thread.allocate_lock()
+        run_led.run_led_timer.deinit()
+        rgb_led_control.rgb_led_timer.deinit()
+        rgb_led_control.worker = self
+
+        self.running = True
+        self.stopped = False
+        _thread.start_new_thread(self._run, ())
+
+    def stop(self):
+
+        """Stop core 1 after it sent the pending responses, and give the LEDs back to the timers."""
+
+        self.running = False
+        while not self.stopped:
+            utime.sleep_ms(1)
+
+        rgb_led_control.worker = None
+        run_led.run_led_timer.init(freq=1000 // LED_PERIOD_MS, mode=run_led.Timer.PERIODIC,
+                                   callback=run_led.update_pwm)
+        LOG.lock = None
+
+    def set_color(self, red_intensity, green_intensity, blue_intensity):
+
+        """Change the colour of the RGB LED animation (called by rgb_led_control.animate_led)."""
+
+        self._color_lock.acquire()
+        self._color[0] = red_intensity
+        self._color[1] = green_intensity
+        self._color[2] = blue_intensity
+        self._color_lock.release()
+
+    def serve(self, server):
+
+        """
+        Handle on core 0 every host request received by core 1.
+
+        Parameters:
+        server (CommandServer): Created with output=self.responses.
+
+        Returns:
+        int: Number of requests handled.
+        """
+
+        handled = 0
+        while not server.exit_requested and self.requests.get_into(self._request):
+            server.handle_frame(self._request)
+            handled += 1
+        return handled
+
+    # Core 1 ------------------------------------------------------------------
+
+    def _run(self):
+        log(EV_CORE1_STARTED)
+        output = sys.stdout.buffer
+        parser = FrameParser() if self.host else None
+        poller = None
+        if self.host:
+            poller = select.poll()
+            poller.register(sys.stdin, select.POLLIN)
+
+        next_led = utime.ticks_ms()
+        next_drain = next_led
+
+        while self.running:
+            try:
+                now = utime.ticks_ms()
+
+                if utime.ticks_diff(now, next_led) >= 0:
+                    self._animate()
+                    next_led = utime.ticks_add(next_led, LED_PERIOD_MS)
+                    if utime.ticks_diff(now, next_led) >= 0:
+                        next_led = utime.ticks_add(now, LED_PERIOD_MS)      # Fell behind, skip steps
+
+                if utime.ticks_diff(now, next_drain) >= 0:
+                    self._drain_log()
+                    next_drain = utime.ticks_add(now, LOG_DRAIN_MS)
+
+                wait_ms = max(0, utime.ticks_diff(next_led, utime.ticks_ms()))
+                if self.host:
+                    self._send_responses(output)
+                    if poller.poll(wait_ms):
+                        self._receive(parser, poller)
+                else:
+                    utime.sleep_ms(wait_ms)
+
+            except Exception as e:
+                log(EV_CORE1_ERROR, error_code(e))
+
+        # Nothing is left behind for the host
+        if self.host:
+            self._send_responses(output)
+        log(EV_CORE1_STOPPED)
+        self._drain_log()
+        self.stopped = True
+
+    def _animate(self):
+        run_led.update_pwm(None)
+        self._color_lock.acquire()
+        red, green, blue = self._color
+        self._color_lock.release()
+        rgb_led_control.fade_step(red, green, blue)
+
+    def _drain_log(self):
+        LOG.move_to(self._outbox)
+        if self._outbox.count or self._outbox.lost:
+            self._outbox.drain()
+
+    def _send_responses(self, output):
+        response = self._response
+        size = self.responses.get_into(response)
+        while size:
+            output.write(memoryview(response)[:size])
+            size = self.responses.get_into(response)
+        if hasattr(output, "flush"):
+            output.flush()
+
+    def _receive(self, parser, poller):
+        stdin = sys.stdin.buffer
+        while poller.poll(0):
+            data = stdin.read(1)
+            if not data:
+                return
+            complete = parser.feed(data[0])
+            while complete:
+                self._queue_request(parser)
+                complete = parser.next_frame()
+
+    def _queue_request(self, parser):
+        # The parser has moved the following bytes over the frame, so it is rebuilt from its fields
+        frame = self._received
+        struct.pack_into(HEADER_FORMAT, frame, 0, SYNC, len(parser.payload), parser.request_id, parser.command)
+        frame[HEADER_SIZE:HEADER_SIZE + len(parser.payload)] = parser.payload
+        if not self.requests.put(memoryview(frame)[:HEADER_SIZE + len(parser.payload)]):
+            self.dropped += 1
+            log(EV_CORE1_REQUEST_DROPPED, parser.command)
@@ -0,0 +1,406 @@
+# Binary event logger for the hot paths.
+# Drivers record compact (event id, tick, payload) records into a preallocated RAM ring buffer
+# instead of printing. The buffer is drained to serial or flash only when the tester is idle,
+# so diagnostics no longer cost USB-CDC time during a test.
+
+from array import array
+import struct
+import time
+
+# Log levels
+DEBUG = 0
+INFO = 1
+WARNING = 2
+ERROR = 3
+
+DEFAULT_CAPACITY = 256          # Number of records kept in RAM
+DEFAULT_LOG_FILE = "events.bin" # Flash file used by drain_to_file()
+RECORD_FORMAT = "<HIi"          # Event id, tick (us, wraps at 2^30 like ticks_us()), payload
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+
+# Event ids. Grouped by module, the high byte identifies the module.
+EV_LOG_OVERFLOW = 0x0001
+
+EV_MODE_WIRE = 0x0101
+EV_MODE_CURRENT = 0x0102
+EV_MODE_CO2 = 0x0103
+EV_MODE_LIGHT = 0x0104
+EV_MODE_NONE = 0x0105
+EV_MODE_INIT_ERROR = 0x0106
+EV_MODE_BUTTON_ERROR = 0x0107
+EV_MODE_GET_ERROR = 0x0108
+EV_MODE_TEST_ERROR = 0x0109
+EV_MODE_SENSOR_COMM_ERROR = 0x010A
+EV_MODE_SCD41_OK = 0x010B
+EV_MODE_SCD41_NOT_WORKING = 0x010C
+EV_MODE_RESULT_STORE_ERROR = 0x010D
+EV_MODE_ANALOG = 0x010E
+EV_MODE_POWER_ALERT = 0x010F
+
+EV_CABLE_PIN_SETUP_ERROR = 0x0201
+EV_CABLE_OK = 0x0202
+EV_CABLE_BROKEN = 0x0203
+EV_CABLE_CROSSING = 0x0204
+EV_CABLE_NOT_CONDUCTING = 0x0205
+EV_CABLE_CROSSING_EXISTS = 0x0206
+EV_CABLE_CONNECTOR_OK = 0x0207
+EV_CABLE_ISSUES = 0x0208
+EV_WIGGLE_START = 0x0209
+EV_WIGGLE_CLEAN = 0x020A
+EV_WIGGLE_GLITCHES = 0x020B
+EV_WIGGLE_OVERRUNS = 0x020C
+
+EV_SCD41_CREATE = 0x0301
+EV_SCD41_SEND = 0x0302
+EV_SCD41_SEND_RETRY = 0x0303
+EV_SCD41_SEND_FAILED = 0x0304
+EV_SCD41_READ = 0x0305
+EV_SCD41_READ_ERROR = 0x0306
+EV_SCD41_START = 0x0307
+EV_SCD41_STOP = 0x0308
+EV_SCD41_MEASURE = 0x0309
+EV_SCD41_CO2 = 0x030A
+EV_SCD41_TEMPERATURE = 0x030B
+EV_SCD41_HUMIDITY = 0x030C
+EV_SCD41_DECODE_ERROR = 0x030D
+EV_SCD41_READ_RETRY = 0x030E
+EV_SCD41_READ_FAILED = 0x030F
+EV_SCD41_BROKEN = 0x0310
+EV_SCD41_OK = 0x0311
+
+EV_DUAL_INIT_ERROR = 0x0401
+EV_DUAL_INTERRUPT = 0x0402
+EV_BME280_TEMPERATURE = 0x0403
+EV_BME280_PRESSURE = 0x0404
+EV_BME280_HUMIDITY = 0x0405
+EV_BME280_ERROR = 0x0406
+EV_TSL2591_FULL = 0x0407
+EV_TSL2591_IR = 0x0408
+EV_TSL2591_VISIBLE = 0x0409
+EV_TSL2591_ERROR = 0x040A
+EV_BME280_NOT_WORKING = 0x040B
+EV_TSL2591_NOT_WORKING = 0x040C
+EV_DUAL_OK = 0x040D
+
+EV_MUX_SELECT_ERROR = 0x0501
+EV_MUX_BOARD_PASSED = 0x0502
+EV_MUX_BOARD_FAILED = 0x0503
+
+EV_CORE1_STARTED = 0x0601
+EV_CORE1_STOPPED = 0x0602
+EV_CORE1_ERROR = 0x0603
+EV_CORE1_REQUEST_DROPPED = 0x0604
+
+EV_ANALOG_RAIL_OK = 0x0701
+EV_ANALOG_RAIL_LOW = 0x0702
+EV_ANALOG_RAIL_UNSTABLE = 0x0703
+EV_ANALOG_RAIL_MEAN = 0x0704
+EV_ANALOG_RAIL_RIPPLE = 0x0705
+EV_ANALOG_ERROR = 0x0706
+
+EV_INA226_ALERT = 0x0801
+EV_INA226_ALERT_ARMED = 0x0802
+EV_INA226_ALERT_ERROR = 0x0803
+
+EV_IDLE_ENTER = 0x0901
+EV_IDLE_WAKE = 0x0902
+EV_IDLE_WAKE_SLOW = 0x0903
+
+# Level and message of every event. The payload is substituted for {}.
+EVENTS = {
+    EV_LOG_OVERFLOW: (WARNING, "Event log overflow, {} records lost"),
+
+    EV_MODE_WIRE: (INFO, "Wire test mode is selected"),
+    EV_MODE_CURRENT: (INFO, "Current test mode is selected"),
+    EV_MODE_CO2: (INFO, "CO2 test mode is selected"),
+    EV_MODE_LIGHT: (INFO, "Light test mode is selected"),
+    EV_MODE_NONE: (DEBUG, "No mode selected"),
+    EV_MODE_INIT_ERROR: (ERROR, "Failed to initialize ModeSelect: error {}"),
+    EV_MODE_BUTTON_ERROR: (ERROR, "Error while activating mode {}"),
+    EV_MODE_GET_ERROR: (ERROR, "Error getting active mode: error {}"),
+    EV_MODE_TEST_ERROR: (ERROR, "Error during test activation: error {}"),
+    EV_MODE_SENSOR_COMM_ERROR: (ERROR, "Sensor communication error: error {}"),
+    EV_MODE_SCD41_OK: (INFO, "SCD41 sensor is working properly."),
+    EV_MODE_SCD41_NOT_WORKING: (WARNING, "SCD41 sensor is not working."),
+    EV_MODE_RESULT_STORE_ERROR: (ERROR, "Failed to store test result: error {}"),
+    EV_MODE_ANALOG: (INFO, "Analog rail test mode is selected"),
+    EV_MODE_POWER_ALERT: (WARNING, "--------INA226 alert during the test of mode {}--------"),
+
+    EV_CABLE_PIN_SETUP_ERROR: (ERROR, "Error setting up pins: error {}"),
+    EV_CABLE_OK: (DEBUG, "Cable {} is working."),
+    EV_CABLE_BROKEN: (WARNING, "Cable {} is not working."),
+    EV_CABLE_CROSSING: (WARNING, "Wire crossing detected, wire-in pin * 16 + wire-out pin = {}"),
+    EV_CABLE_NOT_CONDUCTING: (WARNING, "--------At least one cable is not conducting--------"),
+    EV_CABLE_CROSSING_EXISTS: (WARNING, "--------Wire crossing problem exists--------"),
+    EV_CABLE_CONNECTOR_OK: (INFO, "--------Connector works well. All cables are functioning correctly and no wiring issues detected.--------"),
+    EV_CABLE_ISSUES: (WARNING, "--------Testing concluded with issues detected.--------"),
+    EV_WIGGLE_START: (INFO, "Wiggle monitoring for {} ms, flex the cable now"),
+    EV_WIGGLE_CLEAN: (INFO, "No glitch in {} samples"),
+    EV_WIGGLE_GLITCHES: (WARNING, "--------{} wire glitches while wiggling--------"),
+    EV_WIGGLE_OVERRUNS: (WARNING, "{} samples taken late"),
+
+    EV_SCD41_CREATE: (DEBUG, "------------SCD41 OBJECT CREATION PROCESS-----------------"),
+    EV_SCD41_SEND: (DEBUG, "------------DATA SEND PROCESS----------------- command {}"),
+    EV_SCD41_SEND_RETRY: (WARNING, "Attempt {}: Error sending command"),
+    EV_SCD41_SEND_FAILED: (ERROR, "Failed to send command {} after 3 retries"),
+    EV_SCD41_READ: (DEBUG, "------------DATA READ PROCESS----------------- {} bytes"),
+    EV_SCD41_READ_ERROR: (WARNING, "Error reading data: error {}"),
+    EV_SCD41_START: (DEBUG, "------------STARTING PERIODIC MEASUREMENT-----------------"),
+    EV_SCD41_STOP: (DEBUG, "------------STOPPING PERIODIC MEASUREMENT-----------------"),
+    EV_SCD41_MEASURE: (DEBUG, "------------READING MEASUREMENT PROCESS-----------------"),
+    EV_SCD41_CO2: (INFO, "CO2: {} ppm"),
+    EV_SCD41_TEMPERATURE: (INFO, "TEMP: {} x0.01 C"),
+    EV_SCD41_HUMIDITY: (INFO, "HUM: {} x0.01 %RH"),
+    EV_SCD41_DECODE_ERROR: (ERROR, "Error processing data"),
+    EV_SCD41_READ_RETRY: (WARNING, "Attempt {}: Failed to read measurement data"),
+    EV_SCD41_READ_FAILED: (ERROR, "Failed to read measurement data after multiple attempts"),
+    EV_SCD41_BROKEN: (WARNING, "------------- SCD41 CO2 SENSOR IS BROKEN -----------------"),
+    EV_SCD41_OK: (INFO, "------- AMAZING SCD41 SENSOR ---------"),
+
+    EV_DUAL_INIT_ERROR: (ERROR, "Error initializing sensors: error {}"),
+    EV_DUAL_INTERRUPT: (DEBUG, "{} interrupts on the sensor interrupt pin since the last test"),
+    EV_BME280_TEMPERATURE: (INFO, "BME280 Temperature: {} x0.01 C"),
+    EV_BME280_PRESSURE: (INFO, "BME280 Pressure: {} x0.001 atm"),
+    EV_BME280_HUMIDITY: (INFO, "BME280 Humidity: {} x0.01 %"),
+    EV_BME280_ERROR: (ERROR, "An error occurred reading BME280: error {}"),
+    EV_TSL2591_FULL: (INFO, "Full Spectrum Lux: {}"),
+    EV_TSL2591_IR: (INFO, "Infrared Lux: {}"),
+    EV_TSL2591_VISIBLE: (INFO, "Visible Lux: {}"),
+    EV_TSL2591_ERROR: (ERROR, "Error reading TSL2591: error {}"),
+    EV_BME280_NOT_WORKING: (WARNING, "------- BME280 SENSOR IS NOT WORKING ---------"),
+    EV_TSL2591_NOT_WORKING: (WARNING, "------- TSL2591 SENSOR IS NOT WORKING ---------"),
+    EV_DUAL_OK: (INFO, "------- AMAZING BME280_TSL2591 SENSOR ---------"),
+
+    EV_MUX_SELECT_ERROR: (ERROR, "I2C multiplexer did not switch to channel {}"),
+    EV_MUX_BOARD_PASSED: (INFO, "Board on multiplexer channel {} passed"),
+    EV_MUX_BOARD_FAILED: (WARNING, "Board on multiplexer channel {} failed"),
+
+    EV_CORE1_STARTED: (INFO, "Core 1 worker started"),
+    EV_CORE1_STOPPED: (INFO, "Core 1 worker stopped"),
+    EV_CORE1_ERROR: (ERROR, "Core 1 worker error: {}"),
+    EV_CORE1_REQUEST_DROPPED: (WARNING, "Host request 0x{:02x} dropped, core 0 busy"),
+
+    EV_ANALOG_RAIL_OK: (INFO, "Rail {} is present and steady"),
+    EV_ANALOG_RAIL_LOW: (WARNING, "Rail {} is low"),
+    EV_ANALOG_RAIL_UNSTABLE: (WARNING, "Rail {} is unstable (threshold crossings or ripple)"),
+    EV_ANALOG_RAIL_MEAN: (INFO, "Rail mean: {} mV"),
+    EV_ANALOG_RAIL_RIPPLE: (INFO, "Rail ripple: {} mV peak to peak"),
+    EV_ANALOG_ERROR: (ERROR, "Error sampling rail: error {}"),
+
+    EV_INA226_ALERT: (WARNING, "INA226 ALERT pin asserted {} times"),
+    EV_INA226_ALERT_ARMED: (INFO, "INA226 alert function 0x{:04x} armed"),
+    EV_INA226_ALERT_ERROR: (ERROR, "Error arming the INA226 alert: error {}"),
+
+    EV_IDLE_ENTER: (INFO, "Idle for {} ms, sleeping until a button is pressed"),
+    EV_IDLE_WAKE: (INFO, "Woken up, ready for the button scan in {} us"),
+    EV_IDLE_WAKE_SLOW: (WARNING, "Wake-up took {} us, longer than one debounce window"),
+}
+
+
+def error_code(exception):
+
+    """
+    Return a small integer describing an exception, for use as an event payload.
+
+    Parameters:
+    exception (Exception): The caught exception.
+
+    Returns:
+    int: The errno of an OSError, otherwise -1.
+    """
+
+    args = getattr(exception, "args", ())
+    if args and isinstance(args[0], int):
+        return args[0]
+    return -1
+
+
+class EventLog:
+
+    """
+    Preallocated ring buffer of binary event records.
+
+    Recording an event stores three integers and never allocates, so it can be called from
+    driver hot paths. The oldest records are overwritten when the buffer is full and the
+    number of lost records is reported on the next drain.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, level=INFO):
+
+        """
+        Initialize the ring buffer.
+
+        Parameters:
+        capacity (int): Number of records kept in RAM.
+        level (int): Events below this level are dropped when recorded.
+        """
+
+        self.capacity = capacity
+        self.level = level
+        self.event_ids = array('H', [0] * capacity)
+        self.ticks = array('I', [0] * capacity)
+        self.payloads = array('i', [0] * capacity)
+        self.head = 0       # Next slot to write
+        self.count = 0      # Number of valid records
+        self.lost = 0       # Records overwritten before they were drained
+        self.lock = None    # _thread lock, set when another core drains the buffer (dual_core.py)
+        self._record = bytearray(RECORD_SIZE)
+
+    def log(self, event_id, payload=0):
+
+        """
+        Record an event.
+
+        Not for pin or timer interrupt handlers: in dual-core mode the lock is not reentrant, and
+        a handler run while the interrupted code holds it would wait forever. Handlers count the
+        events and normal code logs the count.
+
+        Parameters:
+        event_id (int): One of the EV_* constants.
+        payload (int): Small integer attached to the event (value, pin, errno...).
+        """
+
+        level = EVENTS[event_id][0] if event_id in EVENTS else INFO
+        if level < self.level:
+            return
+
+        lock = self.lock
+        if lock is not None:
+            lock.acquire()
+
+        head = self.head
+        self.event_ids[head] = event_id
+        # ticks_us() wraps at 2^30 and stays a small int; a 32-bit mask would allocate an mpz
+        self.ticks[head] = time.ticks_us()
+        self.payloads[head] = payload
+
+        head += 1
+        if head == self.capacity:
+            head = 0
+        self.head = head
+
+        if self.count < self.capacity:
+            self.count += 1
+        else:
+            self.lost += 1
+
+        if lock is not None:
+            lock.release()
+
+    def move_to(self, other):
+
+        """
+        Move all records into another EventLog, so they can be printed there without holding the
+        lock of this one. Records that do not fit are counted as lost.
+
+        Parameters:
+        other (EventLog): Destination, normally private to the draining core.
+        """
+
+        lock = self.lock
+        if lock is not None:
+            lock.acquire()
+
+        try:
+            for event_id, tick, payload in self.records():
+                head = other.head
+                other.event_ids[head] = event_id
+                other.ticks[head] = tick
+                other.payloads[head] = payload
+                other.head = head + 1 if head + 1 < other.capacity else 0
+                if other.count < other.capacity:
+                    other.count += 1
+                else:
+                    other.lost += 1
+            other.lost += self._take_lost()
+            self.count = 0
+        finally:
+            if lock is not None:
+                lock.release()
+
+    def clear(self):
+
+        """Discard all records."""
+
+        self.head = 0
+        self.count = 0
+        self.lost = 0
+
+    def records(self):
+
+        """
+        Iterate over the stored records from oldest to newest.
+
+        Yields:
+        tuple: Event id, tick (us), payload.
+        """
+
+        start = self.head - self.count
+        if start < 0:
+            start += self.capacity
+
+        for n in range(self.count):
+            i = start + n
+            if i >= self.capacity:
+                i -= self.capacity
+            yield self.event_ids[i], self.ticks[i], self.payloads[i]
+
+    def _take_lost(self):
+        lost = self.lost
+        self.lost = 0
+        return lost
+
+    def drain(self, stream=None):
+
+        """
+        Print all records as text and empty the buffer. Call only when the tester is idle.
+
+        Parameters:
+        stream: Object with a write() method. Defaults to print() on the USB serial.
+        """
+
+        lost = self._take_lost()
+        if lost:
+            self._write_line(stream, EV_LOG_OVERFLOW, time.ticks_us(), lost)
+
+        for event_id, tick, payload in self.records():
+            self._write_line(stream, event_id, tick, payload)
+
+        self.count = 0
+
+    def _write_line(self, stream, event_id, tick, payload):
+        text = EVENTS[event_id][1] if event_id in EVENTS else "Event 0x{:04x}: {{}}".format(event_id)
+        line = "[{:>10}] {}".format(tick, text.format(payload))
+
+        if stream is None:
+            print(line)
+        else:
+            stream.write(line + "\n")
+
+    def drain_to_file(self, path=DEFAULT_LOG_FILE):
+
+        """
+        Append all records in binary form to a flash file and empty the buffer.
+
+        Parameters:
+        path (str): File on the Pico filesystem.
+        """
+
+        lost = self._take_lost()
+        record = self._record
+
+        with open(path, "ab") as log_file:
+            if lost:
+                struct.pack_into(RECORD_FORMAT, record, 0, EV_LOG_OVERFLOW, time.ticks_us(), lost)
+                log_file.write(record)
+
+            for event_id, tick, payload in self.records():
+                struct.pack_into(RECORD_FORMAT, record, 0, event_id, tick, payload)
+                log_file.write(record)
+
+        self.count = 0
+
+
+# Shared log used by all TESTER modules
+LOG = EventLog()
+log = LOG.log
@@ -0,0 +1,92 @@
+# Heap footprint of the sensor drivers.
+# Measures the free heap (gc.mem_free()) before and after importing each driver module and after
+# constructing one instance, so changes to the drivers can be checked against the RAM left for
+# capture buffers. Run it on the Pico right after a reset, e.g. with mpremote:
+#
+#   mpremote run footprint.py
+#
+# Modules imported by several drivers (event_log, sequential_check...) are counted for the first
+# driver that imports them. A module that is already imported costs nothing.
+
+import gc
+import sys
+
+# Module and class of every driver, in import order
+DRIVERS = (
+    ("INA226", "INA226"),
+    ("TSL2591", "TSL2591"),
+    ("sensor_control", "SCD41"),
+    ("sensor_control", "DualSensorManager"),
+)
+
+
+def _free():
+    gc.collect()
+    return gc.mem_free()
+
+
+def measure(module_name, class_name, i2c):
+
+    """
+    Measure one driver.
+
+    Parameters:
+    module_name (str): Module to import.
+    class_name (str): Driver class in the module.
+    i2c (I2C): Bus passed to the constructor.
+
+    Returns:
+    tuple: Heap bytes taken by the import, bytes taken by one instance (None if the constructor
+           failed, e.g. without the sensor).
+    """
+
+    before = _free()
+    module = __import__(module_name)
+    imported = _free()
+
+    try:
+        instance = getattr(module, class_name)(i2c)
+    except OSError:
+        return before - imported, None
+
+    constructed = _free()
+    del instance
+    return before - imported, imported - constructed
+
+
+def report(details=False):
+
+    """
+    Print the import and instance size of every driver.
+
+    Parameters:
+    details (bool): Also print micropython.mem_info() before and after.
+    """
+
+    import micropython
+    from i2c_setup import initialize_i2c
+
+    i2c = initialize_i2c()
+    start = _free()
+    if details:
+        micropython.mem_info()
+
+    print("{:<16} {:<18} {:>8} {:>9}".format("module", "class", "import", "instance"))
+    for module_name, class_name in DRIVERS:
+        preloaded = module_name in sys.modules
+        imported, instance = measure(module_name, class_name, i2c)
+        print("{:<16} {:<18} {:>8} {:>9}".format(
+            module_name, class_name, "loaded" if preloaded else imported,
+            "no device" if instance is None else instance))
+
+    end = _free()
+    print("Heap used by the drivers: {} bytes, {} bytes free".format(start - end, end))
+    if details:
+        micropython.mem_info()
+
+
+if __name__ == "__main__":
+    if hasattr(gc, "mem_free"):
+        report(details=True)
+    else:
+        print("The footprint report needs MicroPython (gc.mem_free())")
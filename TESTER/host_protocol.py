@@ -0,0 +1,259 @@
+# Binary command/response protocol on the USB serial port.
+# A host (HOST/tester_client.py) can run any test or the full sequence, fetch measurements,
+# results and timing and change settings without the REPL or the buttons. The frame format and
+# the command codes are in protocol_frames.py. Bytes outside valid frames (e.g. text printed by
+# LOG.drain()) are skipped by the receiver.
+
+import struct
+import sys
+
+from event_log import LOG, error_code
+import mode_select
+from protocol_frames import (PROTOCOL_VERSION, RESPONSE_FLAG, HEADER_FORMAT, HEADER_SIZE, FrameParser, encode_frame,
+                             CMD_PING, CMD_RUN_TEST, CMD_RUN_SEQUENCE, CMD_MEASUREMENTS, CMD_LAST_RESULT,
+                             CMD_TIMING, CMD_RESET_TIMING, CMD_GET_SETTING, CMD_SET_SETTING, CMD_WIGGLE, CMD_EXIT,
+                             STATUS_OK, STATUS_UNKNOWN_COMMAND, STATUS_BAD_REQUEST, STATUS_ERROR,
+                             SETTING_DEBOUNCE_MS, SETTING_TIMING_ENABLED, SETTING_LOG_LEVEL, TIMING_FORMAT,
+                             MAX_PAYLOAD, WIGGLE_SUMMARY_FORMAT, WIGGLE_SUMMARY_SIZE, WIGGLE_EVENT_FORMAT,
+                             WIGGLE_EVENT_SIZE)
+from result_store import (MODE_CODES, RECORD_SIZE, VERDICT_PASS, VERDICT_FAIL, VERDICT_ERROR,
+                          MODE_NONE, MODE_ANALOG, pack_record)
+import timing
+from cable_wiggle import WiggleMonitor, MAX_WINDOW_MS
+
+# Mode code to mode name
+MODE_NAMES = {code: name for name, code in MODE_CODES.items()}
+
+
+class CommandServer:
+
+    """
+    Serves host commands on the USB serial port (or any pair of streams).
+
+    Call poll() from the main loop. Requests are handled one at a time; a test requested by the
+    host runs to completion before poll() returns, like a test started with a button.
+    """
+
+    def __init__(self, selector=None, results=None, input=None, output=None):
+
+        """
+        Parameters:
+        selector (ModeSelect): Runs the tests.
+        results (ResultStore): Result store, for CMD_LAST_RESULT.
+        input: Readable binary stream, the USB serial by default.
+        output: Writable binary stream, the USB serial by default.
+        """
+
+        self.selector = selector
+        self.results = results
+        self.input = input if input is not None else sys.stdin.buffer
+        self.output = output if output is not None else sys.stdout.buffer
+        self.parser = FrameParser()
+        self.exit_requested = False
+        self._record = bytearray(RECORD_SIZE)
+
+        import select
+        self._poll = select.poll()
+        self._poll.register(input if input is not None else sys.stdin, select.POLLIN)
+
+        # Frames may contain 0x03, which would otherwise raise KeyboardInterrupt (use CMD_EXIT)
+        self._set_kbd_intr(-1)
+
+    @staticmethod
+    def _set_kbd_intr(char):
+        try:
+            import micropython
+            micropython.kbd_intr(char)
+        except (ImportError, AttributeError):
+            pass
+
+    def close(self):
+
+        """Give Ctrl-C back to the REPL."""
+
+        self._set_kbd_intr(3)
+
+    def poll(self):
+
+        """
+        Handle every request received so far without waiting for more.
+
+        Returns:
+        int: Number of requests handled.
+        """
+
+        handled = 0
+        parser = self.parser
+
+        while not self.exit_requested and self._poll.poll(0):
+            data = self.input.read(1)
+            if not data:
+                break
+            # Bytes kept after a frame may already hold the next one
+            complete = parser.feed(data[0])
+            while complete:
+                self._handle(parser.request_id, parser.command, parser.payload)
+                handled += 1
+                complete = not self.exit_requested and parser.next_frame()
+
+        return handled
+
+    def handle_frame(self, frame):
+
+        """
+        Handle one request frame that was already received and checked by a FrameParser on the
+        other core (dual_core.py).
+
+        Parameters:
+        frame (bytearray): The frame, starting with its header.
+        """
+
+        _, size, request_id, command = struct.unpack_from(HEADER_FORMAT, frame, 0)
+        self._handle(request_id, command, bytes(frame[HEADER_SIZE:HEADER_SIZE + size]))
+
+    def _respond(self, request_id, command, status, payload=b""):
+        self.output.write(encode_frame(request_id, command | RESPONSE_FLAG, bytes([status]) + payload))
+        if hasattr(self.output, "flush"):
+            self.output.flush()
+
+    def _handle(self, request_id, command, payload):
+        try:
+            handler = self.HANDLERS.get(command)
+            if handler is None:
+                self._respond(request_id, command, STATUS_UNKNOWN_COMMAND)
+                return
+            result = handler(self, payload)
+            if result is None:
+                self._respond(request_id, command, STATUS_BAD_REQUEST)
+            else:
+                self._respond(request_id, command, STATUS_OK, result)
+
+        except KeyboardInterrupt:
+            raise
+
+        except Exception as e:
+            self._respond(request_id, command, STATUS_ERROR, struct.pack("<i", error_code(e)))
+
+    def _pack(self, mode, verdict, measurements, duration_ms=0):
+        pack_record(self._record, 0, 0, mode, verdict, duration_ms=duration_ms, **measurements)
+        return bytes(self._record)
+
+    def _report(self, mode, passed, duration_ms):
+        verdict = VERDICT_ERROR if passed is None else VERDICT_PASS if passed else VERDICT_FAIL
+        return bytes([verdict]) + self._pack(MODE_CODES[mode], verdict, self.selector.measurements(mode), duration_ms)
+
+    def _ping(self, payload):
+        return bytes([PROTOCOL_VERSION])
+
+    def _run_test(self, payload):
+        if len(payload) != 1 or payload[0] not in MODE_NAMES or self.selector is None:
+            return None
+        mode = MODE_NAMES[payload[0]]
+        passed = self.selector.execute_test(mode)
+        return self._report(mode, passed, self.selector.last_duration_ms)
+
+    def _run_sequence(self, payload):
+        if self.selector is None:
+            return None
+
+        all_passed, reports = self.selector.run_sequence(bool(payload[0]) if payload else True)
+        return bytes([VERDICT_PASS if all_passed else VERDICT_FAIL]) + b"".join(
+            self._report(mode, passed, duration_ms) for mode, passed, duration_ms in reports)
+
+    def _measurements(self, payload):
+        if self.selector is None:
+            return None
+
+        measurements = {}
+        for mode in MODE_CODES:
+            # The rail mean of the analog test would take the INA226 bus voltage field
+            if MODE_CODES[mode] != MODE_ANALOG:
+                measurements.update(self.selector.measurements(mode))
+        return self._pack(MODE_NONE, VERDICT_PASS, measurements)
+
+    def _last_result(self, payload):
+        if self.results is None:
+            return None
+        return self.results.last_record() or b""
+
+    def _timing(self, payload):
+        report = bytearray()
+        for span in range(timing.NUM_SPANS):
+            if timing.count(span):
+                report += struct.pack(TIMING_FORMAT, span, timing.count(span), timing.percentile(span, 0.5),
+                                      timing.percentile(span, 0.99), timing.maximum(span))
+        return bytes(report)
+
+    def _reset_timing(self, payload):
+        timing.reset()
+        return b""
+
+    def _get_setting(self, payload):
+        if len(payload) != 1:
+            return None
+
+        setting = payload[0]
+        if setting == SETTING_DEBOUNCE_MS:
+            value = mode_select.DEBOUNCE_DELAY
+        elif setting == SETTING_TIMING_ENABLED:
+            value = 1 if timing.enabled else 0
+        elif setting == SETTING_LOG_LEVEL:
+            value = LOG.level
+        else:
+            return None
+        return struct.pack("<i", value)
+
+    def _set_setting(self, payload):
+        if len(payload) != 5:
+            return None
+
+        setting = payload[0]
+        value = struct.unpack_from("<i", payload, 1)[0]
+        if setting == SETTING_DEBOUNCE_MS and value >= 0:
+            mode_select.DEBOUNCE_DELAY = value
+        elif setting == SETTING_TIMING_ENABLED:
+            timing.enabled = bool(value)
+        elif setting == SETTING_LOG_LEVEL:
+            LOG.level = value
+        else:
+            return None
+        return b""
+
+    def _wiggle(self, payload):
+        if len(payload) != 4 or self.selector is None:
+            return None
+
+        window_ms = struct.unpack("<I", payload)[0]
+        if window_ms > MAX_WINDOW_MS:
+            return None
+
+        monitor = WiggleMonitor(self.selector.cable_tester)
+        monitor.run(window_ms)
+
+        # As many events as fit the response after the status byte and the summary
+        fit = min(monitor.count, (MAX_PAYLOAD - 1 - WIGGLE_SUMMARY_SIZE) // WIGGLE_EVENT_SIZE)
+        response = bytearray(WIGGLE_SUMMARY_SIZE + fit * WIGGLE_EVENT_SIZE)
+        struct.pack_into(WIGGLE_SUMMARY_FORMAT, response, 0, monitor.samples, monitor.overruns,
+                         monitor.count + monitor.lost)
+        for n in range(fit):
+            struct.pack_into(WIGGLE_EVENT_FORMAT, response, WIGGLE_SUMMARY_SIZE + n * WIGGLE_EVENT_SIZE,
+                             monitor.wire_ids[n], monitor.ticks[n], monitor.states[n])
+        return bytes(response)
+
+    def _exit(self, payload):
+        self.exit_requested = True
+        return b""
+
+    HANDLERS = {
+        CMD_PING: _ping,
+        CMD_RUN_TEST: _run_test,
+        CMD_RUN_SEQUENCE: _run_sequence,
+        CMD_MEASUREMENTS: _measurements,
+        CMD_LAST_RESULT: _last_result,
+        CMD_TIMING: _timing,
+        CMD_RESET_TIMING: _reset_timing,
+        CMD_GET_SETTING: _get_setting,
+        CMD_SET_SETTING: _set_setting,
+        CMD_WIGGLE: _wiggle,
+        CMD_EXIT: _exit,
+    }
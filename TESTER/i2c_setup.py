@@ -1,12 +1,15 @@
 # Initialize the i2c communication and return i2c object if initializatin is successful.
 
 from machine import I2C, Pin
+from timing import TimedI2C
+from i2c_trace import TracingI2C
 
 DEFALUT_SDA_PIN = 16
 DEFAULT_SCL_PIN = 17
 DEFAULT_FREQ = 100000
 
-def initialize_i2c(sda_pin = DEFALUT_SDA_PIN, scl_pin = DEFAULT_SCL_PIN, freq = DEFAULT_FREQ):
+def initialize_i2c(sda_pin = DEFALUT_SDA_PIN, scl_pin = DEFAULT_SCL_PIN, freq = DEFAULT_FREQ, timed = False,
+                   traced = False):
     
     """
     Initialize and return the I2C interface.
@@ -15,6 +18,8 @@ def initialize_i2c(sda_pin = DEFALUT_SDA_PIN, scl_pin = DEFAULT_SCL_PIN, freq =
     sda_pin (int): SDA pin number
     scl_pin (int): SCL pin number
     freq (int): I2C frequency
+    timed (bool): Wrap the interface so every transaction is timed (see timing.py)
+    traced (bool): Wrap the interface so every transaction is recorded (see i2c_trace.py)
 
     Returns:
     I2C: Initialized I2C object
@@ -22,6 +27,11 @@ def initialize_i2c(sda_pin = DEFALUT_SDA_PIN, scl_pin = DEFAULT_SCL_PIN, freq =
     
     try:
         i2c = I2C(0, scl=Pin(scl_pin), sda=Pin(sda_pin), freq=freq)
+        
+        if timed:
+            i2c = TimedI2C(i2c)
+        if traced:
+            i2c = TracingI2C(i2c)
         return i2c
     
     except Exception as e:
@@ -0,0 +1,265 @@
+# I2C transaction trace recording.
+# TracingI2C wraps the I2C object and records every transaction (address, register, bytes and the
+# time since the previous transaction) into a compact binary trace. HOST/i2c_replay.py feeds a
+# saved trace back into the unmodified drivers on a computer.
+#
+# Trace file: MAGIC, then records of
+#     kind (u8), address (u8), register (u8), length (u8), delta us (u16, 0xFFFF + u32 if larger), data
+# An errored transaction has FLAG_ERROR set in kind and the errno as its only data byte. A transfer
+# longer than 255 bytes is split into records of at most 255 bytes; all but the last have FLAG_MORE
+# set and the continuations have a delta of 0.
+# MARK records carry a label (ModeSelect creation with its settings, or the test mode) used to drive
+# the replay.
+
+import time
+
+DEFAULT_TRACE_FILE = "i2c_trace.bin"
+DEFAULT_CAPACITY = 8192         # Bytes of trace kept in RAM before it is written to flash
+
+MAGIC = b"I2CT\x01"
+
+KIND_WRITE = 0x01               # writeto(): data written
+KIND_READ = 0x02                # readfrom(): data read
+KIND_WRITE_MEM = 0x03           # writeto_mem(): register, data written
+KIND_READ_MEM = 0x04            # readfrom_mem(): register, data read
+KIND_MARK = 0x05                # Label: b"init" or a mode name
+FLAG_ERROR = 0x80               # Transaction raised OSError
+FLAG_MORE = 0x40                # The data continues in the next record
+
+MARK_INIT = "init"              # ModeSelect created (drivers initialized), see init_label()
+
+_LONG_DELTA = 0xFFFF
+_MAX_DATA = 255                 # Bytes in one record (u8 length)
+
+
+class TraceBuffer:
+
+    """
+    Preallocated RAM buffer of trace records.
+
+    When the buffer fills up it is appended to the trace file, so a long capture costs one flash
+    write per DEFAULT_CAPACITY bytes. Call save() while the tester is idle to write the rest.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, path=DEFAULT_TRACE_FILE):
+
+        """
+        Parameters:
+        capacity (int): Size of the RAM buffer in bytes.
+        path (str): Trace file on the Pico filesystem.
+        """
+
+        self.buffer = bytearray(capacity)
+        self.length = 0
+        self.path = path
+        self.enabled = False
+        self.last_tick = 0
+        self.records = 0
+        self._started = False
+
+    def start(self, path=None):
+
+        """Start a new trace file and enable recording."""
+
+        if path is not None:
+            self.path = path
+
+        with open(self.path, "wb") as trace_file:
+            trace_file.write(MAGIC)
+
+        self.length = 0
+        self.records = 0
+        self.last_tick = time.ticks_us()
+        self._started = True
+        self.enabled = True
+
+    def stop(self):
+
+        """Disable recording and write the buffered records to the trace file."""
+
+        self.save()
+        self.enabled = False
+
+    def save(self):
+
+        """Append the buffered records to the trace file."""
+
+        if not self._started or not self.length:
+            return
+
+        with open(self.path, "ab") as trace_file:
+            trace_file.write(memoryview(self.buffer)[:self.length])
+        self.length = 0
+
+    def add(self, kind, addr, reg, data):
+
+        """
+        Append one record.
+
+        Parameters:
+        kind (int): KIND_* value, optionally with FLAG_ERROR.
+        addr (int): 7-bit I2C address.
+        reg (int): Register address for the *_MEM kinds, otherwise 0.
+        data (bytes): Transferred bytes; more than 255 are split over several records.
+        """
+
+        now = time.ticks_us()
+        delta = time.ticks_diff(now, self.last_tick)
+        self.last_tick = now
+
+        if len(data) > _MAX_DATA:
+            data = memoryview(data)
+            while len(data) > _MAX_DATA:
+                self._append(kind | FLAG_MORE, addr, reg, data[:_MAX_DATA], delta)
+                data = data[_MAX_DATA:]
+                delta = 0
+        self._append(kind, addr, reg, data, delta)
+
+    def _append(self, kind, addr, reg, data, delta):
+        size = len(data)
+        needed = 6 + size + (4 if delta >= _LONG_DELTA else 0)
+        if self.length + needed > len(self.buffer):
+            self.save()
+
+        buffer = self.buffer
+        i = self.length
+        buffer[i] = kind
+        buffer[i + 1] = addr
+        buffer[i + 2] = reg & 0xFF
+        buffer[i + 3] = size
+
+        if delta < _LONG_DELTA:
+            buffer[i + 4] = delta & 0xFF
+            buffer[i + 5] = delta >> 8
+            i += 6
+        else:
+            buffer[i + 4] = 0xFF
+            buffer[i + 5] = 0xFF
+            buffer[i + 6] = delta & 0xFF
+            buffer[i + 7] = (delta >> 8) & 0xFF
+            buffer[i + 8] = (delta >> 16) & 0xFF
+            buffer[i + 9] = (delta >> 24) & 0xFF
+            i += 10
+
+        buffer[i:i + size] = data
+        self.length = i + size
+        self.records += 1
+
+
+# Shared trace buffer, disabled until TRACE.start() is called
+TRACE = TraceBuffer()
+
+
+def mark(label):
+
+    """Record a label in the trace (ModeSelect creation, start of a test)."""
+
+    if TRACE.enabled:
+        TRACE.add(KIND_MARK, 0, 0, label.encode())
+
+
+def init_label(mux_channels=None, ina_alert_pin=None):
+
+    """
+    Return the MARK_INIT label with the ModeSelect settings that change the I2C traffic, so the
+    replay creates ModeSelect the same way: "init", "init mux=0,1,2,3", "init mux=0,1 alert=22"...
+    """
+
+    label = MARK_INIT
+    if mux_channels:
+        label += " mux=" + ",".join(str(channel) for channel in mux_channels)
+    if ina_alert_pin is not None:
+        label += " alert={}".format(ina_alert_pin)
+    return label
+
+
+def _errno(exception):
+    args = getattr(exception, "args", ())
+    return bytes([args[0] & 0xFF]) if args and isinstance(args[0], int) else b"\x00"
+
+
+class TracingI2C:
+
+    """
+    Wrapper around a machine.I2C object which records every transaction into TRACE.
+
+    Any other attribute is passed through to the wrapped object.
+    """
+
+    def __init__(self, i2c):
+
+        """
+        Parameters:
+        i2c (I2C): The I2C object to wrap.
+        """
+
+        self.i2c = i2c
+
+    def __getattr__(self, name):
+        return getattr(self.i2c, name)
+
+    def writeto(self, addr, buf, *args):
+        try:
+            result = self.i2c.writeto(addr, buf, *args)
+        except OSError as e:
+            if TRACE.enabled:
+                TRACE.add(KIND_WRITE | FLAG_ERROR, addr, 0, _errno(e))
+            raise
+        if TRACE.enabled:
+            TRACE.add(KIND_WRITE, addr, 0, buf)
+        return result
+
+    def readfrom(self, addr, nbytes, *args):
+        try:
+            data = self.i2c.readfrom(addr, nbytes, *args)
+        except OSError as e:
+            if TRACE.enabled:
+                TRACE.add(KIND_READ | FLAG_ERROR, addr, 0, _errno(e))
+            raise
+        if TRACE.enabled:
+            TRACE.add(KIND_READ, addr, 0, data)
+        return data
+
+    def readfrom_into(self, addr, buf, *args):
+        try:
+            result = self.i2c.readfrom_into(addr, buf, *args)
+        except OSError as e:
+            if TRACE.enabled:
+                TRACE.add(KIND_READ | FLAG_ERROR, addr, 0, _errno(e))
+            raise
+        if TRACE.enabled:
+            TRACE.add(KIND_READ, addr, 0, buf)
+        return result
+
+    def writeto_mem(self, addr, memaddr, buf, **kwargs):
+        try:
+            result = self.i2c.writeto_mem(addr, memaddr, buf, **kwargs)
+        except OSError as e:
+            if TRACE.enabled:
+                TRACE.add(KIND_WRITE_MEM | FLAG_ERROR, addr, memaddr, _errno(e))
+            raise
+        if TRACE.enabled:
+            TRACE.add(KIND_WRITE_MEM, addr, memaddr, buf)
+        return result
+
+    def readfrom_mem(self, addr, memaddr, nbytes, **kwargs):
+        try:
+            data = self.i2c.readfrom_mem(addr, memaddr, nbytes, **kwargs)
+        except OSError as e:
+            if TRACE.enabled:
+                TRACE.add(KIND_READ_MEM | FLAG_ERROR, addr, memaddr, _errno(e))
+            raise
+        if TRACE.enabled:
+            TRACE.add(KIND_READ_MEM, addr, memaddr, data)
+        return data
+
+    def readfrom_mem_into(self, addr, memaddr, buf, **kwargs):
+        try:
+            result = self.i2c.readfrom_mem_into(addr, memaddr, buf, **kwargs)
+        except OSError as e:
+            if TRACE.enabled:
+                TRACE.add(KIND_READ_MEM | FLAG_ERROR, addr, memaddr, _errno(e))
+            raise
+        if TRACE.enabled:
+            TRACE.add(KIND_READ_MEM, addr, memaddr, buf)
+        return result
@@ -0,0 +1,131 @@
+# Low-power idle state between boards, for battery-powered kits.
+# After IDLE_AFTER_MS without a button press, the LED animations are stopped and the RP2040 waits in
+# machine.lightsleep() instead of scanning the buttons every few milliseconds. A falling edge on
+# any mode button wakes it (the pin interrupt ends the sleep); every SLEEP_MS it also wakes on its
+# own and flashes the run LED once, to show that the station is still on.
+# The time from the wake-up to the next button scan is measured; it has to stay under one debounce
+# window, so the press that woke the station is still seen by that scan. main() keeps its ModeSelect
+# across passes, so no I2C transaction lies on that path, with or without the multiplexer and the
+# INA226 alert; the sensors are only configured when a test starts.
+
+import machine
+from machine import Pin
+import utime
+
+import rgb_led_control
+import run_led
+from event_log import log, EV_IDLE_ENTER, EV_IDLE_WAKE, EV_IDLE_WAKE_SLOW
+
+IDLE_AFTER_MS = 30_000          # Time without a button press before the station sleeps
+SLEEP_MS = 2000                 # Longest single lightsleep; the run LED flashes after each one
+HEARTBEAT_MS = 20               # Run LED flash while sleeping
+WAKE_LIMIT_MS = 50              # Wake-to-ready budget: one debounce window (mode_select.DEBOUNCE_DELAY)
+
+
+class IdleManager:
+
+    """
+    Decides when the station is idle and sleeps until a mode button is pressed.
+
+    Call sleep_if_idle() on every pass of the main loop, ready() right before the button scan and
+    activity() whenever a test ran.
+    """
+
+    def __init__(self, button_pins, idle_after_ms=IDLE_AFTER_MS, sleep_ms=SLEEP_MS):
+
+        """
+        Parameters:
+        button_pins (tuple): Pin numbers of the mode buttons (active low, pulled up).
+        idle_after_ms (int): Time without activity before sleeping.
+        sleep_ms (int): Longest single lightsleep.
+        """
+
+        self.buttons = [Pin(pin, Pin.IN, Pin.PULL_UP) for pin in button_pins]
+        self.idle_after_ms = idle_after_ms
+        self.sleep_ms = sleep_ms
+        self.last_activity = utime.ticks_ms()
+
+        self.woken = False
+        self._woke_at = None        # Tick (us) of the last wake-up, until ready() is called
+        self.last_latency_us = 0    # Wake-to-ready time of the last wake-up by a button
+        self.worst_latency_us = 0
+        self.wakeups = 0
+
+    def activity(self):
+
+        """Note that the station was used; the idle time starts again."""
+
+        self.last_activity = utime.ticks_ms()
+
+    def is_idle(self):
+        return utime.ticks_diff(utime.ticks_ms(), self.last_activity) >= self.idle_after_ms
+
+    def _on_wake(self, pin):
+        self.woken = True
+
+    def _pressed(self):
+        for button in self.buttons:
+            if not button.value():
+                return True
+        return False
+
+    def sleep_if_idle(self):
+
+        """
+        Sleep until a button is pressed, if the station has been idle long enough.
+
+        Returns:
+        bool: True if the station slept.
+        """
+
+        if not self.is_idle():
+            return False
+
+        log(EV_IDLE_ENTER, utime.ticks_diff(utime.ticks_ms(), self.last_activity))
+        run_led.run_led_timer.deinit()
+        run_led.led_pwm.duty_u16(0)
+        rgb_led_control.stop_led()
+
+        self.woken = False
+        for button in self.buttons:
+            button.irq(trigger=Pin.IRQ_FALLING, handler=self._on_wake)
+
+        while True:
+            machine.lightsleep(self.sleep_ms)
+            self._woke_at = utime.ticks_us()
+            if self.woken or self._pressed():
+                break
+            # Woken by the timeout: heartbeat flash, then back to sleep
+            run_led.led_pwm.duty_u16(65535)
+            utime.sleep_ms(HEARTBEAT_MS)
+            run_led.led_pwm.duty_u16(0)
+
+        for button in self.buttons:
+            button.irq(handler=None)
+
+        # LEDs back on; the main loop calls ready() when it scans the buttons again
+        run_led.run_led_timer.init(freq=50, mode=run_led.Timer.PERIODIC, callback=run_led.update_pwm)
+        rgb_led_control.animate_led(0.5, 0.0, 0.5)
+        self.activity()
+        return True
+
+    def ready(self):
+
+        """
+        Note that the button scan starts. After a wake-up, logs the wake-to-ready latency.
+
+        Returns:
+        int: Latency in microseconds, None if the station did not just wake up.
+        """
+
+        if self._woke_at is None:
+            return None
+
+        latency = utime.ticks_diff(utime.ticks_us(), self._woke_at)
+        self._woke_at = None
+        self.last_latency_us = latency
+        if latency > self.worst_latency_us:
+            self.worst_latency_us = latency
+        self.wakeups += 1
+        log(EV_IDLE_WAKE_SLOW if latency > WAKE_LIMIT_MS * 1000 else EV_IDLE_WAKE, latency)
+        return latency
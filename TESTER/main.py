@@ -2,20 +2,109 @@
 
 from mode_select import ModeSelect
 from i2c_setup import initialize_i2c
+from event_log import LOG
+from result_store import ResultStore
+from mode_stats import ModeStats
+from i2c_trace import TRACE
+from host_protocol import CommandServer
+from dual_core import CoreWorker
+from idle_manager import IdleManager
 import run_led 
 import utime
 
+# Record every I2C transaction into i2c_trace.bin (see i2c_trace.py)
+TRACE_I2C = False
+
+# Serve the commands of HOST/tester_client.py on the USB serial (see host_protocol.py)
+HOST_COMMANDS = False
+
+# TCA9548A channels with a board under test, e.g. (0, 1, 2, 3); None: one board, no multiplexer
+# (see multi_dut.py)
+MUX_CHANNELS = None
+
+# Pico pin wired to the INA226 ALERT output, e.g. 22 when the analog rail output is not used;
+# None: no hardware overcurrent watch (see INA226.set_alert())
+INA_ALERT_PIN = None
+
+# Run the LED animations, log output and host frame I/O on the second core (see dual_core.py)
+DUAL_CORE = False
+
+# Sleep between boards until a mode button is pressed, for battery-powered kits (see idle_manager.py).
+# Not used with HOST_COMMANDS or DUAL_CORE: the host and core 1 have to stay awake.
+LOW_POWER_IDLE = False
+MODE_BUTTON_PINS = (18, 19, 20, 21)
+
 def main():
     
+    # Persistent test results, shared by every ModeSelect instance
+    results = ResultStore()
+    # Failure rates and durations of the modes, for the order of the full-board sequence
+    stats = ModeStats()
+
+    if TRACE_I2C:
+        TRACE.start()
+
+    worker = None
+    if DUAL_CORE:
+        worker = CoreWorker(host=HOST_COMMANDS)
+        worker.start()
+
+    idle = None
+    if LOW_POWER_IDLE and not HOST_COMMANDS and not DUAL_CORE:
+        idle = IdleManager(MODE_BUTTON_PINS)
+
+    # Create i2c object
+    i2c = initialize_i2c(timed=True, traced=TRACE_I2C)
+    # Controls which operation is executed when spesific mode is selected; it lives as long as the
+    # program and configures the sensors of the board under test before each test
+    mode_selector = ModeSelect(i2c, results=results, mux_channels=MUX_CHANNELS,
+                               ina_alert_pin=INA_ALERT_PIN, stats=stats)
+
+    server = None
+    if HOST_COMMANDS:
+        server = CommandServer(mode_selector, results=results,
+                               output=worker.responses if worker is not None else None)
+
+        def poll_host():
+            return worker.serve(server) if worker is not None else server.poll()
+
+        # Host requests are also served while the button scan waits
+        mode_selector.on_wait = poll_host
+
+    # Tests already in the saved I2C trace
+    traced_tests = 0
 
     while True:
         
-        # Create i2c object
-        i2c = initialize_i2c()
-        # Controls which operation is executed when spesific mode is selected
-        mode_selector = ModeSelect(i2c)
+        # Run the tests requested by the host, if any
+        if server is not None:
+            mode_selector.on_wait()
+            if server.exit_requested:
+                if worker is not None:
+                    worker.stop()
+                server.close()
+                stats.save()
+                break
         # Activate operations when button is pressed
+        if idle is not None:
+            idle.ready()
         mode_selector.activate_test()
+        if idle is not None and mode_selector.active_mode is not None:
+            idle.activity()
+        # The station is idle until the next button press, flush the diagnostics now
+        if worker is None:
+            LOG.drain()
+        results.flush_if_stale()
+        stats.flush_if_stale()
+        # An idle pass adds nothing to the I2C trace, it is written after tests only
+        if mode_selector.tests_run != traced_tests:
+            traced_tests = mode_selector.tests_run
+            TRACE.save()
+        # Nothing is left in RAM while the station sleeps
+        if idle is not None and idle.is_idle():
+            results.flush()
+            stats.flush_if_stale(0)
+            idle.sleep_if_idle()
     
 
 if __name__ == "__main__":
@@ -4,11 +4,27 @@ from machine import PWM, Pin
 import rgb_led_control 
 from cable_test import CableTester
 from INA226 import INA226
+from multi_dut import MultiBoardTester
+from analog_check import shared_checker, last_measurements
 from sensor_control import SCD41, DualSensorManager
+from event_log import (log, error_code, EV_MODE_WIRE, EV_MODE_CURRENT, EV_MODE_CO2, EV_MODE_LIGHT,
+                       EV_MODE_NONE, EV_MODE_ANALOG, EV_MODE_POWER_ALERT, EV_MODE_INIT_ERROR, EV_MODE_BUTTON_ERROR,
+                       EV_MODE_GET_ERROR, EV_MODE_TEST_ERROR, EV_MODE_SENSOR_COMM_ERROR, EV_MODE_SCD41_OK,
+                       EV_MODE_SCD41_NOT_WORKING, EV_MODE_RESULT_STORE_ERROR, EV_INA226_ALERT_ERROR)
+from result_store import (MODE_CODES, MODE_WIRE, MODE_CURRENT, MODE_CO2, MODE_ANALOG, VERDICT_PASS, VERDICT_FAIL,
+                          VERDICT_ERROR)
+import timing
+from i2c_trace import mark, init_label
 import utime
 
 DEBOUNCE_DELAY = 50  # Debounce delay in milliseconds
 
+# Current of the board under test that latches the INA226 ALERT pin (A), above CURRENT_LIMIT of INA226.py
+OVERCURRENT_ALERT_A = 0.25
+
+# Order of the tests in a full-board sequence
+SEQUENCE_ORDER = ('wire_test_mode', 'current_test_mode', 'light_test_mode', 'co2_test_mode')
+
 class ModeSelect:
     
     """Class to manage the program's functionality based on the selected mode."""
@@ -16,9 +32,26 @@ class ModeSelect:
     def __init__(self, i2c, wire_test_pin=21, 
                  current_test_pin=18, 
                  co2_test_pin=20, 
-                 light_test_pin=19):
+                 light_test_pin=19,
+                 results=None,
+                 mux_channels=None,
+                 analog_test_pin=None,
+                 ina_alert_pin=None,
+                 stats=None):
         """
         Initialize the ModeSelect with button pins, mode instances, and I2C interface.
+        Test results are appended to the given ResultStore, if any.
+        With mux_channels, the sensor tests run on one board per TCA9548A channel (multi_dut.py);
+        the driver attributes then belong to the board on the first channel.
+        The analog rail test (analog_check.py) gets a button only if analog_test_pin is given;
+        it can always be run by the host.
+        With ina_alert_pin (wired to the INA226 ALERT output), the INA226 latches any current above
+        OVERCURRENT_ALERT_A in hardware and a test during which it fired fails. Under the
+        multiplexer only the board on the first channel is watched.
+        With a ModeStats, every test updates the statistics of its mode and run_sequence() orders
+        the tests by them (mode_stats.py); otherwise the sequence runs in SEQUENCE_ORDER.
+        One instance lives as long as the program: the sensors of the board under test are
+        configured again at the start of every test, when the board may have been swapped.
         """
         try:
             # Initialize button pins
@@ -30,10 +63,24 @@ class ModeSelect:
             }
             
             # Initialize mode instances
+            mark(init_label(mux_channels, ina_alert_pin))
             self.cable_tester = CableTester()
-            self.current_tester = INA226(i2c)
-            self.co2_tester = SCD41(i2c)
-            self.sensor_manager = DualSensorManager(i2c)
+            self.multi_tester = None
+            
+            if mux_channels:
+                self.multi_tester = MultiBoardTester(i2c, mux_channels)
+                board = self.multi_tester.boards[0]
+                self.current_tester = board.current_tester
+                self.co2_tester = board.co2_tester
+                self.sensor_manager = board.sensor_manager
+                
+            else:
+                self.current_tester = INA226(i2c)
+                self.co2_tester = SCD41(i2c)
+                self.sensor_manager = DualSensorManager(i2c)
+            
+            # Verdict of every multiplexed board in the last sensor test
+            self.board_verdicts = None
             
             # Mode states
             self.mode_states = {
@@ -43,11 +90,61 @@ class ModeSelect:
                 'light_test_mode': 1
             }
             
+            if analog_test_pin is not None:
+                self.buttons['analog_test_mode'] = Pin(analog_test_pin, Pin.IN, Pin.PULL_UP)
+                self.mode_states['analog_test_mode'] = 1
+            
             # Current active mode
             self.active_mode = None
+            # Tests run by execute_test(), main() saves the I2C trace when it changes
+            self.tests_run = 0
+            # Duration of the last test run by execute_test() (ms)
+            self.last_duration_ms = 0
+            
+            # Called while the button scan waits, e.g. CommandServer.poll(); returns the number of
+            # host requests it handled
+            self.on_wait = None
+            
+            # Persistent store of the test results
+            self.results = results
+            # Persistent failure rates and durations of the modes
+            self.stats = stats
+            
+            self.alert_armed = False
+            if ina_alert_pin is not None:
+                self._arm_alert(ina_alert_pin)
 
         except Exception as e:
-            print(f"Failed to initialize ModeSelect: {e}")
+            log(EV_MODE_INIT_ERROR, error_code(e))
+
+    def _arm_alert(self, pin):
+        
+        """
+        Program the INA226 overcurrent alert and count its ALERT edges on the pin. Called once at
+        start-up; _configure_board() writes the alert registers again before every test.
+        """
+        
+        self.alert_armed = True
+        try:
+            self.current_tester.set_overcurrent_alert(OVERCURRENT_ALERT_A, pin)
+            
+        except OSError as e:
+            # No board yet: the alert is written to the chip before the first test
+            log(EV_INA226_ALERT_ERROR, error_code(e))
+    
+    def _alert_fired(self):
+        
+        """Return True if the INA226 alert fired since the last call, and release its latch."""
+        
+        if not self.alert_armed:
+            return False
+        
+        try:
+            return self.current_tester.clear_alert()
+        
+        except OSError as e:
+            log(EV_INA226_ALERT_ERROR, error_code(e))
+            return False
 
     def _deactivate_all_modes(self):
         
@@ -57,11 +154,35 @@ class ModeSelect:
             self.mode_states[mode] = 1
         self.active_mode = None
 
+    def _debounce_wait(self):
+        
+        """
+        Wait one debounce delay, serving the host meanwhile if on_wait is set.
+
+        Returns:
+        bool: True if a host request was handled, the scan is then abandoned.
+        """
+        
+        if self.on_wait is None:
+            utime.sleep_ms(DEBOUNCE_DELAY)
+            return False
+        
+        deadline = utime.ticks_add(utime.ticks_ms(), DEBOUNCE_DELAY)
+        while utime.ticks_diff(deadline, utime.ticks_ms()) > 0:
+            if self.on_wait():
+                return True
+            utime.sleep_ms(1)
+        return False
+
     def _activate_mode(self):
         
         """Activate the specified mode and update its state."""
         
-        for mode in self.mode_states:
+        scan_start = timing.start()
+        # Only a button held during this scan selects a mode
+        self._deactivate_all_modes()
+        
+        for index, mode in enumerate(self.mode_states):
             try:
                 initial_state = self.buttons[mode].value()
                 
@@ -69,7 +190,9 @@ class ModeSelect:
                 stable = False
                 
                 while not stable:
-                    utime.sleep_ms(DEBOUNCE_DELAY)
+                    if self._debounce_wait():
+                        timing.stop(timing.SPAN_BUTTON_SCAN, scan_start)
+                        return
                     current_state = self.buttons[mode].value()
                     if current_state == initial_state:
                         stable = True
@@ -78,14 +201,16 @@ class ModeSelect:
                         initial_state = current_state
                 
                 # Proceed if the button is pressed (state is LOW)
-                if not stable:
+                if current_state == 0:
                     self._deactivate_all_modes()
                     self.mode_states[mode] = 0
                     self.active_mode = mode
                     break
 
             except Exception as e:
-                print(f"Error while activating mode {mode}: {e}")
+                log(EV_MODE_BUTTON_ERROR, index)
+        
+        timing.stop(timing.SPAN_BUTTON_SCAN, scan_start)
 
     def get_active_mode(self):
         
@@ -96,97 +221,267 @@ class ModeSelect:
             return self.active_mode
         
         except Exception as e:
-            print(f"Error getting active mode: {e}")
+            log(EV_MODE_GET_ERROR, error_code(e))
             return None
         
+    def run_test(self, mode):
+        
+        """
+        Run the test of the given mode.
+
+        Parameters:
+        mode (str): One of the mode names in self.buttons.
+
+        Returns:
+        bool: True if the board passed the test, False otherwise.
+        """
+        
+        start = timing.start()
+        self.board_verdicts = None
+        
+        if mode == "wire_test_mode":
+            log(EV_MODE_WIRE)
+            passed = self.cable_tester.is_working()
+            timing.stop(timing.SPAN_WIRE_TEST, start)
+            return passed
+            
+        elif mode == "current_test_mode":
+            log(EV_MODE_CURRENT)
+            if self.multi_tester is not None:
+                passed = self._all_boards(self.multi_tester.run_current())
+            else:
+                passed = self.current_tester.is_working()
+            timing.stop(timing.SPAN_CURRENT_TEST, start)
+            return passed
+            
+        elif mode == "co2_test_mode":
+            log(EV_MODE_CO2)
+            
+            if self.multi_tester is not None:
+                passed = self._all_boards(self.multi_tester.run_co2())
+                timing.stop(timing.SPAN_CO2_TEST, start)
+                return passed
+            
+            self.co2_tester.start_periodic_measurement()
+            
+            # Measures until the verdict is certain, at most 5 periodic measurements
+            passed = self.co2_tester.is_working()
+            log(EV_MODE_SCD41_OK if passed else EV_MODE_SCD41_NOT_WORKING)
+            
+            timing.stop(timing.SPAN_CO2_TEST, start)
+            return passed
+            
+        elif mode == "light_test_mode":
+            log(EV_MODE_LIGHT)
+            if self.multi_tester is not None:
+                passed = self._all_boards(self.multi_tester.run_light())
+            else:
+                passed = self.sensor_manager.is_working()
+            timing.stop(timing.SPAN_LIGHT_TEST, start)
+            return passed
+            
+        elif mode == "analog_test_mode":
+            log(EV_MODE_ANALOG)
+            passed = shared_checker().is_working()
+            timing.stop(timing.SPAN_ANALOG_TEST, start)
+            return passed
+        
+        raise ValueError("Unknown mode")
+
+    def _all_boards(self, verdicts):
+        
+        """Keep the verdicts of the multiplexed boards and return True if all of them passed."""
+        
+        self.board_verdicts = verdicts
+        return all(verdicts)
+
+    def measurements(self, mode, board=None):
+        
+        """
+        Return the measurements of the last test of a mode.
+
+        Parameters:
+        mode (str): One of the mode names in self.buttons.
+        board (BoardUnderTest): Multiplexed board to report, the drivers of ModeSelect by default.
+
+        Returns:
+        dict: Keyword arguments of ResultStore.append() for the mode.
+        """
+        
+        code = MODE_CODES[mode]
+        source = self if board is None else board
+        
+        if code == MODE_WIRE:
+            return {'cable_matrix': self.cable_tester.matrix}
+            
+        elif code == MODE_CURRENT:
+            bus_voltage, _, current, _ = source.current_tester.last_reading
+            return {'bus_voltage': bus_voltage, 'current': current}
+            
+        elif code == MODE_CO2:
+            co2, temperature, humidity = source.co2_tester.last_measurement
+            return {'co2': co2, 'temperature': temperature, 'humidity': humidity}
+            
+        elif code == MODE_ANALOG:
+            return last_measurements()
+            
+        return {'lux': source.sensor_manager.last_lux}
+
+    def _record_result(self, mode, verdict, duration_ms):
+        
+        """Append the result and the measurements of the finished test to the result store."""
+        
+        if self.results is None:
+            return
+        
+        code = MODE_CODES[mode]
+        
+        # One record per multiplexed board, in channel order
+        if self.multi_tester is not None and code != MODE_WIRE and self.board_verdicts is not None:
+            for board, passed in zip(self.multi_tester.boards, self.board_verdicts):
+                self.results.append(code, VERDICT_PASS if passed else VERDICT_FAIL, duration_ms=duration_ms,
+                                    channel=board.channel, **self.measurements(mode, board))
+            return
+        
+        self.results.append(code, verdict, duration_ms=duration_ms, **self.measurements(mode))
+        
     def activate_test(self):
         
-        """Check the working state of the active mode and print the result."""
+        """
+        Run the test of the selected mode, show the result on the RGB LED and store it.
+
+        Returns:
+        bool: True if the board passed, False if it failed, None if no test was run.
+        """
         
         active_mode = self.get_active_mode()
         
-        try:
-            if active_mode == "wire_test_mode":
-                print("Wire test mode is selected")
-                
-                if self.cable_tester.is_working():
-                    # Animate Green Color
-                    rgb_led_control.animate_led(0.0, 1.0, 0.0)  # Full green intensity, other colors off
-                    
-                else:
-                    # Animate Red Color
-                    rgb_led_control.animate_led(1.0, 0.0, 0.0)  # Full red intensity, other colors off
-                    
-                
-            elif active_mode == "current_test_mode":
-                print("Current test mode is selected")
-                
-                if self.current_tester.is_working():
-                    # Animate Green Color
-                    rgb_led_control.animate_led(0.0, 1.0, 0.0)  # Full green intensity, other colors off
-                    
-                else:
-                    # Animate Red Color
-                    rgb_led_control.animate_led(1.0, 0.0, 0.0)  # Full red intensity, other colors off
-                    
-                
-            elif active_mode == "co2_test_mode":
+        if active_mode is None:
+            log(EV_MODE_NONE)
+            # Animate a Mix of Red and Blue
+            rgb_led_control.animate_led(0.5, 0.0, 0.5)  # Equal mix of red and blue for a purple color
+            return None
+        
+        return self.execute_test(active_mode)
+    
+    def _configure_board(self, mode):
+        
+        """
+        Configure the sensors used by the test again on the board (on every multiplexed board), it
+        may be a new one. The INA226 watched by the alert is configured before every test.
+        """
+        
+        boards = self.multi_tester.boards if self.multi_tester is not None else (self,)
+        for board in boards:
+            if mode == 'current_test_mode' or (self.alert_armed and board.current_tester is self.current_tester):
                 try:
+                    board.current_tester.configure()
                     
-                    print("CO2 test mode is selected")
-                    
-                    co2_tester.start_periodic_measurement()
-                    
-                    working = False
-                    count = 0
-                    while count < 5:
-                        # Check if the sensor is working
-                        if co2_tester.is_working():
-                            print("SCD41 sensor is working properly.")
-                            # Animate Green Color
-                            rgb_led_control.animate_led(0.0, 1.0, 0.0)  # Full green intensity, other colors off
-                            working = True
-                            break
-                        
-                        else:
-                            print("SCD41 sensor is not working.")
-                        
-                        count += 1  # Increment count
-                        time.sleep(5)  # Delay before the next check
-                            
-                    
-                    if not working:
-                    # Animate Red Color
-                    rgb_led_control.animate_led(1.0, 0.0, 0.0)  # Full red intensity, other colors off
-                
-                except OSError as e:
-                    print(f"Sensor communication error: {e}")
-                    
-                except Exception as e:
-                    print(f"An unexpected error occurred: {e}")
-                
-                
-            elif active_mode == "light_test_mode":
-                print("Light test mode is selected")
-                
-                if self.sensor_manager.is_working():
-                    # Animate Green Color
-                    rgb_led_control.animate_led(0.0, 1.0, 0.0)  # Full green intensity, other colors off
-                    
-                else:
-                    # Animate Red Color
-                    rgb_led_control.animate_led(1.0, 0.0, 0.0)  # Full red intensity, other colors off
-                    
+                except OSError:
+                    # A missing sensor is reported by its test
+                    pass
+            
+            if mode == 'light_test_mode':
+                board.sensor_manager.setup()
+    
+    def execute_test(self, mode):
+        
+        """
+        Run the test of a mode, show the result on the RGB LED and store it.
+
+        Parameters:
+        mode (str): One of the mode names in self.buttons.
+
+        Returns:
+        bool: True if the board passed, False if it failed, None if the test could not run.
+        """
+        
+        start = utime.ticks_ms()
+        self.tests_run += 1
+        mark(mode)
+        self._configure_board(mode)
+        # An alert latched before the test (e.g. inrush when the board was plugged in) does not count
+        self._alert_fired()
+        
+        try:
+            passed = self.run_test(mode)
+            
+            # Overcurrent caught by the INA226 while the test ran, even between two readings
+            if self._alert_fired():
+                log(EV_MODE_POWER_ALERT, MODE_CODES.get(mode, 0))
+                passed = False
+            verdict = VERDICT_PASS if passed else VERDICT_FAIL
+            
+            if passed:
+                # Animate Green Color
+                rgb_led_control.animate_led(0.0, 1.0, 0.0)  # Full green intensity, other colors off
                 
             else:
-                print("No mode selected")
-                # Animate a Mix of Red and Blue
-                rgb_led_control.animate_led(0.5, 0.0, 0.5)  # Equal mix of red and blue for a purple color
+                # Animate Red Color
+                rgb_led_control.animate_led(1.0, 0.0, 0.0)  # Full red intensity, other colors off
                 
-
+        except OSError as e:
+            log(EV_MODE_SENSOR_COMM_ERROR, error_code(e))
+            passed = None
+            verdict = VERDICT_ERROR
+            # Animate Blue Color
+            rgb_led_control.animate_led(0.0, 0.0, 1.0)  # Full blue intensity, other colors off
+            
         except Exception as e:
-            print(f"Error during test activation: {e}")
-            Animate Blue Color
+            log(EV_MODE_TEST_ERROR, error_code(e))
+            passed = None
+            verdict = VERDICT_ERROR
+            # Animate Blue Color
             rgb_led_control.animate_led(0.0, 0.0, 1.0)  # Full blue intensity, other colors off
+        
+        duration = utime.ticks_diff(utime.ticks_ms(), start)
+        self.last_duration_ms = duration
+        if self.stats is not None:
+            self.stats.record(MODE_CODES[mode], passed is True, duration)
+        
+        try:
+            self._record_result(mode, verdict, duration)
+            
+        except OSError as e:
+            log(EV_MODE_RESULT_STORE_ERROR, error_code(e))
+        
+        return passed
+    
+    def sequence_order(self):
+        
+        """
+        Return the modes of a full-board sequence in test order: SEQUENCE_ORDER, or with a ModeStats
+        the order that rejects a bad board in the least expected time.
+        """
+        
+        if self.stats is None:
+            return SEQUENCE_ORDER
+        return self.stats.order(SEQUENCE_ORDER, MODE_CODES)
+    
+    def run_sequence(self, fail_fast=True):
+        
+        """
+        Run the tests of every mode on one board, in sequence_order().
 
+        Parameters:
+        fail_fast (bool): Stop at the first test the board does not pass.
 
+        Returns:
+        tuple: True if the board passed every test, False otherwise; list of (mode, result of
+               execute_test(), duration in ms) of the tests run, in test order.
+        """
+        
+        start = timing.start()
+        all_passed = True
+        reports = []
+        
+        for mode in self.sequence_order():
+            passed = self.execute_test(mode)
+            reports.append((mode, passed, self.last_duration_ms))
+            if not passed:
+                all_passed = False
+                if fail_fast:
+                    break
+        
+        timing.stop(timing.SPAN_SEQUENCE, start)
+        return all_passed, reports
@@ -0,0 +1,165 @@
+# Persistent failure and duration statistics of every test mode, and the adaptive sequence order.
+# Every finished test updates its mode's run count, failure count and mean duration. A fail-fast
+# sequence rejects a bad board in the least expected time when the tests run in decreasing order of
+# failure probability per second of test time, so quick checks that often fail go first.
+# The statistics are kept in a small flash file, written at most every FLUSH_AGE_MS while idle,
+# and survive reboots.
+
+import struct
+import time
+
+DEFAULT_STATS_FILE = "mode_stats.bin"
+FLUSH_AGE_MS = 60_000           # Changed statistics older than this are written on idle
+HISTORY_RUNS = 1000             # Counts are halved beyond this, so old batches of boards fade out
+
+MAGIC = b"CTMS"
+VERSION = 1
+
+# Header: magic, version, number of entries
+HEADER_FORMAT = "<4sHH"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# Entry: mode code, runs, failures, mean duration (ms)
+ENTRY_FORMAT = "<BIIf"
+ENTRY_SIZE = struct.calcsize(ENTRY_FORMAT)
+
+# Assumed durations before a mode has run once (ms), by mode name
+DEFAULT_DURATIONS_MS = {
+    'wire_test_mode': 300,
+    'current_test_mode': 50,
+    'light_test_mode': 700,
+    'co2_test_mode': 30_000,
+    'analog_test_mode': 50,
+}
+
+
+class ModeStats:
+
+    """
+    Run count, failure count and mean duration per test mode, loaded from and saved to a flash file.
+
+    The failure probability is estimated with one prior pass and one prior failure (Laplace), so a
+    mode with few runs is neither trusted to always pass nor to always fail.
+    """
+
+    def __init__(self, path=DEFAULT_STATS_FILE):
+
+        """
+        Load the statistics file, starting empty if it does not exist or is not readable.
+
+        Parameters:
+        path (str): File on the Pico filesystem.
+        """
+
+        self.path = path
+        # Mode code: [runs, failures, mean duration (ms)]
+        self.entries = {}
+        self._changed_since = None      # Tick (ms) of the oldest unsaved change
+
+        try:
+            self._load()
+
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def _load(self):
+        with open(self.path, "rb") as stats_file:
+            data = stats_file.read()
+
+        if len(data) < HEADER_SIZE:
+            raise ValueError("Truncated statistics file")
+        magic, version, count = struct.unpack_from(HEADER_FORMAT, data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Unknown statistics file format")
+        if len(data) < HEADER_SIZE + count * ENTRY_SIZE:
+            raise ValueError("Truncated statistics file")
+
+        for offset in range(HEADER_SIZE, HEADER_SIZE + count * ENTRY_SIZE, ENTRY_SIZE):
+            code, runs, failures, duration = struct.unpack_from(ENTRY_FORMAT, data, offset)
+            self.entries[code] = [runs, failures, duration]
+
+    def save(self):
+
+        """Write the statistics to flash (one small file, rewritten whole)."""
+
+        data = bytearray(HEADER_SIZE + ENTRY_SIZE * len(self.entries))
+        struct.pack_into(HEADER_FORMAT, data, 0, MAGIC, VERSION, len(self.entries))
+        offset = HEADER_SIZE
+        for code, (runs, failures, duration) in self.entries.items():
+            struct.pack_into(ENTRY_FORMAT, data, offset, code, runs, failures, duration)
+            offset += ENTRY_SIZE
+
+        with open(self.path, "wb") as stats_file:
+            stats_file.write(data)
+        self._changed_since = None
+
+    def flush_if_stale(self, max_age_ms=FLUSH_AGE_MS):
+
+        """
+        Save the statistics if they changed more than max_age_ms ago. Call it while the tester is idle.
+        """
+
+        if self._changed_since is not None and time.ticks_diff(time.ticks_ms(), self._changed_since) >= max_age_ms:
+            self.save()
+
+    def record(self, code, passed, duration_ms):
+
+        """
+        Add one finished test.
+
+        Parameters:
+        code (int): Mode code (result_store.MODE_CODES).
+        passed (bool): True if the board passed; a failure or an error counts as not passed.
+        duration_ms (int): Test duration.
+        """
+
+        entry = self.entries.get(code)
+        if entry is None:
+            entry = self.entries[code] = [0, 0, 0.0]
+
+        if entry[0] >= HISTORY_RUNS:
+            entry[0] //= 2
+            entry[1] //= 2
+
+        entry[0] += 1
+        if not passed:
+            entry[1] += 1
+        entry[2] += (duration_ms - entry[2]) / entry[0]
+
+        if self._changed_since is None:
+            self._changed_since = time.ticks_ms()
+
+    def failure_rate(self, code):
+
+        """Return the estimated probability that a board fails the mode."""
+
+        runs, failures, _ = self.entries.get(code, (0, 0, 0.0))
+        return (failures + 1) / (runs + 2)
+
+    def mean_duration(self, code, default_ms):
+
+        """Return the mean duration of the mode (ms), default_ms if it never ran."""
+
+        entry = self.entries.get(code)
+        return entry[2] if entry is not None and entry[0] else default_ms
+
+    def order(self, modes, codes):
+
+        """
+        Sort modes for a fail-fast sequence: highest failure probability per millisecond first.
+        For independent tests this order gives the least expected time until a bad board is rejected.
+
+        Parameters:
+        modes (tuple): Mode names.
+        codes (dict): Mode name to mode code.
+
+        Returns:
+        list: The mode names in test order. Ties keep the order of modes.
+        """
+
+        def rank(mode):
+            code = codes[mode]
+            duration = self.mean_duration(code, DEFAULT_DURATIONS_MS.get(mode, 1000))
+            return -self.failure_rate(code) / max(duration, 1)
+
+        return sorted(modes, key=rank)
@@ -0,0 +1,245 @@
+# Testing several boards at once behind a TCA9548A I2C multiplexer.
+# The INA226, TSL2591, SCD41 and BME280 have fixed addresses, so each board under test sits on
+# its own multiplexer channel. Every board gets its own unmodified drivers bound to its channel.
+# Tests run board by board, but the long waits (the SCD41 start-up and measurement delays) are
+# shared: all sensors are started, the station waits once, then all are read.
+
+import time
+from INA226 import INA226
+from sensor_control import SCD41, DualSensorManager, SCD41_PERIOD_S
+from event_log import log, EV_MUX_SELECT_ERROR, EV_MUX_BOARD_PASSED, EV_MUX_BOARD_FAILED
+
+MAX_BOARDS = 8
+DEFAULT_CHANNELS = tuple(range(MAX_BOARDS))
+
+SCD41_FIRST_SAMPLE_S = 5        # First periodic measurement is ready 5 s after the start command
+SCD41_READ_DELAY_S = 1          # Delay between the read command and reading the data
+SCD41_ATTEMPTS = 5              # Measurements read before the verdict is taken from the means
+
+
+class TCA9548A:
+
+    """
+    TCA9548A 8-channel I2C switch.
+
+    The selected channel is cached, so selecting the channel that is already active costs no
+    bus transaction.
+    """
+
+    DEFAULT_ADDRESS = 0x70
+
+    def __init__(self, i2c, address=DEFAULT_ADDRESS):
+
+        """
+        Parameters:
+        i2c (I2C): Bus the multiplexer is on.
+        address (int): I2C address of the multiplexer (0x70-0x77).
+        """
+
+        self.i2c = i2c
+        self.address = address
+        self.channel = None
+        self.switches = 0       # Control register writes, for diagnostics
+        self._control = bytearray(1)
+
+    def select(self, channel):
+
+        """Connect one channel to the bus (and disconnect the others)."""
+
+        if channel == self.channel:
+            return
+
+        self.channel = None
+        self._control[0] = 1 << channel
+        self.i2c.writeto(self.address, self._control)
+        self.channel = channel
+        self.switches += 1
+
+
+class MuxChannel:
+
+    """
+    I2C object of one multiplexer channel: selects the channel before each transaction.
+
+    Any other attribute is passed through to the bus.
+    """
+
+    def __init__(self, mux, channel):
+
+        """
+        Parameters:
+        mux (TCA9548A): The multiplexer.
+        channel (int): Channel of the board (0-7).
+        """
+
+        self.mux = mux
+        self.i2c = mux.i2c
+        self.channel = channel
+
+    def __getattr__(self, name):
+        return getattr(self.i2c, name)
+
+    def writeto(self, addr, buf, *args):
+        self.mux.select(self.channel)
+        return self.i2c.writeto(addr, buf, *args)
+
+    def readfrom(self, addr, nbytes, *args):
+        self.mux.select(self.channel)
+        return self.i2c.readfrom(addr, nbytes, *args)
+
+    def readfrom_into(self, addr, buf, *args):
+        self.mux.select(self.channel)
+        return self.i2c.readfrom_into(addr, buf, *args)
+
+    def writeto_mem(self, addr, memaddr, buf, **kwargs):
+        self.mux.select(self.channel)
+        return self.i2c.writeto_mem(addr, memaddr, buf, **kwargs)
+
+    def readfrom_mem(self, addr, memaddr, nbytes, **kwargs):
+        self.mux.select(self.channel)
+        return self.i2c.readfrom_mem(addr, memaddr, nbytes, **kwargs)
+
+    def readfrom_mem_into(self, addr, memaddr, buf, **kwargs):
+        self.mux.select(self.channel)
+        return self.i2c.readfrom_mem_into(addr, memaddr, buf, **kwargs)
+
+
+class BoardUnderTest:
+
+    """
+    Drivers of the board on one multiplexer channel (same attribute names as ModeSelect).
+
+    The interrupt pin is on the station, not on the board: only one board's DualSensorManager
+    registers its handler (interrupt_pin=None for the others).
+    """
+
+    def __init__(self, mux, channel, interrupt_pin=None):
+        self.channel = channel
+        self.i2c = MuxChannel(mux, channel)
+        self.current_tester = INA226(self.i2c)
+        self.co2_tester = SCD41(self.i2c)
+        self.sensor_manager = DualSensorManager(self.i2c, interrupt_pin)
+
+
+class MultiBoardTester:
+
+    """
+    Runs the sensor tests on every board connected to the multiplexer.
+
+    Each test returns one verdict per board, in the order of the channels. Consecutive phases
+    visit the boards in alternating order, so the channel selected last is reused first.
+    ModeSelect keeps one instance for the life of the program, so the drivers, the pin interrupts
+    and the selected channel are set up once; it configures the sensors again before each test.
+    """
+
+    def __init__(self, i2c, channels=DEFAULT_CHANNELS, mux_address=TCA9548A.DEFAULT_ADDRESS):
+
+        """
+        Parameters:
+        i2c (I2C): Bus the multiplexer is on.
+        channels (tuple): Multiplexer channels with a board (at most MAX_BOARDS).
+        mux_address (int): I2C address of the multiplexer.
+        """
+
+        if len(channels) > MAX_BOARDS:
+            raise ValueError("At most 8 boards")
+
+        self.mux = TCA9548A(i2c, mux_address)
+        # The first board counts the station's sensor interrupts for all of them
+        self.boards = [BoardUnderTest(self.mux, channel, None if index else DualSensorManager.DEFAULT_INTERRUPT_PIN)
+                       for index, channel in enumerate(channels)]
+        self._reverse = False
+
+    def _visit(self, indexes):
+        # Boards of a phase, starting at the end where the previous phase stopped
+        order = list(indexes)
+        if self._reverse:
+            order.reverse()
+        self._reverse = not self._reverse
+        return order
+
+    def _each(self, indexes, test, default=False):
+        verdicts = [default] * len(self.boards)
+        for index in self._visit(indexes):
+            board = self.boards[index]
+            try:
+                verdicts[index] = test(board)
+            except OSError:
+                log(EV_MUX_SELECT_ERROR, board.channel)
+        return verdicts
+
+    def _report(self, verdicts, indexes):
+        for index in indexes:
+            log(EV_MUX_BOARD_PASSED if verdicts[index] else EV_MUX_BOARD_FAILED, self.boards[index].channel)
+        return verdicts
+
+    def run_current(self, indexes=None):
+
+        """Run the INA226 test on the boards (all by default). Returns the verdicts."""
+
+        indexes = range(len(self.boards)) if indexes is None else indexes
+        return self._report(self._each(indexes, lambda board: board.current_tester.is_working()), indexes)
+
+    def run_light(self, indexes=None):
+
+        """Run the BME280/TSL2591 test on the boards (all by default). Returns the verdicts."""
+
+        indexes = range(len(self.boards)) if indexes is None else indexes
+        return self._report(self._each(indexes, lambda board: board.sensor_manager.is_working()), indexes)
+
+    def run_co2(self, indexes=None, attempts=SCD41_ATTEMPTS):
+
+        """
+        Run the SCD41 test on the boards (all by default) with shared waits.
+
+        Returns:
+        list: Verdict of every board.
+        """
+
+        indexes = range(len(self.boards)) if indexes is None else indexes
+        verdicts = [False] * len(self.boards)
+
+        started = self._each(indexes, self._start_co2)
+        pending = [index for index in indexes if started[index]]
+        if not pending:
+            return self._report(verdicts, indexes)
+
+        time.sleep(SCD41_FIRST_SAMPLE_S)
+
+        for attempt in range(attempts):
+            requested = self._each(pending, self._request_co2)
+            time.sleep(SCD41_READ_DELAY_S)
+            # None: no data yet or more measurements needed for a certain verdict
+            read = self._each([index for index in pending if requested[index]], self._collect_co2, None)
+
+            for index in pending:
+                verdicts[index] = read[index]
+            pending = [index for index in pending if read[index] is None]
+
+            if not pending or attempt == attempts - 1:
+                break
+            time.sleep(SCD41_PERIOD_S)
+
+        for index in pending:
+            verdicts[index] = self.boards[index].co2_tester.check.final()
+
+        return self._report(verdicts, indexes)
+
+    @staticmethod
+    def _start_co2(board):
+        board.co2_tester.check.reset()
+        board.co2_tester.start_periodic_measurement(wait=False)
+        return True
+
+    @staticmethod
+    def _request_co2(board):
+        board.co2_tester.request_measurement()
+        return True
+
+    @staticmethod
+    def _collect_co2(board):
+        co2_tester = board.co2_tester
+        verdict = co2_tester.check.add_sample(co2_tester.collect_measurement())
+        if co2_tester.check.count:
+            co2_tester.last_measurement = co2_tester.check.means()
+        return verdict
@@ -0,0 +1,174 @@
+# Frames of the binary command/response protocol (see host_protocol.py).
+# Shared by the firmware and the host tools, so it only depends on struct.
+#
+# Frame: SYNC (u8), payload length (u16), request id (u16), command (u8), payload, CRC (u16)
+# The CRC (CRC-16/CCITT-FALSE) covers everything after SYNC. Responses carry the request id of
+# the request, the command with RESPONSE_FLAG set and a status byte as first payload byte.
+
+import struct
+
+PROTOCOL_VERSION = 2
+
+SYNC = 0xA5
+HEADER_FORMAT = "<BHHB"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+CRC_SIZE = 2
+MAX_PAYLOAD = 512
+RESPONSE_FLAG = 0x80
+
+# Commands
+CMD_PING = 0x01             # -> version (u8)
+CMD_RUN_TEST = 0x02         # mode code (u8) -> verdict (u8), record
+CMD_RUN_SEQUENCE = 0x03     # fail fast (u8) -> verdict (u8), then verdict (u8) + record per test run
+CMD_MEASUREMENTS = 0x04     # -> record holding the last measurement of every mode
+CMD_LAST_RESULT = 0x05      # -> last record of the result store
+CMD_TIMING = 0x06           # -> span (u8), count, p50 us, p99 us, max us (u32) per span with samples
+CMD_RESET_TIMING = 0x07
+CMD_GET_SETTING = 0x08      # setting id (u8) -> value (i32)
+CMD_SET_SETTING = 0x09      # setting id (u8), value (i32)
+CMD_WIGGLE = 0x0A           # window ms (u32, <= 300 000) -> wiggle summary, then events (see cable_wiggle.py)
+CMD_EXIT = 0x0F             # Leave main() for the REPL
+
+# Response status
+STATUS_OK = 0
+STATUS_UNKNOWN_COMMAND = 1
+STATUS_BAD_REQUEST = 2
+STATUS_ERROR = 3            # Followed by the error code (i32) of the exception
+
+# Settings
+SETTING_DEBOUNCE_MS = 0
+SETTING_TIMING_ENABLED = 1
+SETTING_LOG_LEVEL = 2
+
+TIMING_FORMAT = "<BIIII"
+TIMING_SIZE = struct.calcsize(TIMING_FORMAT)
+
+# Wiggle summary: samples, late samples, events (including those that did not fit the response)
+WIGGLE_SUMMARY_FORMAT = "<III"
+WIGGLE_SUMMARY_SIZE = struct.calcsize(WIGGLE_SUMMARY_FORMAT)
+# Wiggle event: wire-out index, time since the start of the window (us), state byte
+WIGGLE_EVENT_FORMAT = "<BIB"
+WIGGLE_EVENT_SIZE = struct.calcsize(WIGGLE_EVENT_FORMAT)
+
+def crc16(data, crc=0xFFFF):
+
+    """
+    Update a CRC-16/CCITT-FALSE with data.
+
+    Parameters:
+    data (bytes): Bytes to add.
+    crc (int): CRC so far.
+
+    Returns:
+    int: Updated CRC.
+    """
+
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) & 0xFFFF if crc & 0x8000 else (crc << 1) & 0xFFFF
+    return crc
+
+
+def encode_frame(request_id, command, payload=b""):
+
+    """Return a complete frame."""
+
+    header = struct.pack(HEADER_FORMAT, SYNC, len(payload), request_id, command)
+    crc = crc16(payload, crc16(header[1:]))
+    return header + payload + struct.pack("<H", crc)
+
+
+class FrameParser:
+
+    """
+    Byte-at-a-time frame receiver with a preallocated buffer.
+
+    Garbage, oversized and corrupted frames are dropped; reception restarts at the next SYNC byte,
+    including one inside the rejected bytes. Bytes received after a complete frame are kept for the
+    next one: after feed() returned True, call next_frame() until it returns False.
+    """
+
+    def __init__(self, max_payload=MAX_PAYLOAD):
+
+        """
+        Parameters:
+        max_payload (int): Longest payload accepted.
+        """
+
+        self.buffer = bytearray(HEADER_SIZE + max_payload + CRC_SIZE)
+        self.max_payload = max_payload
+        self.length = 0
+        self.needed = HEADER_SIZE
+        self.request_id = 0
+        self.command = 0
+        self.payload = b""
+        self.dropped = 0        # Frames rejected for their length or CRC
+
+    def feed(self, byte):
+
+        """
+        Add one received byte.
+
+        Returns:
+        bool: True when a valid frame is complete; its fields are in request_id, command and payload.
+        """
+
+        if self.length == 0 and byte != SYNC:
+            return False
+
+        self.buffer[self.length] = byte
+        self.length += 1
+        return self.next_frame()
+
+    def next_frame(self):
+
+        """
+        Look for a complete frame in the bytes received so far.
+
+        Returns:
+        bool: True when a valid frame is complete, like feed().
+        """
+
+        buffer = self.buffer
+        while self.length >= HEADER_SIZE:
+            size = buffer[1] | buffer[2] << 8
+            if size > self.max_payload:
+                self._resync()
+                continue
+
+            self.needed = HEADER_SIZE + size + CRC_SIZE
+            if self.length < self.needed:
+                return False
+
+            end = self.needed - CRC_SIZE
+            received = buffer[end] | buffer[end + 1] << 8
+            if crc16(memoryview(buffer)[1:end]) != received:
+                self._resync()
+                continue
+
+            _, _, self.request_id, self.command = struct.unpack_from(HEADER_FORMAT, buffer, 0)
+            self.payload = bytes(buffer[HEADER_SIZE:end])
+            self._discard(self.needed)
+            return True
+
+        self.needed = HEADER_SIZE
+        return False
+
+    def _discard(self, count):
+        # Drop the first count bytes and move the rest to the start of the buffer
+        remaining = self.length - count
+        if remaining > 0:
+            self.buffer[:remaining] = self.buffer[count:self.length]
+        self.length = remaining if remaining > 0 else 0
+        self.needed = HEADER_SIZE
+
+    def _resync(self):
+        # The SYNC byte was noise: restart at the next SYNC byte after it, if any
+        self.dropped += 1
+        buffer = self.buffer
+        for index in range(1, self.length):
+            if buffer[index] == SYNC:
+                self._discard(index)
+                return
+        self._discard(self.length)
@@ -0,0 +1,245 @@
+# Append-only store of test results on the Pico flash.
+# Each activate_test() result is packed into a fixed-size record. Records are collected in RAM
+# and written to a pre-sized, rotating file in block-sized batches to limit flash wear and
+# write latency. HOST/decode_results.py turns the file into CSV or NumPy arrays.
+
+import struct
+import time
+
+DEFAULT_RESULT_FILE = "results.bin"
+DEFAULT_CAPACITY = 1024         # Records kept before the oldest ones are overwritten (33 KB)
+BATCH_SIZE = 512                # Bytes written to flash at once
+FLUSH_AGE_MS = 60_000           # Pending records older than this are written on idle
+
+MAGIC = b"CTRS"
+VERSION = 3
+
+# Header: magic, version, record size, capacity, next sequence number
+HEADER_FORMAT = "<4sHHII"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# Record: sequence, mode, verdict, multiplexer channel of the board, cable matrix, bus voltage (mV),
+# current (0.01 mA), CO2 (ppm), SCD41 temperature (0.01 C), SCD41 humidity (0.01 %RH),
+# illuminance (0.1 lux), duration (ms), board timestamp (s)
+RECORD_FORMAT = "<IBBB6sHhHhHiHI"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+
+RECORD_FIELDS = ("seq", "mode", "verdict", "channel", "cable_matrix", "bus_mv", "current_ma100", "co2_ppm",
+                 "temperature_c100", "humidity_c100", "lux_d10", "duration_ms", "timestamp")
+
+# Mode codes
+MODE_NONE = 0
+MODE_WIRE = 1
+MODE_CURRENT = 2
+MODE_CO2 = 3
+MODE_LIGHT = 4
+MODE_ANALOG = 5
+
+MODE_CODES = {
+    'wire_test_mode': MODE_WIRE,
+    'current_test_mode': MODE_CURRENT,
+    'co2_test_mode': MODE_CO2,
+    'light_test_mode': MODE_LIGHT,
+    'analog_test_mode': MODE_ANALOG,
+}
+
+# Verdict codes
+VERDICT_FAIL = 0
+VERDICT_PASS = 1
+VERDICT_ERROR = 2
+
+# Values stored when a measurement was not taken
+MISSING_U16 = 0xFFFF
+MISSING_I16 = -0x8000
+MISSING_I32 = -0x80000000
+NO_CABLE_MATRIX = b"\xff" * 6
+NO_CHANNEL = 0xFF               # Board connected directly, without the multiplexer
+
+
+def _clamp(value, low, high, missing):
+    if value is None:
+        return missing
+    value = int(value)
+    return low if value < low else high if value > high else value
+
+
+def pack_record(buffer, offset, seq, mode, verdict, cable_matrix=None, bus_voltage=None, current=None,
+                co2=None, temperature=None, humidity=None, lux=None, duration_ms=0, channel=None):
+
+    """
+    Pack one record into buffer at offset. The arguments are those of ResultStore.append().
+    """
+
+    struct.pack_into(
+        RECORD_FORMAT, buffer, offset,
+        seq, mode, verdict,
+        NO_CHANNEL if channel is None else channel,
+        NO_CABLE_MATRIX if cable_matrix is None else bytes(cable_matrix),
+        _clamp(None if bus_voltage is None else bus_voltage * 1000, 0, 0xFFFE, MISSING_U16),
+        _clamp(None if current is None else current * 100_000, -0x7FFF, 0x7FFF, MISSING_I16),
+        _clamp(co2, 0, 0xFFFE, MISSING_U16),
+        _clamp(None if temperature is None else temperature * 100, -0x7FFF, 0x7FFF, MISSING_I16),
+        _clamp(None if humidity is None else humidity * 100, 0, 0xFFFE, MISSING_U16),
+        _clamp(None if lux is None else lux * 10, -0x7FFFFFFF, 0x7FFFFFFF, MISSING_I32),
+        _clamp(duration_ms, 0, 0xFFFF, MISSING_U16),
+        int(time.time()) & 0xFFFFFFFF)
+
+
+class ResultStore:
+
+    """
+    Rotating, append-only file of packed test result records.
+
+    The file holds a header and a fixed number of record slots, so it is created with its
+    final size and never grows. Record n goes to slot n % capacity.
+    """
+
+    def __init__(self, path=DEFAULT_RESULT_FILE, capacity=DEFAULT_CAPACITY):
+
+        """
+        Open the result file, creating a pre-sized one if it does not exist.
+
+        Parameters:
+        path (str): File on the Pico filesystem.
+        capacity (int): Number of record slots, only used when the file is created.
+        """
+
+        self.path = path
+        self.capacity = capacity
+        self.next_seq = 0
+
+        self._batch = bytearray(BATCH_SIZE)
+        self._batch_records = BATCH_SIZE // RECORD_SIZE
+        self._pending = 0           # Records in the batch buffer
+        self._pending_since = 0     # Tick (ms) of the oldest pending record
+        self._header = bytearray(HEADER_SIZE)
+
+        try:
+            self._load_header()
+
+        except (OSError, ValueError):
+            self._create()
+
+    def _load_header(self):
+        with open(self.path, "rb") as result_file:
+            header = result_file.read(HEADER_SIZE)
+        if len(header) != HEADER_SIZE:
+            raise ValueError("Truncated result file")
+
+        magic, version, record_size, capacity, next_seq = struct.unpack(HEADER_FORMAT, header)
+
+        if magic != MAGIC or version != VERSION or record_size != RECORD_SIZE:
+            raise ValueError("Unknown result file format")
+
+        self.capacity = capacity
+        self.next_seq = next_seq
+
+    def _create(self):
+        empty = bytes(BATCH_SIZE)
+        remaining = self.capacity * RECORD_SIZE
+
+        with open(self.path, "wb") as result_file:
+            result_file.write(self._pack_header())
+            while remaining > 0:
+                chunk = BATCH_SIZE if remaining > BATCH_SIZE else remaining
+                result_file.write(empty[:chunk])
+                remaining -= chunk
+
+    def _pack_header(self):
+        struct.pack_into(HEADER_FORMAT, self._header, 0, MAGIC, VERSION, RECORD_SIZE,
+                         self.capacity, self.next_seq)
+        return self._header
+
+    def append(self, mode, verdict, cable_matrix=None, bus_voltage=None, current=None, co2=None,
+               temperature=None, humidity=None, lux=None, duration_ms=0, channel=None):
+
+        """
+        Add one test result. The record is written to flash when the batch is full or on flush().
+
+        Parameters:
+        mode (int): One of the MODE_* codes.
+        verdict (int): One of the VERDICT_* codes.
+        cable_matrix (bytes): Per wire-in pin, bit mask of wire-out pins read high.
+        bus_voltage (float): INA226 bus voltage in volts.
+        current (float): INA226 current in amperes.
+        co2 (int): SCD41 CO2 concentration in ppm.
+        temperature (float): SCD41 temperature in °C.
+        humidity (float): SCD41 relative humidity in %.
+        lux (float): TSL2591 illuminance in lux.
+        duration_ms (int): Test duration in milliseconds.
+        channel (int): Multiplexer channel of the board, None for a board without multiplexer.
+
+        Returns:
+        int: Sequence number of the record.
+        """
+
+        seq = self.next_seq
+        offset = self._pending * RECORD_SIZE
+
+        pack_record(self._batch, offset, seq, mode, verdict, cable_matrix, bus_voltage, current, co2,
+                    temperature, humidity, lux, duration_ms, channel)
+
+        if self._pending == 0:
+            self._pending_since = time.ticks_ms()
+        self._pending += 1
+        self.next_seq = seq + 1
+
+        if self._pending == self._batch_records:
+            self.flush()
+
+        return seq
+
+    def last_record(self):
+
+        """Return the packed bytes of the most recent record, or None if nothing was stored."""
+
+        if self._pending:
+            offset = (self._pending - 1) * RECORD_SIZE
+            return bytes(self._batch[offset:offset + RECORD_SIZE])
+
+        if self.next_seq == 0:
+            return None
+
+        slot = (self.next_seq - 1) % self.capacity
+        with open(self.path, "rb") as result_file:
+            result_file.seek(HEADER_SIZE + slot * RECORD_SIZE)
+            return result_file.read(RECORD_SIZE)
+
+    def flush(self):
+
+        """Write the pending records and the header to flash."""
+
+        if not self._pending:
+            return
+
+        first_seq = self.next_seq - self._pending
+        slot = first_seq % self.capacity
+        batch = memoryview(self._batch)
+
+        # "r+b" keeps the pre-sized file and writes in place
+        with open(self.path, "r+b") as result_file:
+            written = 0
+            while written < self._pending:
+                count = self._pending - written
+                if count > self.capacity - slot:
+                    count = self.capacity - slot      # Wrap around at the end of the file
+
+                result_file.seek(HEADER_SIZE + slot * RECORD_SIZE)
+                result_file.write(batch[written * RECORD_SIZE:(written + count) * RECORD_SIZE])
+                written += count
+                slot = 0
+
+            result_file.seek(0)
+            result_file.write(self._pack_header())
+
+        self._pending = 0
+
+    def flush_if_stale(self, max_age_ms=FLUSH_AGE_MS):
+
+        """
+        Flush the pending records if the oldest one has waited longer than max_age_ms.
+        Call it while the tester is idle.
+        """
+
+        if self._pending and time.ticks_diff(time.ticks_ms(), self._pending_since) >= max_age_ms:
+            self.flush()
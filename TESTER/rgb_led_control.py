@@ -14,6 +14,37 @@ BLUE.freq(1000)
 duty = 0
 step = 1024  # Step size for changing the duty cycle
 
+# Set by dual_core.CoreWorker: the animation then runs on core 1 and animate_led() only posts the colour
+worker = None
+
+# Colour of the running animation and its timer, created once and re-initialized by animate_led()
+color = (0.0, 0.0, 0.0)
+rgb_led_timer = Timer()
+
+
+def fade_step(red_intensity, green_intensity, blue_intensity):
+    
+    """
+    Advance the fade animation by one step (called 50 times per second).
+    
+    Parameters:
+    red_intensity (float): Scaling factor for red brightness (0 to 1).
+    green_intensity (float): Scaling factor for green brightness (0 to 1).
+    blue_intensity (float): Scaling factor for blue brightness (0 to 1).
+    """
+    
+    global duty, step
+    
+    # Update the duty cycle for animation
+    duty += step
+    if duty >= 65535 or duty <= 0:
+        step = -step
+
+    # Apply the scaled duty cycle to each color channel
+    RED.duty_u16(int(duty * red_intensity))
+    GREEN.duty_u16(int(duty * green_intensity))
+    BLUE.duty_u16(int(duty * blue_intensity))
+
 
 # Intesity values are float
 def animate_led(red_intensity, green_intensity, blue_intensity):
@@ -25,33 +56,34 @@ def animate_led(red_intensity, green_intensity, blue_intensity):
     red_intensity (float): Scaling factor for red brightness (0 to 1).
     green_intensity (float): Scaling factor for green brightness (0 to 1).
     blue_intensity (float): Scaling factor for blue brightness (0 to 1).
+    
+    Returns:
+    Timer: The animation timer, None when core 1 animates the LED.
     """
 
-    def update_pwm(timer):
-        global duty, step
-        
-        # Update the duty cycle for animation
-        duty += step
-        if duty >= 65535 or duty <= 0:
-            step = -step
+    global color
 
-        # Apply the scaled duty cycle to each color channel
-        RED.duty_u16(int(duty * red_intensity))
-        GREEN.duty_u16(int(duty * green_intensity))
-        BLUE.duty_u16(int(duty * blue_intensity))
+    if worker is not None:
+        worker.set_color(red_intensity, green_intensity, blue_intensity)
+        return None
 
-    # Create and start a new timer for animation
-    rgb_led_timer = Timer()
-    rgb_led_timer.init(freq=50, mode=Timer.PERIODIC, callback=update_pwm)
+    # One timer for every call: the main loop calls this on every idle pass
+    color = (red_intensity, green_intensity, blue_intensity)
+    rgb_led_timer.init(freq=50, mode=Timer.PERIODIC, callback=_update_pwm)
     
     return rgb_led_timer  # Return the timer to allow stopping it later
-        
-        
-
-
-
-
 
 
+def _update_pwm(timer):
+    red_intensity, green_intensity, blue_intensity = color
+    fade_step(red_intensity, green_intensity, blue_intensity)
 
 
+def stop_led():
+    
+    """Stop the animation and turn the RGB LED off (animate_led() starts it again)."""
+    
+    rgb_led_timer.deinit()
+    RED.duty_u16(0)
+    GREEN.duty_u16(0)
+    BLUE.duty_u16(0)
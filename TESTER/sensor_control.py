@@ -1,7 +1,35 @@
 from machine import Pin, I2C
+from micropython import const
 import time
 import bme280
+import sensor_math
+import timing
 from TSL2591 import TSL2591
+from sequential_check import SequentialCheck, SpecLimit
+from event_log import (LOG, log, error_code, EV_DUAL_INIT_ERROR, EV_DUAL_INTERRUPT, EV_BME280_TEMPERATURE,
+                       EV_BME280_PRESSURE, EV_BME280_HUMIDITY, EV_BME280_ERROR, EV_TSL2591_FULL,
+                       EV_TSL2591_IR, EV_TSL2591_VISIBLE, EV_TSL2591_ERROR, EV_BME280_NOT_WORKING,
+                       EV_TSL2591_NOT_WORKING, EV_DUAL_OK, EV_SCD41_CREATE, EV_SCD41_SEND,
+                       EV_SCD41_SEND_RETRY, EV_SCD41_SEND_FAILED, EV_SCD41_READ, EV_SCD41_READ_ERROR,
+                       EV_SCD41_START, EV_SCD41_STOP, EV_SCD41_MEASURE, EV_SCD41_CO2,
+                       EV_SCD41_TEMPERATURE, EV_SCD41_HUMIDITY, EV_SCD41_DECODE_ERROR,
+                       EV_SCD41_READ_RETRY, EV_SCD41_READ_FAILED, EV_SCD41_BROKEN, EV_SCD41_OK)
+
+# Spec limits and sensor noise (datasheet accuracy) for the sequential checks of is_working()
+# BME280: temperature (C), pressure (atm), humidity (%)
+BME280_LIMITS = (SpecLimit(-10, 50, 1.0), SpecLimit(0.5, 1.1, 0.001), SpecLimit(0, 100, 3.0))
+# TSL2591: full spectrum and infrared counts must not be saturated, visible is only required
+TSL2591_LIMITS = (SpecLimit(0, sensor_math.TSL2591_SATURATED - 1, 0),
+                  SpecLimit(0, sensor_math.TSL2591_SATURATED - 1, 0), None)
+# SCD41: CO2 (ppm), temperature (C), humidity (%RH). Fresh air is about 420 ppm; a first reading
+# is certain 3 x 50 ppm inside a limit, so the low limit is 250 ppm and a good sensor passes at once
+SCD41_LIMITS = (SpecLimit(250, 5000, 50), SpecLimit(-10, 60, 0.8), SpecLimit(0, 100, 6.0))
+SCD41_PERIOD_S = 5          # Interval of the periodic measurements
+
+# SCD41 commands (from the datasheet), folded into the bytecode by the compiler
+_SCD41_START_MEASUREMENT = const(0x21B1)
+_SCD41_STOP_MEASUREMENT = const(0x3F86)
+_SCD41_READ_MEASUREMENT = const(0xEC05)
 
 class DualSensorManager:
     
@@ -24,39 +52,59 @@ class DualSensorManager:
 
         Parameters:
         i2c (I2C): The shared I2C object.
-        interrupt_pin (int): GPIO pin number used for interrupts. Defaults to DEFAULT_INTERRUPT_PIN.
+        interrupt_pin (int): GPIO pin number used for interrupts. Defaults to DEFAULT_INTERRUPT_PIN;
+                             None if another manager already handles the pin (multiplexed boards).
         """
         
         self.i2c = i2c
+        self.setup()
+
+        # Illuminance (lux) of the last TSL2591 reading
+        self.last_lux = None
+        
+        self.bme_check = SequentialCheck(BME280_LIMITS)
+        self.tsl_check = SequentialCheck(TSL2591_LIMITS)
+
+        # Initialize the interrupt pin; the handler only counts, is_working() logs the count
+        self.interrupts = 0
+        self.interrupt_pin_id = interrupt_pin
+        self.interrupt_pin = None
+        if interrupt_pin is not None:
+            self.interrupt_pin = Pin(interrupt_pin, Pin.IN, Pin.PULL_UP)
+            self.interrupt_pin.irq(trigger=Pin.IRQ_FALLING, handler=self.interrupt_handler)
+
+    def setup(self):
+        
+        """
+        Configure the TSL2591 and read the BME280 calibration. Both sensors are on the board under
+        test, so call it again after the board was swapped.
+        """
         
         try:
             self.tsl = TSL2591(self.i2c)
             self.bme = bme280.BME280(i2c = self.i2c)
             
         except Exception as e:
-            print(f"Error initializing sensors: {e}")
+            log(EV_DUAL_INIT_ERROR, error_code(e))
             self.tsl = None
             self.bme = None
 
-        # Initialize the interrupt pin
-        self.interrupt_pin = Pin(interrupt_pin, Pin.IN, Pin.PULL_UP)
-        self.interrupt_pin.irq(trigger=Pin.IRQ_FALLING, handler=self.interrupt_handler)
-
     def interrupt_handler(self, pin):
         
         """
-        Handle the interrupt event triggered by the interrupt pin.
+        Count the interrupt events triggered by the interrupt pin. Runs in the pin interrupt, so it
+        does not call log(): in dual-core mode the interrupted code may hold the log lock.
 
         Parameters:
         pin (Pin): The pin that triggered the interrupt.
         """
         
-        print("Interrupt triggered on pin:", pin)
+        self.interrupts += 1
         
     def read_bme280(self):
         
         """
-        Read data from the BME280 sensor and print it.
+        Read data from the BME280 sensor and log it.
 
         Returns:
         tuple: Temperature (Celsius), Pressure (atm), Humidity (%). 
@@ -64,79 +112,87 @@ class DualSensorManager:
         """
         
         try:
+            start = timing.start()
             temperature, pressure, humidity = self.bme.read_compensated_data()
-            temp_c = temperature / 100.0
-            pressure_atm = pressure / 101_325
-            humidity_percent = humidity / 1024.0
+            timing.stop(timing.SPAN_BME280_READ, start)
+            temp_c, pressure_atm, humidity_percent = sensor_math.bme280_scale(temperature, pressure, humidity)
             
-            print("\n-----------Measurement of BME280--------------")
-            print('Temperature: {:.2f} C'.format(temp_c))
-            print('Pressure: {:.2f} atm'.format(pressure_atm))
-            print('Humidity: {:.2f} %\n'.format(humidity_percent))
+            log(EV_BME280_TEMPERATURE, int(temp_c * 100))
+            log(EV_BME280_PRESSURE, int(pressure_atm * 1000))
+            log(EV_BME280_HUMIDITY, int(humidity_percent * 100))
             return temp_c, pressure_atm, humidity_percent
         
         except Exception as e:
-            print('An error occurred:', e)
+            log(EV_BME280_ERROR, error_code(e))
             return None, None, None
 
     def read_tsl2591(self):
         
         """
-        Read luminosity data from the TSL2591 sensor and print it.
+        Read luminosity data from the TSL2591 sensor and log it.
 
         Returns:
         tuple: Full spectrum luminosity (Lux), Infrared luminosity (Lux), 
                Visible light luminosity (Lux). Returns (None, None, None) if an error occurs.
         """
         
+        self.last_lux = None
+        
         try:
+            start = timing.start()
             full = self.tsl.get_luminosity(0)
             ir = self.tsl.get_luminosity(1)
             visible = self.tsl.get_luminosity(2)
+            timing.stop(timing.SPAN_TSL2591_READ, start)
+            self.last_lux = self.tsl.calculate_lux(full, ir)
             
-            print("\n-----------Measurement of TSL2591--------------")
-            print("Full Spectrum Lux: {:.2f}".format(full))
-            print("Infrared Lux: {:.2f}".format(ir))
-            print("Visible Lux: {:.2f}".format(visible))
+            log(EV_TSL2591_FULL, full)
+            log(EV_TSL2591_IR, ir)
+            log(EV_TSL2591_VISIBLE, visible)
             return full, ir, visible
         
         except Exception as e:
-            print('Error:', e)
+            log(EV_TSL2591_ERROR, error_code(e))
             return None, None, None
 
     def is_working(self):
         
         """
-        Check if the sensors are working based on the provided data.
+        Check if the sensors are working and their readings are within their spec limits.
 
-        Reads data from BME280 and TSL2591 sensors, then checks if both sensors are working.
+        Reads the BME280 and TSL2591 until the verdict of each is certain (see sequential_check.py);
+        a sensor already decided is not read again.
 
         Returns:
-        bool: True if both sensors are working (i.e., data is not None), False otherwise.
+        bool: True if both sensors work and read within their limits, False otherwise.
         """
         
-        # Read sensor data
-        bme280_data = self.read_bme280()
-        tsl2591_data = self.read_tsl2591()
-
-        temp_c, pressure_atm, humidity_percent = bme280_data
-        full, ir, visible = tsl2591_data
-        working = True
+        interrupts = self.interrupts
+        if interrupts:
+            self.interrupts = 0
+            log(EV_DUAL_INTERRUPT, interrupts)
+        
+        self.bme_check.reset()
+        self.tsl_check.reset()
+        bme_working = None
+        tsl_working = None
+        
+        while bme_working is None or tsl_working is None:
+            if bme_working is None:
+                bme_working = self.bme_check.add(self.read_bme280())
+            if tsl_working is None:
+                tsl_working = self.tsl_check.add(self.read_tsl2591())
 
-        # Check BME280 sensor data
-        if temp_c is None or pressure_atm is None or humidity_percent is None:
-            print("\n------- BME280 SENSOR IS NOT WORKING ---------")
-            working = False
+        if not bme_working:
+            log(EV_BME280_NOT_WORKING)
 
-        # Check TSL2591 sensor data
-        if full is None or ir is None or visible is None:
-            print("------- TSL2591 SENSOR IS NOT WORKING ---------\n")
-            working = False
+        if not tsl_working:
+            log(EV_TSL2591_NOT_WORKING)
             
-        else:
-            print("------- AMAZING BME280_TSL2591 SENSOR ---------\n")
+        if bme_working and tsl_working:
+            log(EV_DUAL_OK)
 
-        return working
+        return bme_working and tsl_working
 
 
 
@@ -148,11 +204,6 @@ class SCD41:
     # Default configuration
     DEFAULT_ADDRESS = 0x62
 
-    # Sensor commands (from the datasheet)
-    START_MEASUREMENT_COMMAND = 0x21B1
-    STOP_MEASUREMENT_COMMAND = 0x3F86
-    READ_COMMAND = 0xEC05
-
     def __init__(self, i2c, address=DEFAULT_ADDRESS):
         
         """
@@ -163,9 +214,14 @@ class SCD41:
         address (int): I2C address of the SCD41 sensor.
         """
         
-        print("------------SCD41 OBJECT CREATION PROCESS-----------------")
+        log(EV_SCD41_CREATE)
         self.i2c = i2c
         self.address = address
+        
+        # CO2, temperature and humidity of the last reading (averaged by is_working())
+        self.last_measurement = (None, None, None)
+        self.check = SequentialCheck(SCD41_LIMITS)
+        self._command = bytearray(2)
 
     def send_command(self, command):
         
@@ -176,9 +232,11 @@ class SCD41:
         command (int): The 16-bit command to be sent to the sensor.
         """
         
-        cmd = bytearray([command >> 8, command & 0xFF])
+        cmd = self._command
+        cmd[0] = command >> 8
+        cmd[1] = command & 0xFF
         
-        print("------------DATA SEND PROCESS-----------------")
+        log(EV_SCD41_SEND, command)
         
         for attempt in range(3):
             try:
@@ -186,10 +244,10 @@ class SCD41:
                 return
             
             except OSError as e:
-                print(f"Attempt {attempt + 1}: Error sending command {hex(command)}: {e}")
+                log(EV_SCD41_SEND_RETRY, attempt + 1)
                 time.sleep(0.1)  # Increased delay for retries
                 
-        print(f"Failed to send command {hex(command)} after 3 retries")
+        log(EV_SCD41_SEND_FAILED, command)
 
     def read_data(self, length):
         
@@ -203,80 +261,127 @@ class SCD41:
         bytes: Data read from the sensor or None if an error occurs.
         """
         
-        print("------------DATA READ PROCESS-----------------")
+        log(EV_SCD41_READ, length)
         
         try:
             return self.i2c.readfrom(self.address, length)
         except OSError as e:
             
-            print(f"Error reading data: {e}")
+            log(EV_SCD41_READ_ERROR, error_code(e))
             return None
 
-    def start_periodic_measurement(self):
+    def start_periodic_measurement(self, wait=True):
         
-        """Start periodic measurement with a 5-second signal update interval."""
+        """
+        Start periodic measurement with a 5-second signal update interval.
+
+        Parameters:
+        wait (bool): Wait for the first measurement. Pass False to start several sensors and
+                     wait once for all of them.
+        """
         
-        print("------------STARTING PERIODIC MEASUREMENT-----------------")
-        self.send_command(self.START_MEASUREMENT_COMMAND)
-        time.sleep(5)  # Wait for command to execute
+        log(EV_SCD41_START)
+        start = timing.start()
+        self.send_command(_SCD41_START_MEASUREMENT)
+        if wait:
+            time.sleep(5)  # Wait for command to execute
+        timing.stop(timing.SPAN_SCD41_START, start)
 
     def stop_periodic_measurement(self):
         
         """Stop periodic measurement to save power or reconfigure the sensor."""
         
-        print("------------STOPPING PERIODIC MEASUREMENT-----------------")
-        self.send_command(self.STOP_MEASUREMENT_COMMAND)
+        log(EV_SCD41_STOP)
+        self.send_command(_SCD41_STOP_MEASUREMENT)
         time.sleep(0.5)  # Wait for command to execute
 
+    def request_measurement(self):
+        
+        """Send the read command. The data can be collected with collect_measurement() 1 s later."""
+        
+        log(EV_SCD41_MEASURE)
+        self.last_measurement = (None, None, None)
+        self.send_command(_SCD41_READ_MEASUREMENT)
+
+    def collect_measurement(self):
+        
+        """
+        Read and decode the measurement requested with request_measurement().
+
+        Returns:
+        tuple: CO2 (ppm), temperature (Celsius), humidity (%); (None, None, None) if the data
+               could not be decoded. None if no data was read, the read can be retried.
+        """
+        
+        data = self.read_data(9)
+        if not data or len(data) != 9:
+            return None
+        
+        try:
+            co2, temperature, humidity = sensor_math.scd41_measurement(data)
+            self.last_measurement = (co2, temperature, humidity)
+            log(EV_SCD41_CO2, co2)
+            log(EV_SCD41_TEMPERATURE, int(temperature * 100))
+            log(EV_SCD41_HUMIDITY, int(humidity * 100))
+            return co2, temperature, humidity
+        
+        except IndexError as e:
+            log(EV_SCD41_DECODE_ERROR)
+            return None, None, None
+
     def read_measurement(self):
         
         """Read CO2, temperature, and humidity measurements from the sensor."""
         
-        print("------------READING MEASUREMENT PROCESS-----------------")
-        self.send_command(self.READ_COMMAND)
+        self.request_measurement()
         time.sleep(1)  # Wait for command execution time
 
         for attempt in range(3):
-            data = self.read_data(9)
-            if data and len(data) == 9:
-                try:
-                    co2 = (data[0] << 8) | data[1]
-                    temperature_raw = (data[3] << 8) | data[4]
-                    temperature = -45 + 175 * temperature_raw / 65536
-                    humidity_raw = (data[6] << 8) | data[7]
-                    humidity = 100 * humidity_raw / 65536
-                    print(f"\nCO2: {co2} ppm, \nTEMP: {temperature:.2f} °C, \nHUM: {humidity:.2f} %RH")
-                    return co2, temperature, humidity
-                
-                except IndexError as e:
-                    print(f"Error processing data: {e}")
-                    return None, None, None
-            else:
-                print(f"Attempt {attempt + 1}: Failed to read measurement data")
-                time.sleep(0.5)  # Slightly longer delay between attempts
+            measurement = self.collect_measurement()
+            if measurement is not None:
+                return measurement
+            
+            log(EV_SCD41_READ_RETRY, attempt + 1)
+            time.sleep(0.5)  # Slightly longer delay between attempts
 
-        print("Failed to read measurement data after multiple attempts")
+        log(EV_SCD41_READ_FAILED)
         return None, None, None
 
     def is_working(self):
         
         """
-        Check if the sensor is working based on the sensor's measurements.
+        Check if the sensor is working and measures within its spec limits.
+
+        Reads the periodic measurements until the verdict is certain (see sequential_check.py),
+        at most check.max_samples of them; a measurement that cannot be read is retried at the
+        next period. Periodic measurement must have been started.
 
         Returns:
-        bool: True if all sensor data is valid, False otherwise.
+        bool: True if the sensor works and its measurements are within their limits.
         """
-    
-        co2, temp, humidity = self.read_measurement()
-        time.sleep(1)
         
-        if None in [co2, temp, humidity]:
+        self.check.reset()
+        verdict = None
+        
+        for attempt in range(self.check.max_samples):
+            if attempt:
+                time.sleep(SCD41_PERIOD_S)
             
-            print("\n------------- SCD41 CO2 SENSOR IS BROKEN -----------------\n")
-            return False
+            start = timing.start()
+            measurement = self.read_measurement()
+            timing.stop(timing.SPAN_SCD41_MEASUREMENT, start)
+            
+            verdict = self.check.add_sample(measurement)
+            if verdict is not None:
+                break
+        
+        if verdict is None:
+            verdict = self.check.final()
+        if self.check.count:
+            self.last_measurement = self.check.means()
         
-        print("\n------- AMAZING SCD41 SENSOR ---------\n")
-        return True
+        log(EV_SCD41_OK if verdict else EV_SCD41_BROKEN)
+        return verdict
 
     
 
@@ -302,6 +407,7 @@ def main():
                         print("BME280 and TSL2591 sensors are working properly.")
                     else:
                         print("BME280 and TSL2591 sensors are not working.")
+                    LOG.drain()
                     
                     count += 1  # Increment count
                     time.sleep(5)  # Delay before the next check
@@ -320,6 +426,7 @@ def main():
                         print("SCD41 sensor is working properly.")
                     else:
                         print("SCD41 sensor is not working.")
+                    LOG.drain()
                     
                     count += 1  # Increment count
                     time.sleep(5)  # Delay before the next check
@@ -0,0 +1,248 @@
+# Numeric kernel for the per-sample sensor conversions.
+# Integer routines are viper-compiled and the float wrappers are native-compiled on the Pico.
+# The decorators must be written literally as @micropython.viper/@micropython.native: the compiler
+# only recognises them in that form. On a host, the simulator's stand-in "micropython" module
+# (HOST/tester_sim/micropython_shim.py) turns them into plain functions.
+# Every kernel has a plain Python reference (ref_*) which must give identical results.
+
+import micropython
+
+
+# TSL2591 lux coefficients scaled by 100 (LUX_COEFB = 1.64, LUX_COEFC = 0.59, LUX_COEFD = 0.86)
+LUX_COEFB_X100 = 164
+LUX_COEFC_X100 = 59
+LUX_COEFD_X100 = 86
+LUX_DF = 408                     # Lux conversion factor
+TSL2591_SATURATED = 0xFFFF       # Channel value when the ADC overflows
+
+# BME280 pressure reference (Pa per atm)
+PASCAL_PER_ATM = 101_325
+
+
+# ---------------------------------------------------------------------------
+# Integer kernels (viper on the Pico)
+#
+# Viper ints are 32-bit machine words, so every intermediate value below is kept
+# under 2**31 for 16-bit register inputs.
+# ---------------------------------------------------------------------------
+
+@micropython.viper
+def tsl2591_decilux(full: int, ir: int, atime_ms: int, again: int) -> int:
+
+    """
+    Calculate the illuminance in 0.1 lux units from the two TSL2591 channels.
+
+    Parameters:
+    full (int): Full spectrum channel count (CH0).
+    ir (int): Infrared channel count (CH1).
+    atime_ms (int): Integration time in milliseconds.
+    again (int): Analog gain factor.
+
+    Returns:
+    int: Illuminance in 0.1 lux, 0 if a channel is saturated.
+    """
+
+    if full == 0xFFFF or ir == 0xFFFF:
+        return 0
+
+    # lux = max(lux1, lux2) where both share the same counts-per-lux divisor,
+    # so the larger numerator is picked before scaling to keep the range small
+    q1 = 100 * full - 164 * ir
+    q2 = 59 * full - 86 * ir
+    q = q1 if q1 > q2 else q2
+
+    # decilux = q * 408 / (10 * atime * again) = q * 204 / (5 * atime * again)
+    return (q * 204) // (5 * atime_ms * again)
+
+
+@micropython.viper
+def scd41_centidegrees(raw: int) -> int:
+
+    """Convert a raw SCD41 temperature word to 0.01 °C (T = -45 + 175 * raw / 2^16)."""
+
+    return (17500 * raw - 294912000) >> 16      # 294912000 = 4500 * 65536
+
+
+@micropython.viper
+def scd41_centipercent(raw: int) -> int:
+
+    """Convert a raw SCD41 humidity word to 0.01 %RH (RH = 100 * raw / 2^16)."""
+
+    return (10000 * raw) >> 16
+
+
+@micropython.viper
+def ina226_bus_microvolts(raw: int) -> int:
+
+    """Convert the INA226 bus voltage register (1.25 mV LSB) to microvolts."""
+
+    return raw * 1250
+
+
+@micropython.viper
+def ina226_shunt_nanovolts(raw: int) -> int:
+
+    """Convert the signed INA226 shunt voltage register (2.5 uV LSB) to nanovolts."""
+
+    if raw & 0x8000:
+        raw -= 0x10000
+    return raw * 2500
+
+
+@micropython.viper
+def ina226_signed(raw: int) -> int:
+
+    """Sign-extend a 16-bit two's complement INA226 register value (current register)."""
+
+    if raw & 0x8000:
+        return raw - 0x10000
+    return raw
+
+
+@micropython.viper
+def ina226_power_microwatts(raw: int) -> int:
+
+    """
+    Convert the INA226 power register to microwatts. The LSB is 25 current LSBs: 156.25 uW with
+    the default calibration (0x2000, 0.1 ohm shunt, 6.25 uA current LSB).
+    """
+
+    return (raw * 625) >> 2
+
+
+@micropython.viper
+def bme280_centipercent(raw: int) -> int:
+
+    """Convert a Q22.10 BME280 humidity value to 0.01 %RH."""
+
+    return (raw * 100) >> 10
+
+
+@micropython.viper
+def bme280_milliatm(pascal: int) -> int:
+
+    """
+    Convert a BME280 pressure in whole Pa to 0.001 atm. The sensor range ends at 110 kPa, so the
+    product stays below 2^31; shift a Q24.8 value of the library right by 8 first.
+    """
+
+    return (pascal * 1000) // 101325
+
+
+# ---------------------------------------------------------------------------
+# Float wrappers (native on the Pico) used by the drivers
+# ---------------------------------------------------------------------------
+
+@micropython.native
+def tsl2591_lux(full, ir, atime_ms, again):
+
+    """Return the TSL2591 illuminance in lux with 0.1 lux resolution."""
+
+    return tsl2591_decilux(full, ir, atime_ms, again) / 10
+
+
+@micropython.native
+def scd41_measurement(data):
+
+    """
+    Decode a 9-byte SCD41 measurement frame.
+
+    Parameters:
+    data (bytes): Raw frame (word, CRC, word, CRC, word, CRC).
+
+    Returns:
+    tuple: CO2 (ppm), temperature (°C), humidity (%RH).
+    """
+
+    co2 = (data[0] << 8) | data[1]
+    temperature = scd41_centidegrees((data[3] << 8) | data[4]) / 100
+    humidity = scd41_centipercent((data[6] << 8) | data[7]) / 100
+    return co2, temperature, humidity
+
+
+@micropython.native
+def ina226_bus_volts(raw):
+
+    """Return the INA226 bus voltage in volts."""
+
+    return ina226_bus_microvolts(raw) / 1_000_000
+
+
+@micropython.native
+def ina226_shunt_millivolts(raw):
+
+    """Return the INA226 shunt voltage in millivolts."""
+
+    return ina226_shunt_nanovolts(raw) / 1_000_000
+
+
+@micropython.native
+def ina226_power_watts(raw):
+
+    """Return the INA226 power in watts."""
+
+    return ina226_power_microwatts(raw) / 1_000_000
+
+
+@micropython.native
+def bme280_scale(temperature, pressure, humidity):
+
+    """
+    Scale compensated BME280 values to engineering units.
+
+    Parameters:
+    temperature (int): Temperature in 0.01 °C.
+    pressure (int): Pressure in Q24.8 Pa (Pa * 256), as read_compensated_data() returns it.
+    humidity (int): Humidity in Q22.10 %RH.
+
+    Returns:
+    tuple: Temperature (Celsius), Pressure (atm), Humidity (%).
+    """
+
+    return (temperature / 100,
+            bme280_milliatm(int(pressure) >> 8) / 1000,
+            bme280_centipercent(int(humidity)) / 100)
+
+
+# ---------------------------------------------------------------------------
+# Plain Python reference implementations (arbitrary precision ints, no tricks)
+# ---------------------------------------------------------------------------
+
+def ref_tsl2591_decilux(full, ir, atime_ms, again):
+    if full == TSL2591_SATURATED or ir == TSL2591_SATURATED:
+        return 0
+    lux1 = (100 * full - LUX_COEFB_X100 * ir) * LUX_DF
+    lux2 = (LUX_COEFC_X100 * full - LUX_COEFD_X100 * ir) * LUX_DF
+    return max(lux1, lux2) * 10 // (100 * atime_ms * again)
+
+
+def ref_scd41_centidegrees(raw):
+    return (-45 * 100 * 65536 + 175 * 100 * raw) // 65536
+
+
+def ref_scd41_centipercent(raw):
+    return 100 * 100 * raw // 65536
+
+
+def ref_ina226_bus_microvolts(raw):
+    return raw * 1250
+
+
+def ref_ina226_signed(raw):
+    return raw - 0x10000 if raw >= 0x8000 else raw
+
+
+def ref_ina226_shunt_nanovolts(raw):
+    return ref_ina226_signed(raw) * 2500
+
+
+def ref_ina226_power_microwatts(raw):
+    return int(raw * 156.25)
+
+
+def ref_bme280_centipercent(raw):
+    return raw * 100 // 1024
+
+
+def ref_bme280_milliatm(pascal):
+    return pascal * 1000 // PASCAL_PER_ATM
@@ -0,0 +1,190 @@
+# Sequential pass/fail decisions on repeated sensor readings.
+# Every measured quantity keeps a running mean and variance (Welford's method, constant memory).
+# After each sample the mean, widened by K standard errors, is compared with the spec limits of
+# the quantity: sampling stops as soon as it is certainly inside (pass) or certainly outside
+# (fail). The standard deviation never counts as smaller than the sensor's own noise (datasheet
+# accuracy), so a good board with a steady reading passes on its first sample.
+
+import math
+
+DEFAULT_K = 3.0             # Standard errors between the mean and a limit for a certain verdict (~99.7 %)
+DEFAULT_MAX_SAMPLES = 5     # Samples after which the verdict is taken from the mean alone
+
+
+class RunningStats:
+
+    """Count, mean, variance, minimum and maximum of a stream of values, in constant memory."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0           # Sum of squared differences from the mean
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, value):
+
+        """Add one value (Welford's update)."""
+
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def variance(self):
+
+        """Sample variance, 0 with fewer than two values."""
+
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def stddev(self):
+        return math.sqrt(self.variance())
+
+
+class SpecLimit:
+
+    """Allowed range of one measured quantity."""
+
+    def __init__(self, low, high, noise):
+
+        """
+        Parameters:
+        low (float): Lowest value of a good board.
+        high (float): Highest value of a good board.
+        noise (float): Standard deviation of the sensor's readings (datasheet accuracy), the
+                       smallest spread assumed for a verdict.
+        """
+
+        self.low = low
+        self.high = high
+        self.noise = noise
+
+
+class SequentialCheck:
+
+    """
+    Running statistics of the readings of one sensor and a sequential verdict against their
+    limits.
+
+    A reading is a tuple with one value per limit. A limit of None only requires the value to be
+    present; a missing value (None) in a reading fails the check at once.
+    """
+
+    def __init__(self, limits, k=DEFAULT_K, max_samples=DEFAULT_MAX_SAMPLES):
+
+        """
+        Parameters:
+        limits (tuple): SpecLimit (or None) of each value of a reading.
+        k (float): Standard errors between the mean and a limit for a certain verdict.
+        max_samples (int): Readings after which the verdict is taken from the means alone.
+        """
+
+        self.limits = limits
+        self.k = k
+        self.max_samples = max_samples
+        self.stats = [RunningStats() for _ in limits]
+
+    def reset(self):
+
+        """Forget all readings, before testing a new board."""
+
+        for stats in self.stats:
+            stats.reset()
+
+    @property
+    def count(self):
+        return self.stats[0].count
+
+    def means(self):
+
+        """Return the mean of every value, a tuple like a reading."""
+
+        return tuple(stats.mean if stats.count else None for stats in self.stats)
+
+    def add(self, reading):
+
+        """
+        Add one reading and decide if possible.
+
+        Parameters:
+        reading (tuple): One value per limit.
+
+        Returns:
+        bool: True (certainly within limits), False (certainly out of limits or a value is
+              missing), None (more readings are needed).
+        """
+
+        if None in reading:
+            return False
+
+        for stats, value in zip(self.stats, reading):
+            stats.add(value)
+        return self.verdict()
+
+    def add_sample(self, reading):
+
+        """
+        Add one reading of a sensor that is sampled periodically. Unlike add(), a reading that
+        could not be taken (None or a missing value) is skipped, to be retried at the next period.
+
+        Parameters:
+        reading (tuple): One value per limit, or None.
+
+        Returns:
+        bool: Verdict like add(), None while undecided or if the reading was skipped.
+        """
+
+        if reading is None or None in reading:
+            return None
+        return self.add(reading)
+
+    def verdict(self):
+
+        """
+        Decide on the readings added so far.
+
+        Returns:
+        bool: True, False, or None while undecided and below max_samples.
+        """
+
+        certain = True
+        for stats, limit in zip(self.stats, self.limits):
+            if limit is None:
+                continue
+
+            margin = self.k * max(stats.stddev(), limit.noise) / math.sqrt(stats.count)
+            if stats.mean + margin < limit.low or stats.mean - margin > limit.high:
+                return False
+            if stats.mean - margin < limit.low or stats.mean + margin > limit.high:
+                certain = False
+
+        if certain:
+            return True
+        if self.count >= self.max_samples:
+            return self.final()
+        return None
+
+    def final(self):
+
+        """
+        Verdict from the means alone, when no more readings can be taken.
+
+        Returns:
+        bool: True if every mean is within its limits.
+        """
+
+        if self.count == 0:
+            return False
+
+        for stats, limit in zip(self.stats, self.limits):
+            if limit is not None and not limit.low <= stats.mean <= limit.high:
+                return False
+        return True
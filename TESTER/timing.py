@@ -0,0 +1,259 @@
+# Lightweight timing instrumentation.
+# Spans are measured with time.ticks_us() and aggregated into fixed-bucket latency histograms.
+# All counters live in preallocated arrays, so recording a sample never allocates.
+#
+#     start = timing.start()
+#     ...
+#     timing.stop(timing.SPAN_WIRE_TEST, start)
+
+from array import array
+import time
+
+# Span ids
+SPAN_BUTTON_SCAN = 0
+SPAN_WIRE_TEST = 1
+SPAN_CURRENT_TEST = 2
+SPAN_CO2_TEST = 3
+SPAN_LIGHT_TEST = 4
+SPAN_CABLE_CONTINUITY = 5
+SPAN_CABLE_CROSSING = 6
+SPAN_SCD41_START = 7
+SPAN_SCD41_MEASUREMENT = 8
+SPAN_BME280_READ = 9
+SPAN_TSL2591_READ = 10
+SPAN_I2C_INA226 = 11
+SPAN_I2C_TSL2591 = 12
+SPAN_I2C_SCD41 = 13
+SPAN_I2C_BME280 = 14
+SPAN_I2C_OTHER = 15
+SPAN_SEQUENCE = 16
+SPAN_ANALOG_TEST = 17
+
+SPAN_NAMES = (
+    "button scan", "wire test", "current test", "co2 test", "light test",
+    "cable continuity", "cable crossing", "scd41 start", "scd41 measurement",
+    "bme280 read", "tsl2591 read",
+    "i2c ina226", "i2c tsl2591", "i2c scd41", "i2c bme280", "i2c other",
+    "full sequence", "analog test",
+)
+NUM_SPANS = len(SPAN_NAMES)
+
+# Bucket 0 holds 0 us, bucket k holds [2^(k-1), 2^k) us; the last bucket (31) is open ended, from 2^30 us (~17.9 min)
+NUM_BUCKETS = 32
+
+# I2C address to span id
+I2C_SPANS = {
+    0x40: SPAN_I2C_INA226,
+    0x29: SPAN_I2C_TSL2591,
+    0x62: SPAN_I2C_SCD41,
+    0x76: SPAN_I2C_BME280,
+    0x77: SPAN_I2C_BME280,
+}
+
+# Global enable switch, recording is skipped when False
+enabled = True
+
+_counts = array('I', [0] * (NUM_SPANS * NUM_BUCKETS))
+_totals = array('I', [0] * NUM_SPANS)
+_maxima = array('I', [0] * NUM_SPANS)
+
+
+def start():
+
+    """Return the start tick of a span."""
+
+    return time.ticks_us()
+
+
+def record(span, elapsed_us):
+
+    """
+    Add one duration sample to the histogram of a span.
+
+    Parameters:
+    span (int): One of the SPAN_* ids.
+    elapsed_us (int): Duration in microseconds.
+    """
+
+    if not enabled:
+        return
+
+    bucket = 0
+    value = elapsed_us
+    while value and bucket < NUM_BUCKETS - 1:
+        value >>= 1
+        bucket += 1
+
+    _counts[span * NUM_BUCKETS + bucket] += 1
+    _totals[span] += 1
+    if elapsed_us > _maxima[span]:
+        _maxima[span] = elapsed_us
+
+
+def stop(span, start_tick):
+
+    """
+    Close a span started with start() and record its duration.
+
+    Parameters:
+    span (int): One of the SPAN_* ids.
+    start_tick (int): Value returned by start().
+
+    Returns:
+    int: Duration in microseconds.
+    """
+
+    elapsed = time.ticks_diff(time.ticks_us(), start_tick)
+    record(span, elapsed)
+    return elapsed
+
+
+def count(span):
+
+    """Return the number of samples recorded for a span."""
+
+    return _totals[span]
+
+
+def percentile(span, fraction):
+
+    """
+    Estimate a latency percentile from the histogram.
+
+    Parameters:
+    span (int): One of the SPAN_* ids.
+    fraction (float): Percentile as a fraction, e.g. 0.99.
+
+    Returns:
+    int: Upper edge (us) of the bucket holding the percentile, capped at the maximum seen.
+         0 if no sample was recorded.
+    """
+
+    total = _totals[span]
+    if not total:
+        return 0
+
+    target = total * fraction
+    seen = 0
+    base = span * NUM_BUCKETS
+
+    for bucket in range(NUM_BUCKETS):
+        seen += _counts[base + bucket]
+        if seen >= target:
+            edge = (1 << bucket) - 1 if bucket else 0
+            return edge if edge < _maxima[span] else _maxima[span]
+
+    return _maxima[span]
+
+
+def maximum(span):
+
+    """Return the longest duration (us) recorded for a span."""
+
+    return _maxima[span]
+
+
+def buckets(span):
+
+    """Return a copy of the bucket counts of a span."""
+
+    base = span * NUM_BUCKETS
+    return _counts[base:base + NUM_BUCKETS]
+
+
+def reset():
+
+    """Clear all histograms."""
+
+    for i in range(len(_counts)):
+        _counts[i] = 0
+    for i in range(NUM_SPANS):
+        _totals[i] = 0
+        _maxima[i] = 0
+
+
+def dump(stream=None):
+
+    """
+    Print the count, p50, p99 and maximum of every span that has samples.
+
+    Parameters:
+    stream: Object with a write() method. Defaults to print() on the USB serial.
+    """
+
+    lines = ["{:<20}{:>8}{:>12}{:>12}{:>12}".format("span", "count", "p50 us", "p99 us", "max us")]
+    for span in range(NUM_SPANS):
+        if _totals[span]:
+            lines.append("{:<20}{:>8}{:>12}{:>12}{:>12}".format(
+                SPAN_NAMES[span], _totals[span], percentile(span, 0.5),
+                percentile(span, 0.99), _maxima[span]))
+
+    for line in lines:
+        if stream is None:
+            print(line)
+        else:
+            stream.write(line + "\n")
+
+
+class TimedI2C:
+
+    """
+    Wrapper around a machine.I2C object which times every transaction.
+
+    Each transaction is recorded in the span of the addressed device (see I2C_SPANS).
+    Any other attribute is passed through to the wrapped object.
+    """
+
+    def __init__(self, i2c):
+
+        """
+        Parameters:
+        i2c (I2C): The I2C object to wrap.
+        """
+
+        self.i2c = i2c
+
+    def __getattr__(self, name):
+        return getattr(self.i2c, name)
+
+    def writeto(self, addr, buf, *args):
+        start_tick = time.ticks_us()
+        try:
+            return self.i2c.writeto(addr, buf, *args)
+        finally:
+            stop(I2C_SPANS.get(addr, SPAN_I2C_OTHER), start_tick)
+
+    def readfrom(self, addr, nbytes, *args):
+        start_tick = time.ticks_us()
+        try:
+            return self.i2c.readfrom(addr, nbytes, *args)
+        finally:
+            stop(I2C_SPANS.get(addr, SPAN_I2C_OTHER), start_tick)
+
+    def readfrom_into(self, addr, buf, *args):
+        start_tick = time.ticks_us()
+        try:
+            return self.i2c.readfrom_into(addr, buf, *args)
+        finally:
+            stop(I2C_SPANS.get(addr, SPAN_I2C_OTHER), start_tick)
+
+    def writeto_mem(self, addr, memaddr, buf, **kwargs):
+        start_tick = time.ticks_us()
+        try:
+            return self.i2c.writeto_mem(addr, memaddr, buf, **kwargs)
+        finally:
+            stop(I2C_SPANS.get(addr, SPAN_I2C_OTHER), start_tick)
+
+    def readfrom_mem(self, addr, memaddr, nbytes, **kwargs):
+        start_tick = time.ticks_us()
+        try:
+            return self.i2c.readfrom_mem(addr, memaddr, nbytes, **kwargs)
+        finally:
+            stop(I2C_SPANS.get(addr, SPAN_I2C_OTHER), start_tick)
+
+    def readfrom_mem_into(self, addr, memaddr, buf, **kwargs):
+        start_tick = time.ticks_us()
+        try:
+            return self.i2c.readfrom_mem_into(addr, memaddr, buf, **kwargs)
+        finally:
+            stop(I2C_SPANS.get(addr, SPAN_I2C_OTHER), start_tick)